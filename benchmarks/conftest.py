@@ -0,0 +1,11 @@
+"""
+Synthetic data for the benchmarks (see mortality/synthetic.py), so they run
+offline and at any size.
+"""
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def data_dir(tmp_path_factory):
+    return tmp_path_factory.mktemp("synthetic")
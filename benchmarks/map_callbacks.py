@@ -0,0 +1,60 @@
+"""
+This file measures the latency of the map dashboard callbacks, with the data
+read from disk, the figures built and the tables indexed on every call (as
+before the in-memory data, figure and table caches) and with all of them
+served from the caches. The tables are timed on the page the table shows
+first, as the table callback serves it.
+
+Run it with: uv run python benchmarks/map_callbacks.py [repeats]
+"""
+
+import statistics
+import sys
+import time
+from mortality import figure_cache, map_data, table_index
+from mortality.map_viz import map_figure, scatter_figure, table_page
+
+CALLBACKS = {
+    "map mortality": lambda: map_figure("Maternal Mortality Rates"),
+    "map abortion": lambda: map_figure("Statutory Limits on Abortion"),
+    "table mortality": lambda: table_page("Maternal Mortality Rates"),
+    "table abortion": lambda: table_page("Statutory Limits on Abortion"),
+    "scatter": lambda: scatter_figure("Percent Uninsured"),
+}
+
+
+def time_callback(callback, repeats: int, cached: bool) -> float:
+    """
+    This function returns the median milliseconds a callback takes.
+
+    Parameters:
+        callback: the function to time.
+        repeats: how many times to call it.
+        cached: if False, the caches are emptied before each call, so the
+            data is read from disk, and the figure built or the table indexed,
+            every time.
+    """
+    callback()  # warm up imports and the cache
+    timings = []
+    for _ in range(repeats):
+        if not cached:
+            map_data.clear_frames()
+            figure_cache.clear_figures()
+            table_index.clear_tables()
+        start = time.perf_counter()
+        callback()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return statistics.median(timings)
+
+
+def main(repeats: int = 20):
+    print(f"{'callback':<18}{'uncached':>12}{'cached':>12}{'speedup':>10}")
+    for name, callback in CALLBACKS.items():
+        uncached = time_callback(callback, repeats, cached=False)
+        cached = time_callback(callback, repeats, cached=True)
+        print(f"{name:<18}{uncached:>10.2f}ms{cached:>10.2f}ms{uncached / cached:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
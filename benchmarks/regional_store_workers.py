@@ -0,0 +1,88 @@
+"""
+This file compares how 8 worker processes load the cleaned regional data
+through `predict_model.get_data`, the path the dashboards read it from: with
+no store, so every worker parses the csv, or with the memory-mapped store.
+For each worker it records the load time and its resident memory, split into
+private memory (RssAnon) and pages shared through the page cache (RssFile),
+after touching every column of the data frame. The data is tiled to `rows`
+rows so the difference is visible.
+
+Run it with: uv run python benchmarks/regional_store_workers.py [rows] [workers]
+"""
+
+import multiprocessing
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+import pandas as pd
+from mortality.predict_model import DATA_FILE, EXCLUDED_ROWS, get_data
+from mortality.regional_store import (
+    CATEGORICAL_COLUMNS,
+    NUMERIC_COLUMNS,
+    store_paths,
+    write_store,
+)
+
+
+def memory_kb() -> dict:
+    """
+    This function returns the private and file-backed resident memory of the
+    current process, in kB (Linux only).
+    """
+    memory = {}
+    with open("/proc/self/status") as file:
+        for line in file:
+            key, _, value = line.partition(":")
+            if key in ("RssAnon", "RssFile"):
+                memory[key] = int(value.split()[0])
+
+    return memory
+
+
+def load_worker(csv_path):
+    before = memory_kb()
+    start = time.perf_counter()
+
+    frame = get_data(csv_path)
+    total = sum(frame[column].sum() for column in NUMERIC_COLUMNS) + sum(
+        frame[column].value_counts().sum() for column in CATEGORICAL_COLUMNS
+    )
+
+    seconds = time.perf_counter() - start
+    after = memory_kb()
+
+    return (
+        seconds,
+        after["RssAnon"] - before["RssAnon"],
+        after["RssFile"] - before["RssFile"],
+        float(total),
+    )
+
+
+def main(rows: int = 1_000_000, workers: int = 8):
+    base = pd.read_csv(DATA_FILE)
+    frame = pd.concat([base] * (rows // len(base) + 1), ignore_index=True)[:rows]
+
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = Path(directory) / "regional.csv"
+        frame.to_csv(csv_path, index=False)
+
+        print(f"{rows:,} rows, {workers} workers")
+        print(f"{'loader':<8}{'load time':>12}{'private MB':>12}{'shared MB':>12}")
+        context = multiprocessing.get_context("spawn")
+        for kind in ["csv", "store"]:
+            if kind == "store":
+                write_store(csv_path, EXCLUDED_ROWS)
+            assert store_paths(csv_path)[0].exists() == (kind == "store")
+            with context.Pool(workers) as pool:
+                results = pool.map(load_worker, [csv_path] * workers)
+            seconds = statistics.median(result[0] for result in results)
+            private = sum(result[1] for result in results) / 1024
+            shared = sum(result[2] for result in results) / 1024
+            print(f"{kind:<8}{seconds * 1000:>10.1f}ms{private:>12.1f}{shared:>12.1f}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,69 @@
+"""
+Each Dash callback, called through the server as the browser calls it.
+"""
+
+import pytest
+from mortality.server import create_server
+
+TABLE_INPUTS = [
+    ("map_select.value", "Statutory Limits on Abortion"),
+    ("table.page_current", 2),
+    ("table.page_size", 10),
+    ("table.sort_by", [{"column_id": "Location", "direction": "desc"}]),
+    ("table.filter_query", ""),
+]
+
+CALLBACKS = {
+    "update_map": ("", ["map.figure"], [("map_select.value", "Maternal Mortality Rates")]),
+    "update_table": ("", ["table.data", "table.columns", "table.page_count"], TABLE_INPUTS),
+    "update_scatter": ("", ["scatter.figure"], [("scatter_select.value", "Percent Cesarean Births")]),
+    "output_mortality_rate": (
+        "/prediction",
+        ["header-mortality.children", "output-mortality.children", "explain-mortality.children"],
+        [
+            ("region.value", "South"),
+            ("race.value", "Asian"),
+            ("education.value", "8th grade or less"),
+            ("age.value", "35-44"),
+        ],
+    ),
+    "update_boxplot": (
+        "/prediction",
+        ["boxplot.figure"],
+        [("indepdent-var1.value", "region"), ("indepdent-var2.value", "race")],
+    ),
+}
+
+
+@pytest.fixture(scope="module")
+def client():
+    return create_server(["map", "prediction"]).test_client()
+
+
+def callback_request(outputs, inputs):
+    def spec(prop_id):
+        id, prop = prop_id.split(".", 1)
+        return {"id": id, "property": prop}
+
+    if len(outputs) > 1:
+        output = "..{}..".format("...".join(outputs))
+        output_specs = [spec(prop_id) for prop_id in outputs]
+    else:
+        output = outputs[0]
+        output_specs = spec(outputs[0])
+
+    return {
+        "output": output,
+        "outputs": output_specs,
+        "inputs": [{**spec(prop_id), "value": value} for prop_id, value in inputs],
+        "changedPropIds": [prop_id for prop_id, _ in inputs],
+    }
+
+
+@pytest.mark.parametrize("callback", CALLBACKS)
+def test_callback(benchmark, client, callback):
+    prefix, outputs, inputs = CALLBACKS[callback]
+    payload = callback_request(outputs, inputs)
+
+    response = benchmark(client.post, f"{prefix}/_dash-update-component", json=payload)
+    assert response.status_code == 200
@@ -0,0 +1,58 @@
+import pytest
+from mortality.kff_merger import KFF_SCHEMA, merge_kff, merge_sources
+from mortality.predict_model import full_model, get_data
+from mortality.regional_clean import clean_regional
+from mortality.synthetic import write_regional, write_scraped
+
+
+@pytest.mark.parametrize("rows", [120, 120_000])
+def test_regional_clean(benchmark, data_dir, rows):
+    root = data_dir / f"regional_{rows}"
+    export = write_regional(root, rows)
+
+    benchmark.pedantic(clean_regional, args=(export, root / "clean.csv"), rounds=5)
+
+
+@pytest.mark.parametrize("geographies", [50, 5_000])
+def test_kff_merge(benchmark, data_dir, geographies):
+    root = data_dir / f"merge_{geographies}"
+    write_scraped(root, geographies)
+    scrape_dir = root / "data/scrape_data"
+    paths = [
+        scrape_dir / name
+        for name in [
+            "kff_maternal_mortality.csv",
+            "kff_coverage.csv",
+            "kff_earnings.csv",
+            "kff_cesarean.csv",
+        ]
+    ]
+
+    merged = benchmark.pedantic(merge_kff, args=(*paths, root / "merged_kff.csv"), rounds=5)
+    assert len(merged) >= geographies - 1
+
+
+@pytest.mark.parametrize("geographies", [50, 5_000])
+@pytest.mark.parametrize("sources", [1, 4, 13])
+def test_kff_merge_sources(benchmark, data_dir, sources, geographies):
+    # every column of the first `sources` KFF files, in one join
+    root = data_dir / f"merge_{geographies}"
+    if not root.exists():
+        write_scraped(root, geographies)
+    columns = [
+        name
+        for source in list(KFF_SCHEMA.values())[:sources]
+        for name, _ in source.columns.values()
+    ]
+
+    merged = benchmark.pedantic(merge_sources, args=(columns,), kwargs={"root": root}, rounds=5)
+    assert len(merged) >= geographies - 1
+
+
+@pytest.mark.parametrize("rows", [120, 12_000])
+def test_full_model_fit(benchmark, data_dir, rows):
+    root = data_dir / f"model_{rows}"
+    clean_regional(write_regional(root, rows), root / "clean.csv")
+    mortality_data = get_data(root / "clean.csv")
+
+    benchmark.pedantic(full_model, args=(mortality_data,), rounds=3)
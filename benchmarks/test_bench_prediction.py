@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+from mortality.batch_predict import predict_batch
+from mortality.predict_model import (
+    INDEPENDENT_VAR,
+    get_data,
+    prediction_lattice,
+    prediction_scorer,
+    user_prediction,
+)
+
+PROFILE = ("South", "Asian", "8th grade or less", "35-44")
+
+
+@pytest.fixture(scope="module")
+def profiles():
+    """100,000 profiles sampled from the cleaned data."""
+    return get_data()[INDEPENDENT_VAR].astype(str).sample(100_000, replace=True, random_state=0)
+
+
+def test_user_prediction(benchmark):
+    assert 0 <= benchmark(user_prediction, *PROFILE) <= 1
+
+
+def test_lattice_lookup(benchmark):
+    lattice = prediction_lattice()
+    assert 0 <= benchmark(lattice.lookup, *PROFILE) <= 1
+
+
+def test_scorer_predict(benchmark, profiles):
+    scorer = prediction_scorer()
+    assert len(benchmark(scorer.predict, profiles)) == len(profiles)
+
+
+def test_predict_batch(benchmark, profiles, tmp_path):
+    input_file = tmp_path / "profiles.csv"
+    profiles.to_csv(input_file, index=False)
+    output_file = tmp_path / "scored.csv"
+
+    def score():
+        output_file.unlink(missing_ok=True)
+        return predict_batch(input_file, output_file, chunksize=20_000)
+
+    assert benchmark.pedantic(score, rounds=5)["rows"] == len(profiles)
+    assert len(pd.read_csv(output_file)) == len(profiles)
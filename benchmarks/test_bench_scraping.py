@@ -0,0 +1,31 @@
+import json
+import pytest
+from mortality.scrapers.json_stream import StateRowParser
+from mortality.scrapers.kff_data_sources import DATA_SOURCES
+from mortality.scrapers.kff_web_scraping import extract_state_info
+from mortality.synthetic import kff_sheet
+
+SOURCE = "(dem) Distribution of Women Ages 18-64, by Race/Ethnicity"
+_, VARIABLES, START_INDEX, _ = DATA_SOURCES[SOURCE]
+
+
+@pytest.mark.parametrize("rows", [50, 10_000, 1_000_000])
+def test_extract_state_info(benchmark, rows):
+    sheet = kff_sheet(SOURCE, rows)["data"]
+    data = benchmark.pedantic(
+        extract_state_info,
+        args=(sheet[START_INDEX:], VARIABLES),
+        rounds=3 if rows > 10_000 else 20,
+    )
+    assert len(data) == rows
+
+
+@pytest.mark.parametrize("rows", [50, 10_000])
+def test_stream_state_rows(benchmark, rows):
+    text = json.dumps(kff_sheet(SOURCE, rows))
+
+    def parse():
+        parser = StateRowParser(VARIABLES, START_INDEX)
+        return parser.feed(text) + parser.close()
+
+    assert len(benchmark(parse)) == rows
@@ -1,24 +1,520 @@
+"""
+The command line of the project, `python -m mortality <command>`.
+
+Every subcommand is registered in COMMANDS with the modules it needs, a
+function adding its arguments and a function running it. Both functions
+import what they use when they are called, and only for the chosen
+subcommand, so a usage error or `python -m mortality scrape` does not pay for
+importing dash, plotly, statsmodels or pandas.
+
+`python -m mortality --profile-imports <command> ...` prints how long the
+command's imports took per module before running it.
+"""
+
+import argparse
+import json
 import sys
-from mortality.predict_model import user_input_dash
-from mortality.map_viz import run_app
-from mortality.scrapers.kff_web_scraping import run_kff_scrapers
-from mortality.scrapers.abortion_web_scraping import run_abortion_policy_scraper
-
-def main():
-    if (len(sys.argv) != 2) or (sys.argv[1] not in ["prediction", "map", "scrape"]):
-        print("Please run one the following:\nuv run python -m mortality map\nuv run python -m mortality prediction\nuv run python -m mortality scrape")
+import time
+
+USAGE = "Please run one the following:\nuv run python -m mortality map [--serve --workers N --port P]\nuv run python -m mortality prediction\nuv run python -m mortality scrape\nuv run python -m mortality train [output.json]\nuv run python -m mortality lattice [output.npy]\nuv run python -m mortality predict-batch in.csv out.csv\nuv run python -m mortality build [--root DIR]\nuv run python -m mortality synthetic DIR --scale N\nuv run python -m mortality bench"
+
+
+class Command:
+    """
+    A subcommand of the command line.
+
+    Attributes:
+        name: the name of the subcommand
+        help: its description in the usage
+        modules: the modules it imports to run, for --profile-imports
+        arguments: function adding its arguments to its parser
+        run: function running it with the parsed arguments
+    """
+
+    def __init__(self, name: str, help: str, modules: list, arguments, run):
+        self.name = name
+        self.help = help
+        self.modules = modules
+        self.arguments = arguments
+        self.run = run
+
+
+# subcommand name -> Command, in the order of the usage
+COMMANDS = {}
+
+
+def command(name: str, help: str, modules: list, arguments=None):
+    """
+    Decorator registering a function as the run function of a subcommand.
+    """
+
+    def register(run):
+        COMMANDS[name] = Command(name, help, modules, arguments or (lambda parser: None), run)
+        return run
+
+    return register
+
+
+def add_serve_arguments(parser, other: str):
+    """
+    Adds the options to serve a dashboard in production to its subcommand.
+    """
+    from mortality.server import DEFAULT_HOST, DEFAULT_PORT
+
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="serve with the production server instead of the Dash debug server",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="number of worker processes"
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "--both",
+        action="store_true",
+        help=f"also serve the {other} dashboard, under /{other}/",
+    )
+
+
+def serve_dashboards(args, dashboard: str, other: str):
+    """
+    Serves a dashboard (and the other one with --both) with the production
+    server.
+    """
+    from mortality.server import create_server, serve
+
+    dashboards = [dashboard] + ([other] if args.both else [])
+    application = create_server(
+        dashboards, figure_store=getattr(args, "figure_store", None)
+    )
+    print(
+        f"Serving {' and '.join(dashboards)} on http://{args.host}:{args.port}/ "
+        f"with {args.workers} worker(s). To stop, press Control+C"
+    )
+    serve(application, args.host, args.port, args.workers)
+
+
+def _map_arguments(parser):
+    from mortality.figure_cache import FIGURE_STORE
+
+    add_serve_arguments(parser, other="prediction")
+    parser.add_argument(
+        "--figure-store",
+        nargs="?",
+        const=str(FIGURE_STORE),
+        metavar="DIR",
+        help="keep the built figures on disk, shared across processes "
+        f"(default directory: {FIGURE_STORE})",
+    )
+
+
+@command(
+    "map",
+    "run the visualization map",
+    ["mortality.map_viz"],
+    _map_arguments,
+)
+def run_map(args):
+    if args.serve:
+        serve_dashboards(args, "map", "prediction")
+        return
+    from mortality.map_viz import run_app
+
+    print("To close Dash, press Control+C")
+    run_app(figure_store=args.figure_store)
+
+
+@command(
+    "prediction",
+    "run the predictive model dashboard",
+    ["mortality.predict_model"],
+    lambda parser: add_serve_arguments(parser, other="map"),
+)
+def run_prediction(args):
+    if args.serve:
+        serve_dashboards(args, "prediction", "map")
+        return
+    from mortality.predict_model import user_input_dash
+
+    print("To close Dash, press Control+C")
+    user_input_dash()
+
+
+def _scrape_arguments(parser):
+    from mortality.scrapers.http_cache import DEFAULT_MAX_BYTES, DEFAULT_TTL
+    from mortality.scrapers.kff_web_scraping import DEFAULT_CONCURRENCY, DEFAULT_TIMEOUT
+    from mortality.scrapers.scheduler import RetryPolicy
+
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help="maximum number of requests in flight at once",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT,
+        help="seconds to wait on a request",
+    )
+    parser.add_argument(
+        "--sequential",
+        action="store_true",
+        help="fetch one source at a time instead of concurrently",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=DEFAULT_TTL,
+        help="seconds a cached response is used before revalidating it",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=float,
+        default=DEFAULT_MAX_BYTES / 1024 / 1024,
+        help="maximum size of the response cache",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="only use cached responses, without sending requests",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="always download every source"
+    )
+    parser.add_argument(
+        "--attempts",
+        type=int,
+        default=RetryPolicy().max_attempts,
+        help="times a request is tried before its source counts as failed",
+    )
+    parser.add_argument("--summary", help="write a json summary of the scrape here")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="parse and write each source as it downloads, in constant memory",
+    )
+
+
+@command(
+    "scrape",
+    "scrape the KFF data sources",
+    [
+        "mortality.scrapers.kff_web_scraping",
+        "mortality.scrapers.abortion_web_scraping",
+    ],
+    _scrape_arguments,
+)
+def run_scrape(args):
+    import httpx
+    from mortality.scrapers.abortion_web_scraping import run_abortion_policy_scraper
+    from mortality.scrapers.http_cache import ResponseCache
+    from mortality.scrapers.kff_web_scraping import (
+        run_kff_scrapers,
+        run_kff_scrapers_async,
+    )
+    from mortality.scrapers.scheduler import (
+        HostRateLimiter,
+        RetryingClient,
+        RetryPolicy,
+        summarize,
+    )
+
+    cache = None
+    if not args.no_cache:
+        cache = ResponseCache(
+            ttl=args.cache_ttl,
+            max_bytes=int(args.cache_max_mb * 1024 * 1024),
+            offline=args.offline,
+        )
+
+    # every request, sequential or concurrent, follows the same retry policy,
+    # timeout and per-host rate limit
+    policy = RetryPolicy(max_attempts=args.attempts)
+    limiter = HostRateLimiter()
+    start = time.perf_counter()
+    with httpx.Client(timeout=args.timeout) as http_client:
+        client = RetryingClient(http_client, policy, limiter)
+        if args.sequential:
+            results = run_kff_scrapers(cache, client=client)
+        else:
+            results = run_kff_scrapers_async(
+                args.concurrency, args.timeout, cache, policy, args.stream, limiter
+            )
+        try:
+            results["abortion policy"] = run_abortion_policy_scraper(cache, client)
+        except Exception as error:
+            results["abortion policy"] = {
+                "status": "failed",
+                "changed": False,
+                "error": f"{type(error).__name__}: {error}",
+            }
+
+    for name, result in results.items():
+        seconds = f"{result['seconds']:6.2f}s" if "seconds" in result else ""
+        changed = "changed" if result["changed"] else "unchanged"
+        print(f"{seconds:>7} {result['status']:>12} {changed:>9}  {name}")
+
+    summary = summarize(results, time.perf_counter() - start)
+    print(
+        f"Scraped {summary['succeeded']} of {summary['sources']} sources in "
+        f"{summary['seconds']:.2f}s, {len(summary['changed'])} changed, "
+        f"{summary['retries']} retries"
+    )
+    for name, error in summary["failed"].items():
+        print(f"Failed: {name}: {error}")
+    if args.summary:
+        with open(args.summary, "w") as file:
+            json.dump({"summary": summary, "sources": results}, file, indent=2)
+    if summary["failed"]:
         sys.exit(1)
-    elif sys.argv[1] == "prediction":
-        print("To close Dash, press Control+C")
-        user_input_dash()
-    elif sys.argv[1] == "map":
-        print("To close Dash, press Control+C")
-        run_app()
-    elif sys.argv[1] == "scrape":
-        run_kff_scrapers()
-        run_abortion_policy_scraper()
+
+
+def _train_arguments(parser):
+    from mortality.model_artifact import ARTIFACT_FILE
+
+    parser.add_argument("output", nargs="?", default=ARTIFACT_FILE)
+
+
+@command(
+    "train",
+    "fit the predictive model and save it as an artifact",
+    ["mortality.predict_model"],
+    _train_arguments,
+)
+def run_train(args):
+    from mortality.predict_model import write_model_artifact
+
+    write_model_artifact(args.output)
+    print(f"Saved model artifact to {args.output}")
+
+
+def _lattice_arguments(parser):
+    from mortality.lattice import LATTICE_FILE
+
+    parser.add_argument("output", nargs="?", default=LATTICE_FILE)
+
+
+@command(
+    "lattice",
+    "precompute every prediction and write it to disk",
+    ["mortality.predict_model"],
+    _lattice_arguments,
+)
+def run_lattice(args):
+    from mortality.predict_model import write_prediction_lattice
+
+    lattice = write_prediction_lattice(args.output)
+    print(f"Wrote {lattice.values.size} predictions to {args.output}")
+
+
+def _batch_arguments(parser):
+    from mortality.batch_predict import DEFAULT_CHUNKSIZE
+
+    parser.add_argument("input", help="CSV or Parquet file of profiles")
+    parser.add_argument("output", help="CSV or Parquet file to write")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+
+
+@command(
+    "predict-batch",
+    "score a CSV or Parquet file of profiles",
+    ["mortality.batch_predict"],
+    _batch_arguments,
+)
+def run_predict_batch(args):
+    from mortality.batch_predict import predict_batch
+
+    stats = predict_batch(
+        args.input,
+        args.output,
+        chunksize=args.chunksize,
+        report=lambda stats: print(
+            f"{stats['rows']:,} rows ({stats['rows_per_second']:,.0f} rows/sec)"
+        ),
+    )
+    print(
+        f"Scored {stats['rows']:,} rows in {stats['seconds']:.2f}s "
+        f"({stats['rows_per_second']:,.0f} rows/sec)"
+    )
+
+
+def _build_arguments(parser):
+    from mortality.pipeline import STAGES
+
+    parser.add_argument(
+        "stages",
+        nargs="*",
+        help="only build these stages: " + ", ".join(stage.name for stage in STAGES),
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="rebuild even if up to date"
+    )
+    parser.add_argument(
+        "--root",
+        help="build the data under this directory instead, e.g. synthetic data",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of independent stages run at once, in separate processes",
+    )
+
+
+@command(
+    "build",
+    "clean, merge and train whatever is out of date",
+    ["mortality.pipeline"],
+    _build_arguments,
+)
+def run_build(args):
+    from mortality.pipeline import BASE_DIR, STAGES, build, cache_path, make_stages
+
+    stages = make_stages(args.root) if args.root else STAGES
+    # only the arguments are usage errors: errors raised by a stage keep
+    # their traceback
+    unknown = set(args.stages) - {stage.name for stage in stages}
+    if unknown:
+        build_parser("build").error(f"Unknown stages: {', '.join(sorted(unknown))}")
+    if args.workers < 1:
+        build_parser("build").error("--workers must be at least 1")
+
+    report = build(
+        stages,
+        names=args.stages,
+        force=args.force,
+        workers=args.workers,
+        cache_file=cache_path(args.root or BASE_DIR),
+    )
+    for name, ran, seconds in report:
+        print(f"{name:>15}  {f'built in {seconds:.2f}s' if ran else 'up to date'}")
+
+
+def _synthetic_arguments(parser):
+    parser.add_argument("root", help="directory to write the data/ files under")
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1,
+        help="size relative to the real data, e.g. 100 for 5,000 geographies",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+
+
+@command(
+    "synthetic",
+    "generate synthetic input data at any scale",
+    ["mortality.synthetic"],
+    _synthetic_arguments,
+)
+def run_synthetic(args):
+    from mortality.synthetic import generate
+
+    counts = generate(args.root, args.scale, args.seed)
+    print(
+        f"Wrote {counts['files']} files under {args.root}: "
+        f"{counts['geographies']:,} geographies, "
+        f"{counts['regional_rows']:,} regional rows"
+    )
+
+
+def _bench_arguments(parser):
+    from mortality.bench import DEFAULT_THRESHOLD
+
+    parser.add_argument(
+        "-k", dest="selection", help="only run the benchmarks matching this expression"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="fraction a time may exceed the baseline by (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="save the results as the baseline"
+    )
+
+
+@command(
+    "bench",
+    "run the benchmarks and compare them with the baseline",
+    ["mortality.bench"],
+    _bench_arguments,
+)
+def run_bench(args):
+    from mortality.bench import bench
+
+    sys.exit(
+        bench(
+            selection=args.selection,
+            threshold=args.threshold,
+            update_baseline=args.save_baseline,
+        )
+    )
+
+
+def chosen_command(argv: list):
+    """
+    Returns the name of the subcommand in the arguments (the first one that
+    is not an option), or None.
+    """
+    for arg in argv:
+        if not arg.startswith("-"):
+            return arg if arg in COMMANDS else None
+
+    return None
+
+
+def build_parser(name: str = None):
+    """
+    Builds the parser of the command line. Every subcommand is listed, but
+    only the arguments of the subcommand `name` are added, so only its
+    modules are imported.
+    """
+    parser = argparse.ArgumentParser(prog="python -m mortality")
+    parser.add_argument(
+        "--profile-imports",
+        action="store_true",
+        help="print how long importing each module of the command takes",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    for registered in COMMANDS.values():
+        subparser = subparsers.add_parser(registered.name, help=registered.help)
+        if registered.name == name:
+            registered.arguments(subparser)
+
+    return parser
+
+
+def main(argv: list = None):
+    argv = sys.argv[1:] if argv is None else argv
+    name = chosen_command(argv)
+
+    if "--profile-imports" in argv[: argv.index(name) if name else len(argv)]:
+        import importlib
+        from mortality.import_profile import ImportProfiler
+
+        with ImportProfiler() as profiler:
+            try:
+                args = build_parser(name).parse_args(argv)
+                for module in COMMANDS[name].modules if name else []:
+                    importlib.import_module(module)
+            finally:
+                # also after --help or a usage error, which exit
+                print(profiler.report(), file=sys.stderr)
     else:
-        print("Please run the following: uv run python -m mortality map or uv run python -m mortality prediction or uv run python -m mortality scrape")
+        args = build_parser(name).parse_args(argv)
+
+    if args.command is None:
+        print(USAGE)
+        sys.exit(1)
+
+    COMMANDS[args.command].run(args)
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
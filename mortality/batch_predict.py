@@ -0,0 +1,178 @@
+"""
+This file scores large files of profiles with the predictive model. The input
+(CSV or Parquet) is streamed in fixed-size chunks: each chunk is encoded to
+category codes, scored with vectorized NumPy operations and appended to the
+output before the next chunk is read, so memory stays bounded by the chunk size
+no matter how many rows the file has.
+
+Every input row is written back out with an added `predicted_mortality`
+column. Rows with a category the model was not trained on are scored as empty.
+The output's columns and types come from the input file's header or schema,
+so the output is written with them even when the input has no rows, and a
+chunk whose values are all missing keeps the types of the other chunks.
+"""
+
+import time
+from pathlib import Path
+import pandas as pd
+
+PREDICTION_COLUMN = "predicted_mortality"
+DEFAULT_CHUNKSIZE = 100_000
+
+
+def read_chunks(input_file, chunksize: int = DEFAULT_CHUNKSIZE):
+    """
+    Yield a CSV or Parquet file as DataFrames of at most `chunksize` rows.
+    Parquet files need the optional `pyarrow` package.
+    """
+    path = Path(input_file)
+
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize, dtype=str)
+
+
+def output_schema(input_file):
+    """
+    Return the pyarrow schema of the scored output of a CSV or Parquet file:
+    the input's columns, as strings for a CSV (which is read as text) or with
+    their Parquet types, followed by the float prediction.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    path = Path(input_file)
+    if path.suffix == ".parquet":
+        fields = list(pq.ParquetFile(path).schema_arrow)
+    else:
+        fields = [pa.field(column, pa.string()) for column in pd.read_csv(path, nrows=0).columns]
+    fields = [field for field in fields if field.name != PREDICTION_COLUMN]
+
+    return pa.schema(fields + [pa.field(PREDICTION_COLUMN, pa.float64())])
+
+
+def output_columns(input_file) -> list:
+    """
+    Return the columns of the scored output of a CSV or Parquet file.
+    """
+    path = Path(input_file)
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        columns = pq.ParquetFile(path).schema_arrow.names
+    else:
+        columns = list(pd.read_csv(path, nrows=0).columns)
+
+    return [column for column in columns if column != PREDICTION_COLUMN] + [PREDICTION_COLUMN]
+
+
+class ChunkWriter:
+    """
+    Appends DataFrame chunks to a CSV or Parquet file, choosing the format from
+    the output file's suffix. The file is created with its header (or schema)
+    when the writer is, so it is written even if no chunk is.
+
+    Parameters:
+        output_file: CSV or Parquet file to write
+        columns: the columns of the output, in order
+        schema: pyarrow schema of the output, for a Parquet file
+    """
+
+    def __init__(self, output_file, columns: list, schema=None):
+        self.path = Path(output_file)
+        self.parquet = self.path.suffix == ".parquet"
+        self.columns = columns
+        self.schema = schema
+        self._file = None
+        self._writer = None
+
+        if self.parquet:
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(self.path, schema)
+        else:
+            self._file = open(self.path, "w", newline="")
+            pd.DataFrame(columns=columns).to_csv(self._file, index=False)
+
+    def write(self, chunk):
+        chunk = chunk[self.columns]
+        if self.parquet:
+            import pyarrow as pa
+
+            table = pa.Table.from_pandas(chunk, schema=self.schema, preserve_index=False)
+            self._writer.write_table(table)
+        else:
+            chunk.to_csv(self._file, header=False, index=False)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def predict_batch(
+    input_file,
+    output_file,
+    scorer=None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    report=None,
+) -> dict:
+    """
+    Score every profile in `input_file` and write the profiles with their
+    predicted maternal mortality to `output_file`.
+
+    Parameters:
+        input_file: CSV or Parquet file with region, race, education and
+            ten_year_age_groups columns
+        output_file: CSV or Parquet file to write, chosen by suffix
+        scorer: LogitScorer to score with (defaults to the predictive model)
+        chunksize: number of rows read, scored and written at a time
+        report: optional function called with the running stats after each chunk
+
+    Returns:
+        dictionary with the number of rows scored, the elapsed seconds and the
+        rows scored per second
+    """
+    if scorer is None:
+        from mortality.predict_model import prediction_scorer
+
+        scorer = prediction_scorer()
+
+    start = time.perf_counter()
+    rows = 0
+
+    columns = output_columns(input_file)
+    schema = output_schema(input_file) if Path(output_file).suffix == ".parquet" else None
+
+    with ChunkWriter(output_file, columns, schema) as writer:
+        for chunk in read_chunks(input_file, chunksize):
+            chunk[PREDICTION_COLUMN] = scorer.predict(chunk)
+            writer.write(chunk)
+
+            rows += len(chunk)
+            if report is not None:
+                report(_stats(rows, start))
+
+    return _stats(rows, start)
+
+
+def _stats(rows: int, start: float) -> dict:
+    seconds = time.perf_counter() - start
+    return {
+        "rows": rows,
+        "seconds": seconds,
+        "rows_per_second": rows / seconds if seconds > 0 else float("inf"),
+    }
@@ -0,0 +1,147 @@
+"""
+This file runs the benchmark suite in `benchmarks/` (pytest-benchmark) and
+compares its results with the baseline saved in `benchmarks/baseline.json`.
+A benchmark whose fastest round grew by more than the threshold compared to
+the baseline is a regression, and makes `python -m mortality bench` fail. The
+fastest round is compared rather than the median, as other work on the machine
+only ever makes rounds slower, and the medians of the shorter benchmarks vary
+by more than the threshold from one run to the next. Baselines saved before
+the fastest rounds were recorded are compared by their medians.
+
+The baseline is machine dependent: save a new one with `--save-baseline` on
+the machine the comparisons run on. A change that makes a benchmark slower on
+purpose re-saves the baseline, and says why it is slower.
+"""
+
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+BENCH_DIR = BASE_DIR / "benchmarks"
+BASELINE_FILE = BENCH_DIR / "baseline.json"
+
+# fraction by which a time may exceed the baseline before it is a regression
+DEFAULT_THRESHOLD = 0.5
+
+
+def run_benchmarks(output_file, selection: str = None) -> int:
+    """
+    This function runs the benchmark suite in a separate process and writes
+    the pytest-benchmark results to `output_file`. It returns pytest's exit
+    code.
+    """
+    command = [
+        sys.executable,
+        "-m",
+        "pytest",
+        str(BENCH_DIR),
+        "-q",
+        "-p",
+        "no:cacheprovider",
+        f"--benchmark-json={output_file}",
+    ]
+    if selection:
+        command += ["-k", selection]
+
+    return subprocess.run(command, cwd=BASE_DIR).returncode
+
+
+def load_results(path) -> dict:
+    """
+    This function reads pytest-benchmark results into a dictionary of
+    benchmark name to its fastest round, median and mean seconds.
+    """
+    with open(path) as file:
+        results = json.load(file)
+
+    return {
+        benchmark["fullname"]: {
+            "min": benchmark["stats"]["min"],
+            "median": benchmark["stats"]["median"],
+            "mean": benchmark["stats"]["mean"],
+        }
+        for benchmark in results["benchmarks"]
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> list:
+    """
+    This function compares benchmark results with the baseline.
+
+    Parameters:
+        results: dictionary of benchmark name to its fastest round, median and
+            mean seconds.
+        baseline: the same, for the baseline run.
+        threshold: fraction by which a time may exceed the baseline time.
+
+    Returns:
+        list of (name, baseline time, time, ratio) for every benchmark slower
+        than the baseline by more than the threshold, slowest first. The
+        times are the fastest rounds, or the medians for a baseline without
+        them.
+    """
+    regressions = []
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        statistic = "min" if "min" in baseline[name] and "min" in stats else "median"
+        before, after = baseline[name][statistic], stats[statistic]
+        ratio = after / before
+        if ratio > 1 + threshold:
+            regressions.append((name, before, after, ratio))
+
+    return sorted(regressions, key=lambda regression: -regression[3])
+
+
+def save_baseline(results: dict, path=BASELINE_FILE):
+    """
+    This function writes benchmark results as the new baseline.
+    """
+    with open(path, "w") as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+        file.write("\n")
+
+
+def bench(
+    selection: str = None,
+    threshold: float = DEFAULT_THRESHOLD,
+    update_baseline: bool = False,
+    baseline_file=BASELINE_FILE,
+) -> int:
+    """
+    This function runs the benchmarks, then saves them as the baseline or
+    compares them with it, and prints the regressions.
+
+    Returns:
+        0 if the benchmarks passed without regressions, 1 otherwise.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        output_file = Path(directory) / "results.json"
+        if run_benchmarks(output_file, selection) != 0:
+            return 1
+        results = load_results(output_file)
+
+    if update_baseline:
+        save_baseline(results, baseline_file)
+        print(f"Saved {len(results)} benchmarks as the baseline in {baseline_file}")
+        return 0
+
+    if not Path(baseline_file).exists():
+        print(f"No baseline in {baseline_file}, save one with --save-baseline")
+        return 0
+
+    with open(baseline_file) as file:
+        baseline = json.load(file)
+    regressions = compare(results, baseline, threshold)
+
+    for name, before, after, ratio in regressions:
+        print(f"REGRESSION {name}: {before * 1000:.3f}ms -> {after * 1000:.3f}ms ({ratio:.2f}x)")
+    print(
+        f"{len(results)} benchmarks, {len(regressions)} slower than the baseline "
+        f"by more than {threshold:.0%}"
+    )
+
+    return 1 if regressions else 0
@@ -0,0 +1,145 @@
+"""
+This file computes the statistics box plots are drawn from on the server, so
+the box plot figures only carry five numbers and the outliers per box instead
+of every row of the data. The statistics of every group of the x and color
+variables are computed together with grouped NumPy operations: the values are
+sorted once by group and by value, and the quartiles, whiskers and outliers of
+each group are read at offsets into the sorted values.
+
+The statistics follow plotly's own box plots (quartilemethod="linear"):
+
+    quartile p        the sorted values interpolated at position p * n - 0.5
+    lower whisker     the smallest value at or above q1 - 1.5 * (q3 - q1)
+    upper whisker     the largest value at or below q3 + 1.5 * (q3 - q1)
+    outliers          the values beyond the whiskers
+
+Outliers are kept once per distinct value, since points drawn on top of each
+other look the same. The statistics are cached for the latest version of the
+data.
+"""
+
+import threading
+import numpy as np
+import pandas as pd
+
+# length of the whiskers, in interquartile ranges
+WHISKER = 1.5
+
+# (data version, y column, x column, color column) -> BoxStats
+_boxes = {}
+_lock = threading.Lock()
+
+
+def _levels(frame, column):
+    """
+    Returns the codes of a column and its values in order of appearance (the
+    order plotly express draws them in), or a single level for no column.
+    """
+    if column is None:
+        return np.zeros(len(frame), dtype=np.int64), [None]
+    codes, levels = pd.factorize(frame[column], sort=False)
+    return codes, list(levels)
+
+
+class BoxStats:
+    """
+    The box plot statistics of `y` for every combination of the levels of
+    the x and color columns.
+
+    Attributes (arrays with one row per color level and one column per x
+    level; groups without data have a count of 0 and NaN statistics):
+        x_levels, color_levels: the levels, in order of appearance.
+        count: the number of values in each group.
+        q1, median, q3: the quartiles.
+        lowerfence, upperfence: the ends of the whiskers.
+        outliers: the distinct outliers of each group, as lists of floats.
+    """
+
+    def __init__(self, frame, y: str, x: str = None, color: str = None):
+        x_codes, self.x_levels = _levels(frame, x)
+        color_codes, self.color_levels = _levels(frame, color)
+        shape = (len(self.color_levels), len(self.x_levels))
+
+        values = frame[y].to_numpy(dtype=float)
+        groups = color_codes * shape[1] + x_codes
+        used = ~np.isnan(values) & (x_codes >= 0) & (color_codes >= 0)
+        values, groups = values[used], groups[used]
+
+        # sorted by group, then by value
+        order = np.lexsort((values, groups))
+        values, groups = values[order], groups[order]
+        count = np.bincount(groups, minlength=shape[0] * shape[1])
+        start = np.cumsum(count) - count
+        last = np.maximum(count - 1, 0)
+        # offsets of the last group may point one past the end of the values
+        padded = np.append(values, np.nan)
+
+        def quantile(p):
+            position = np.clip(p * count - 0.5, 0, last)
+            below = np.floor(position).astype(np.int64)
+            fraction = position - below
+            lower = padded[start + below]
+            upper = padded[start + np.minimum(below + 1, last)]
+            return np.where(count > 0, lower + (upper - lower) * fraction, np.nan)
+
+        q1, median, q3 = quantile(0.25), quantile(0.5), quantile(0.75)
+        low = q1 - WHISKER * (q3 - q1)
+        high = q3 + WHISKER * (q3 - q1)
+
+        # the values are sorted in each group, so the whiskers are found by
+        # counting the values beyond them
+        beyond_low = values < low[groups]
+        beyond_high = values > high[groups]
+        n_low = np.bincount(groups[beyond_low], minlength=len(count))
+        n_high = np.bincount(groups[beyond_high], minlength=len(count))
+        lowerfence = np.minimum(q1, padded[start + n_low])
+        upperfence = np.maximum(q3, padded[np.maximum(start + count - 1 - n_high, start)])
+
+        # distinct outliers of each group
+        outlying = beyond_low | beyond_high
+        outlier_values, outlier_groups = values[outlying], groups[outlying]
+        distinct = np.ones(len(outlier_values), dtype=bool)
+        distinct[1:] = (np.diff(outlier_groups) != 0) | (np.diff(outlier_values) != 0)
+        outlier_values, outlier_groups = outlier_values[distinct], outlier_groups[distinct]
+        bounds = np.searchsorted(outlier_groups, np.arange(len(count) + 1))
+        outliers = [
+            outlier_values[bounds[group] : bounds[group + 1]].tolist()
+            for group in range(len(count))
+        ]
+
+        self.count = count.reshape(shape)
+        self.q1 = q1.reshape(shape)
+        self.median = median.reshape(shape)
+        self.q3 = q3.reshape(shape)
+        self.lowerfence = lowerfence.reshape(shape)
+        self.upperfence = upperfence.reshape(shape)
+        self.outliers = [outliers[i * shape[1] : (i + 1) * shape[1]] for i in range(shape[0])]
+
+
+def box_stats(version: str, frame, y: str, x: str = None, color: str = None) -> BoxStats:
+    """
+    This function returns the box plot statistics of `y` by `x` and `color`,
+    computing them only once per version of the data. Only the latest version
+    is kept.
+
+    Parameters:
+        version: the version of the data in `frame`, part of the cache key.
+        frame: data frame holding the y, x and color columns.
+        y: the name of the column the boxes summarize.
+        x: the column with one box per level, or None for a single box.
+        color: the column with one trace per level, or None for one trace.
+
+    Returns:
+        The BoxStats of the groups.
+    """
+    key = (version, y, x, color)
+    with _lock:
+        stats = _boxes.get(key)
+        if stats is None:
+            stats = BoxStats(frame, y, x, color)
+            # the statistics of older versions of the data are not used again
+            for old_key in [old_key for old_key in _boxes if old_key[1:] == key[1:]]:
+                del _boxes[old_key]
+            _boxes[key] = stats
+
+    return stats
@@ -0,0 +1,143 @@
+"""
+This file stores the datasets the dashboards load (the merged KFF data and the
+cleaned regional data) as Parquet files next to their CSVs. The Parquet files
+keep the column types, with the state and demographic columns stored as
+categoricals, so loading them needs no text parsing or type casting and the
+loaded frames take less memory.
+
+The CSVs are still written, as the export format. Loaders read the Parquet
+file when it is at least as new as its CSV, and the CSV otherwise (for
+example when the CSV was edited by hand).
+
+A CSV written in chunks gets its Parquet copy written in the same chunks, one
+row group each, with a ColumnarWriter.
+"""
+
+import os
+from pathlib import Path
+import pandas as pd
+
+# columns stored as categoricals, in any dataset that has them
+CATEGORICAL_COLUMNS = [
+    "state",
+    "abbrev",
+    "region",
+    "race",
+    "education",
+    "ten_year_age_groups",
+]
+
+
+def columnar_path(csv_path) -> Path:
+    """
+    This function returns the path of the Parquet file kept for a CSV.
+    """
+    return Path(csv_path).with_suffix(".parquet")
+
+
+def typed_frame(frame):
+    """
+    This function returns the frame with its categorical columns converted.
+    """
+    categoricals = {
+        column: "category" for column in CATEGORICAL_COLUMNS if column in frame
+    }
+
+    return frame.astype(categoricals)
+
+
+def write_columnar(frame, csv_path) -> Path:
+    """
+    This function writes the Parquet file for a CSV from the frame the CSV
+    was written from.
+
+    Parameters:
+        frame: the data frame written to the CSV.
+        csv_path: the path to the CSV.
+
+    Returns:
+        The path to the Parquet file.
+    """
+    path = columnar_path(csv_path)
+    temp_path = path.with_name(path.name + ".tmp")
+    typed_frame(frame).to_parquet(temp_path, engine="pyarrow", index=False)
+    temp_path.replace(path)
+
+    return path
+
+
+class ColumnarWriter:
+    """
+    Writer of the Parquet file for a CSV written in chunks, used as a context
+    manager: each chunk passed to `write` is stored as a row group, and the
+    file replaces the previous one when the context exits without an error.
+    Chunks may have different categories; their codes are stored as int32.
+    """
+
+    def __init__(self, csv_path):
+        self.path = columnar_path(csv_path)
+        self._temp_path = self.path.with_name(self.path.name + ".tmp")
+        self._schema = None
+        self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def write(self, frame):
+        """
+        This function appends the rows of a chunk, typed like write_columnar.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(typed_frame(frame), preserve_index=False)
+        if self._writer is None:
+            self._schema = pa.schema(
+                [
+                    field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+                    if pa.types.is_dictionary(field.type)
+                    else field
+                    for field in table.schema
+                ],
+                metadata=table.schema.metadata,
+            )
+            self._writer = pq.ParquetWriter(self._temp_path, self._schema)
+        self._writer.write_table(table.cast(self._schema))
+
+    def __exit__(self, exc_type, *exc_info):
+        if self._writer is not None:
+            self._writer.close()
+        if exc_type is None and self._writer is not None:
+            os.replace(self._temp_path, self.path)
+        else:
+            self._temp_path.unlink(missing_ok=True)
+
+
+def read_table(csv_path):
+    """
+    This function loads a dataset, from its Parquet file when that is up to
+    date, and from the CSV otherwise.
+
+    Parameters:
+        csv_path: the path to the CSV.
+
+    Returns:
+        The data frame, with categorical columns if it was read from Parquet.
+    """
+    csv_path = Path(csv_path)
+    path = columnar_path(csv_path)
+
+    if path.exists() and (
+        not csv_path.exists() or path.stat().st_mtime_ns >= csv_path.stat().st_mtime_ns
+    ):
+        frame = pd.read_parquet(path, engine="pyarrow")
+        # the categories of a file written in chunks are in order of appearance
+        return frame.astype(
+            {
+                column: pd.CategoricalDtype(sorted(frame[column].cat.categories))
+                for column in CATEGORICAL_COLUMNS
+                if column in frame and isinstance(frame[column].dtype, pd.CategoricalDtype)
+            }
+        )
+
+    return pd.read_csv(csv_path)
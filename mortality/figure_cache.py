@@ -0,0 +1,132 @@
+"""
+This file caches the figures of the map dashboard. There are only a handful of
+figures (two maps and one scatter plot per x-axis), so each is built once with
+plotly for the current version of its data, serialized to JSON, and served
+from memory by the callbacks afterwards.
+
+Figures can also be kept in a directory on disk, shared by every process that
+points at it: a worker that starts after the figures were built reads them
+instead of building them again. Because the data version is part of the key,
+figures built from older data are never served. Only the latest version of
+each figure is kept: storing a figure for new data drops the older versions
+of it, from memory and from the figure store.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+FIGURE_STORE = BASE_DIR / "data/.figure_cache"
+
+# (kind, parameters, data version) -> figure as a json dictionary
+_figures = {}
+_store = {"directory": None}
+_stats = {"hits": 0, "disk_hits": 0, "misses": 0}
+_lock = threading.Lock()
+
+
+def set_figure_store(directory=FIGURE_STORE):
+    """
+    This function turns on the on-disk figure store (or off, for None).
+    """
+    _store["directory"] = None if directory is None else Path(directory)
+
+
+def _digest(value) -> str:
+    return hashlib.sha256(json.dumps(value).encode("utf-8")).hexdigest()
+
+
+def _store_path(key: tuple) -> Path:
+    # the figure's digest comes first, so its other versions can be found
+    kind, params, version = key
+    return _store["directory"] / f"{_digest([kind, params])}-{_digest(version)}.json"
+
+
+def _read_store(key: tuple):
+    if _store["directory"] is None:
+        return None
+    path = _store_path(key)
+    if not path.exists():
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+
+def _write_store(key: tuple, text: str):
+    if _store["directory"] is None:
+        return
+    path = _store_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # unique temporary name, so workers building the same figure do not clash
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    temp_path.write_text(text, encoding="utf-8")
+    os.replace(temp_path, path)
+
+    figure_digest = path.name.split("-")[0]
+    for old_path in path.parent.glob(f"{figure_digest}-*.json"):
+        if old_path != path:
+            old_path.unlink(missing_ok=True)
+
+
+def get_figure(kind: str, params: tuple, version: str, build) -> dict:
+    """
+    This function returns a figure as a json dictionary, building it only if
+    it is neither in memory nor in the figure store.
+
+    Parameters:
+        kind: the kind of figure, e.g. "map" or "scatter".
+        params: tuple of the values the figure depends on, e.g. the x-axis.
+        version: the version of the data the figure is built from.
+        build: a function with no arguments that returns the plotly figure.
+
+    Returns:
+        The figure as a dictionary, which Dash can send as it is. It is shared
+        between callers and must not be modified.
+    """
+    key = (kind, list(params), version)
+    memory_key = (kind, tuple(params), version)
+
+    with _lock:
+        figure = _figures.get(memory_key)
+        if figure is not None:
+            _stats["hits"] += 1
+            return figure
+
+    figure = _read_store(key)
+    if figure is not None:
+        counter = "disk_hits"
+    else:
+        counter = "misses"
+        text = build().to_json()
+        _write_store(key, text)
+        figure = json.loads(text)
+
+    with _lock:
+        _stats[counter] += 1
+        for old_key in [old_key for old_key in _figures if old_key[:2] == memory_key[:2]]:
+            del _figures[old_key]
+        _figures[memory_key] = figure
+
+    return figure
+
+
+def figure_stats() -> dict:
+    """
+    This function returns the number of figures served from memory, from the
+    figure store, and built, and how many figures are held in memory.
+    """
+    with _lock:
+        return {**_stats, "figures": len(_figures)}
+
+
+def clear_figures():
+    """
+    This function empties the in-memory cache (the figure store is kept).
+    """
+    with _lock:
+        _figures.clear()
+        for counter in _stats:
+            _stats[counter] = 0
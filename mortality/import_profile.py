@@ -0,0 +1,108 @@
+"""
+This file measures how long importing each module takes, from inside the
+running process, like `python -X importtime` does for a whole run. While an
+ImportProfiler is active, it finds every newly imported module through the
+other import finders and times the execution of the module, both with the
+modules it imports (cumulative) and without them (self).
+
+It is used by `python -m mortality --profile-imports <command>` to show which
+modules a subcommand spends its startup time importing.
+"""
+
+import sys
+import time
+
+
+class _TimedLoader:
+    """
+    Loader timing the execution of a module, handing everything else to the
+    loader that found the module.
+    """
+
+    def __init__(self, loader, name: str, profiler):
+        self._loader = loader
+        self._name = name
+        self._profiler = profiler
+
+    def __getattr__(self, attribute):
+        return getattr(self._loader, attribute)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._profiler._start()
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler._stop(self._name, time.perf_counter() - start)
+
+
+class ImportProfiler:
+    """
+    Import finder recording the import time of every module imported while
+    it is active (as a context manager).
+
+    Attributes:
+        timings: dictionary mapping each imported module to its cumulative
+            and self seconds, in the order the imports finished
+        total: seconds spent importing, over the modules imported directly
+    """
+
+    def __init__(self):
+        self.timings = {}
+        self.total = 0.0
+        # seconds spent in the imports of each module being imported
+        self._children = []
+
+    def __enter__(self):
+        sys.meta_path.insert(0, self)
+        return self
+
+    def __exit__(self, *exc_info):
+        sys.meta_path.remove(self)
+
+    def find_spec(self, name, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                spec.loader = _TimedLoader(spec.loader, name, self)
+            return spec
+
+        return None
+
+    def _start(self):
+        self._children.append(0.0)
+
+    def _stop(self, name: str, seconds: float):
+        children = self._children.pop()
+        self.timings[name] = (seconds, seconds - children)
+        if self._children:
+            self._children[-1] += seconds
+        else:
+            self.total += seconds
+
+    def report(self, limit: int = 25) -> str:
+        """
+        This function returns the slowest imports as a table, slowest first.
+
+        Parameters:
+            limit: the number of modules to list.
+
+        Returns:
+            The table, with the cumulative and self milliseconds per module.
+        """
+        slowest = sorted(self.timings.items(), key=lambda item: -item[1][0])[:limit]
+        lines = [f"{'cumulative':>12} {'self':>10}  module"]
+        for name, (cumulative, own) in slowest:
+            lines.append(f"{cumulative * 1000:10.1f}ms {own * 1000:8.1f}ms  {name}")
+        lines.append(
+            f"{len(self.timings)} modules imported in {self.total * 1000:.1f}ms"
+        )
+
+        return "\n".join(lines)
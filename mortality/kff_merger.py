@@ -1,5 +1,9 @@
+import re
 from pathlib import Path
 from mortality.utils import STATE_ABBREVIATIONS
+from mortality.columnar import write_columnar
+from mortality.scrapers.kff_data_sources import DATA_SOURCES
+import numpy as np
 import pandas as pd
 
 """In this file, we are using the scraped data from the KFF website, and we are 
@@ -10,93 +14,346 @@ matching the data correctly, across csv files.
 
 During the merge, a few cleaning steps were taking, to ensure the data is legible
 and consisten when presented in the map. 
+
+The merge is driven by KFF_SCHEMA, which describes every scraped KFF file: the
+column holding the state, and the name and unit of each of its other columns.
+Any columns of any of the files can be merged with `merge_sources`: each file
+that holds one of the requested columns is read and parsed once, and all of
+them are joined at once on the states of the first file. Adding a source only
+means adding its schema.
+
+Importing this file does not read or write anything: the merge runs when
+`merge_kff` is called, e.g. by `python -m mortality build`.
 """
 
+BASE_DIR = Path(__file__).parent.parent
+
+# units of the scraped values: (characters removed before parsing, divisor)
+UNITS = {
+    "number": ("", 1),  # 41.4
+    "count": (",", 1),  # 97,463,300
+    "dollars": ("$,", 1),  # $1,097
+    "percent": ("%", 100),  # 12% -> 0.12
+    "text": None,  # kept as it is
+}
+
+# rows of the files that are not states
+EXCLUDED_ROWS = ["United States", "District of Columbia"]
+
+
+class KFFSource:
+    """
+    The schema of one scraped KFF file.
+
+    Attributes:
+        title: the key of the file in DATA_SOURCES.
+        key: the column of the file holding the state.
+        columns: dictionary mapping each other column of the file to its
+            (merged column name, unit), the names being unique over all files.
+    """
+
+    def __init__(self, title: str, key: str, columns: dict):
+        self.title = title
+        self.key = key
+        self.columns = columns
+
+    @property
+    def file(self) -> str:
+        """The path of the scraped file, relative to the repository."""
+        return DATA_SOURCES[self.title][3]
+
+
+def _same_unit(unit: str, columns: dict) -> dict:
+    # schema of columns sharing a unit: {file column: merged column name}
+    return {column: (name, unit) for column, name in columns.items()}
+
+
+KFF_SCHEMA = {
+    "race": KFFSource(
+        "(dem) Distribution of Women Ages 18-64, by Race/Ethnicity",
+        "state",
+        {
+            "total": ("women_18_64", "count"),
+            **_same_unit(
+                "percent",
+                {
+                    race: f"race_{race}"
+                    for race in ["white", "black", "hispanic", "asian", "nhopi", "aian", "other"]
+                },
+            ),
+        },
+    ),
+    "age": KFFSource(
+        "(dem) Distribution of Women Ages 19 to 64, by Age Group, 2023",
+        "state",
+        {
+            "total": ("women_19_64", "count"),
+            **_same_unit(
+                "percent",
+                {age: age for age in ["age19_25", "age26_34", "age35_54", "age55_64"]},
+            ),
+        },
+    ),
+    "poverty": KFFSource(
+        "(dem) Distribution of Women Ages 18-64, by Federal Poverty Level, 2023",
+        "state",
+        {
+            "total": ("women_18_64_fpl", "count"),
+            **_same_unit(
+                "percent",
+                {
+                    level: level
+                    for level in ["fplless_100", "fpl100_199", "fpl200_399", "fplmore_400"]
+                },
+            ),
+        },
+    ),
+    "earnings": KFFSource(
+        "(dem) Median Weekly Earnings for Women and Men, 2021",
+        "state",
+        {
+            "women_weekly": ("women_earnings", "dollars"),
+            "men_weekly": ("men_earnings", "dollars"),
+            "ratio": ("ratio_earnings", "percent"),
+        },
+    ),
+    "infant_mortality": KFFSource(
+        "(mih) Infant Mortality Rate, 2020-2023",
+        "state",
+        _same_unit(
+            "number",
+            {year: f"infant_mortality_{year}" for year in ["2020", "2021", "2022", "2023"]},
+        ),
+    ),
+    "infant_mortality_re": KFFSource(
+        "(mih) Infant Mortality Rate by Race/Ethnicity, 2020-2023",
+        "state",
+        _same_unit(
+            "number",
+            {
+                "white": "infant_mortality_white",
+                "black or african american": "infant_mortality_black",
+                "hispanic": "infant_mortality_hispanic",
+                "other": "infant_mortality_other",
+            },
+        ),
+    ),
+    "maternal_mortality": KFFSource(
+        "(mih) Maternal Deaths and Mortality Rates per 100,000 live births, 2018-2021",
+        "state",
+        {
+            "number of deaths": ("maternal_deaths", "count"),
+            "Maternal Mortality Rate per 100,000 live Births": ("mortality", "number"),
+        },
+    ),
+    "cesarean": KFFSource(
+        "(mih) Cesarean Deliveries as a Percentage of All Births, 2021",
+        "state",
+        _same_unit(
+            "percent", {"cesarean": "cesarean", "low-risk cesarean": "low_risk_cesarean"}
+        ),
+    ),
+    "cesarean_re": KFFSource(
+        "(mih) Cesarean Deliveries as a Percentage of All Births by Race/Ethnicity, 2021",
+        "state",
+        _same_unit(
+            "percent",
+            {race: f"cesarean_{race}" for race in ["white", "black", "hispanic"]},
+        ),
+    ),
+    # the scraped header names the state column "Employer"
+    "coverage": KFFSource(
+        "(cov) Health Insurance Coverage of Women Ages 19-64, 2023",
+        "Employer",
+        _same_unit(
+            "percent",
+            {
+                "Non-Group": "coverage_non_group",
+                "Medicaid": "coverage_medicaid",
+                "Other": "coverage_other",
+                "Uninsured": "uninsured",
+            },
+        ),
+    ),
+    "uninsured": KFFSource(
+        "(cov) Uninsured Rates of Women Ages 19-64, 2010–2023",
+        "state",
+        _same_unit(
+            "percent", {str(year): f"uninsured_{year}" for year in range(2010, 2024)}
+        ),
+    ),
+    "medicaid_expansion": KFFSource(
+        "(cov) Status of State Action on the Medicaid Expansion Decision, as of November 2024",
+        "state",
+        {"Status of Medicaid Expansion Decision": ("medicaid_expansion", "text")},
+    ),
+    "postpartum_coverage": KFFSource(
+        "(cov) Status of Medicaid Postpartum Coverage Extensions, as of January 6, 2025",
+        "state",
+        {"status of state action": ("postpartum_coverage", "text")},
+    ),
+}
+
+# the columns of the merged data the map shows, in order
+MAP_COLUMNS = ["mortality", "uninsured", "women_earnings", "ratio_earnings", "cesarean"]
+
 # paths to the files we are merging
-maternal_mortality_path = Path(__file__).parent.parent.joinpath(
-    "data/scrape_data/kff_maternal_mortality.csv"
-)
-coverage_path = Path(__file__).parent.parent.joinpath(
-    "data/scrape_data/kff_coverage.csv"
-)
-earnings_path = Path(__file__).parent.parent.joinpath(
-    "data/scrape_data/kff_earnings.csv"
-)
-cesarean_path = Path(__file__).parent.parent.joinpath(
-    "data/scrape_data/kff_cesarean.csv"
-)
+maternal_mortality_path = BASE_DIR / KFF_SCHEMA["maternal_mortality"].file
+coverage_path = BASE_DIR / KFF_SCHEMA["coverage"].file
+earnings_path = BASE_DIR / KFF_SCHEMA["earnings"].file
+cesarean_path = BASE_DIR / KFF_SCHEMA["cesarean"].file
 
 # path we are creating for new csv
-merged_kff = Path(__file__).parent.parent.joinpath("data/merged_kff.csv")
-
-# loading the csv files
-mortality = pd.read_csv(maternal_mortality_path)
-coverage = pd.read_csv(coverage_path)
-earnings = pd.read_csv(earnings_path)
-cesarean = pd.read_csv(cesarean_path)
-
-# cleaning files: earnings
-earnings["women_weekly"] = (
-    earnings["women_weekly"]
-    .astype(str)
-    .str.replace(r"[\$,]", "", regex=True)
-    .astype(float)
-)
-earnings["ratio_earings_to_men"] = (
-    earnings["ratio"].astype(str).str.rstrip("%").astype(float) / 100
-)
-
-# cleaning files: coverage
-coverage.rename(
-    columns={"Employer": "state"}, inplace=True
-)  # rename column for merging
-coverage["Uninsured"] = (
-    coverage["Uninsured"].astype(str).str.rstrip("%").astype(float) / 100
-)  # Convert Uninsured to decimal
-
-# cleaning files: cesarean
-cesarean["cesarean"] = (
-    cesarean["cesarean"].astype(str).str.rstrip("%").astype(float) / 100
-)  # Convert cesarean to decimal
-
-# cleaning files: mortality
-mortality["Maternal Mortality Rate per 100,000 live Births"] = mortality[
-    "Maternal Mortality Rate per 100,000 live Births"
-].apply(lambda x: None if x == "NR" else x)
-mortality["Maternal Mortality Rate per 100,000 live Births"] = mortality[
-    "Maternal Mortality Rate per 100,000 live Births"
-].astype(float)
-
-# extracting specific columns
-mortality = mortality[["state", "Maternal Mortality Rate per 100,000 live Births"]]
-coverage = coverage[["state", "Uninsured"]]
-earnings = earnings[["state", "women_weekly", "ratio_earings_to_men"]]
-cesarean = cesarean[["state", "cesarean"]]
-
-# merging all data on state column
-merged_df = (
-    mortality.merge(coverage, on="state", how="inner")
-    .merge(earnings, on="state", how="inner")
-    .merge(cesarean, on="state", how="inner")
-)
-
-# adding the column of abbreviation from dictionary "STATE_ABBREVIATION"
-merged_df["state_abbreviation"] = merged_df["state"].map(STATE_ABBREVIATIONS)
-
-# removing DC and United States rows
-merged_df = merged_df[merged_df["state"] != "United States"]
-merged_df = merged_df[merged_df["state"] != "District of Columbia"]
-
-# change column names
-merged_df.columns = [
-    "state",
-    "mortality",
-    "uninsured",
-    "women_earnings",
-    "ratio_earnings",
-    "cesarean",
-    "abbrev",
-]
-
-# saving the merged data
-merged_df.to_csv(merged_kff, index=False)
+merged_kff = BASE_DIR.joinpath("data/merged_kff.csv")
+
+
+def parse_values(values, unit: str) -> np.ndarray:
+    """
+    This function parses the scraped values of a column into numbers, values
+    that are not numbers (e.g. "NR", "N/A", "NSD") becoming NaN. Only the
+    distinct values are parsed, since many states share a value.
+
+    Parameters:
+        values: Pandas series of the values as text.
+        unit: the unit of the values, a key of UNITS.
+
+    Returns:
+        array of floats, or of the values as they are for "text"
+    """
+    if UNITS[unit] is None:
+        return values.to_numpy()
+    removed, divisor = UNITS[unit]
+
+    codes, distinct = pd.factorize(values)
+    text = pd.Series(distinct, dtype=object)
+    if removed:
+        text = text.str.replace(f"[{re.escape(removed)}]", "", regex=True)
+    text = text.str.strip()
+    numbers = text.where(text.str.fullmatch(r"-?\d+(?:\.\d+)?")).astype(float)
+    if divisor != 1:
+        numbers = numbers / divisor
+
+    # values missing from the file have the code -1, read as the appended NaN
+    return np.append(numbers.to_numpy(), np.nan)[codes]
+
+
+def read_source(source: KFFSource, path, columns: list) -> pd.DataFrame:
+    """
+    This function reads the given columns of a scraped KFF file into typed
+    columns, indexed by state.
+
+    Parameters:
+        source: the schema of the file.
+        path: the path to the file.
+        columns: the merged names of the columns to read.
+
+    Returns:
+        Pandas dataframe with the columns, in the order of `columns`
+    """
+    file_columns = {name: (column, unit) for column, (name, unit) in source.columns.items()}
+    usecols = [source.key] + [file_columns[name][0] for name in columns]
+    raw = pd.read_csv(path, usecols=usecols, dtype=str)
+    if raw[source.key].duplicated().any():
+        raise ValueError(f"{path} has several rows for the same state")
+
+    return pd.DataFrame(
+        {
+            name: parse_values(raw[file_columns[name][0]], file_columns[name][1])
+            for name in columns
+        },
+        index=pd.Index(raw[source.key], name="state"),
+    )
+
+
+def merge_sources(columns: list, paths: dict = None, root=BASE_DIR) -> pd.DataFrame:
+    """
+    This function merges columns of the scraped KFF files on the state. The
+    files holding the columns are read once each, and joined in one step: the
+    merged rows are the states of the first file (in its order) found in
+    every file, without the United States and District of Columbia rows.
+
+    Parameters:
+        columns: the merged names of the columns (see KFF_SCHEMA), in order.
+        paths: dictionary mapping a source of KFF_SCHEMA to the path of its
+            file, for files not at their usual place under `root`.
+        root: the directory holding the `data/scrape_data` files.
+
+    Returns:
+        Pandas dataframe with a state column, then the requested columns
+    """
+    owners = {
+        name: source_name
+        for source_name, source in KFF_SCHEMA.items()
+        for name, _ in source.columns.values()
+    }
+    unknown = [name for name in columns if name not in owners]
+    if unknown:
+        raise ValueError(f"No KFF source has the columns {unknown}")
+
+    # columns to read from each source, the sources in order of first use
+    requested = {}
+    for name in columns:
+        requested.setdefault(owners[name], []).append(name)
+    paths = paths or {}
+    frames = [
+        read_source(
+            KFF_SCHEMA[source_name],
+            paths.get(source_name, Path(root) / KFF_SCHEMA[source_name].file),
+            names,
+        )
+        for source_name, names in requested.items()
+    ]
+
+    # positions of the states of the first file in every file
+    states = frames[0].index
+    positions = []
+    for frame in frames:
+        positions.append(frame.index.get_indexer(states))
+    found = np.logical_and.reduce([position >= 0 for position in positions])
+    found &= ~states.isin(EXCLUDED_ROWS)
+
+    merged = {"state": states[found].to_numpy()}
+    for frame, position in zip(frames, positions):
+        for name in frame.columns:
+            merged[name] = frame[name].to_numpy()[position[found]]
+
+    return pd.DataFrame(merged)[["state"] + list(columns)]
+
+
+def merge_kff(
+    maternal_mortality_path=maternal_mortality_path,
+    coverage_path=coverage_path,
+    earnings_path=earnings_path,
+    cesarean_path=cesarean_path,
+    output_path=merged_kff,
+):
+    """
+    Merges the map columns (MAP_COLUMNS) of the scraped maternal mortality,
+    coverage, earnings and cesarean csv files on the state column and writes
+    the merged csv, along with its typed Parquet copy.
+
+    Inputs: paths to the four scraped csv files, and the output path
+    Outputs: the merged Pandas dataframe
+    """
+    merged_df = merge_sources(
+        MAP_COLUMNS,
+        {
+            "maternal_mortality": maternal_mortality_path,
+            "coverage": coverage_path,
+            "earnings": earnings_path,
+            "cesarean": cesarean_path,
+        },
+    )
+
+    # adding the column of abbreviation from dictionary "STATE_ABBREVIATION"
+    merged_df["abbrev"] = merged_df["state"].map(STATE_ABBREVIATIONS)
+
+    # saving the merged data
+    merged_df.to_csv(output_path, index=False)
+    write_columnar(merged_df, output_path)
+
+    return merged_df
+
+
+if __name__ == "__main__":
+    merge_kff()
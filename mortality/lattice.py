@@ -0,0 +1,144 @@
+"""
+This file precomputes the predicted maternal mortality for every combination
+of region, race, education and age group. The inputs to the predictive model
+are four categorical dropdowns with a small, finite set of options, so the
+whole grid can be scored with one vectorized `predict` call and stored as a
+dense NumPy array indexed by category codes. A prediction then becomes an
+array lookup instead of a model call on a one-row DataFrame.
+
+The lattice can be written to disk (a `.npy` array and a `.json` file with the
+category levels) so dashboard workers can memory-map it instead of fitting the
+model themselves. The files are replaced rather than rewritten, so workers
+that mapped the previous lattice keep reading it until they reload.
+"""
+
+import json
+import os
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+LATTICE_FILE = Path(__file__).parent.parent.joinpath("data/model/prediction_lattice.npy")
+
+
+class PredictionLattice:
+    """
+    Dense array of predictions with one axis per independent variable.
+
+    Attributes:
+        levels: dictionary mapping each variable to its list of categories,
+            in the order of the array axis
+        values: array of predicted probabilities, shaped by the levels
+        fingerprint: hash of the data file the model was trained on
+        formula: the model formula the lattice was scored with
+    """
+
+    def __init__(self, levels: dict, values, fingerprint=None, formula=None):
+        self.levels = levels
+        self.values = values
+        self.fingerprint = fingerprint
+        self.formula = formula
+        self.codes = {
+            variable: {level: code for code, level in enumerate(categories)}
+            for variable, categories in levels.items()
+        }
+
+    def lookup(self, *categories) -> float:
+        """
+        Look up the prediction for one category of each variable, given in the
+        same order as `levels`. Raises KeyError for an unknown category.
+        """
+        index = tuple(
+            self.codes[variable][category]
+            for variable, category in zip(self.levels, categories)
+        )
+
+        return round(float(self.values[index]), 3)
+
+
+def category_levels(mortality_data, variables: list) -> dict:
+    """
+    Collect the sorted categories of each independent variable.
+
+    Parameters:
+        mortality_data (DataFrame): the data the model was trained on
+        variables (list): the independent variables
+
+    Returns:
+        dictionary mapping each variable to its sorted list of categories
+    """
+    return {
+        variable: sorted(str(level) for level in mortality_data[variable].unique())
+        for variable in variables
+    }
+
+
+def build_lattice(model, levels: dict, fingerprint=None, formula=None):
+    """
+    Score every combination of categories with a single `predict` call.
+
+    Parameters:
+        model: fitted model with a `predict` method taking a DataFrame
+        levels (dict): categories of each variable, see `category_levels`
+        fingerprint (str): hash of the training data, stored with the lattice
+        formula (str): model formula, stored with the lattice
+
+    Returns:
+        PredictionLattice
+    """
+    grid = pd.MultiIndex.from_product(
+        list(levels.values()), names=list(levels)
+    ).to_frame(index=False)
+
+    shape = tuple(len(categories) for categories in levels.values())
+    values = np.asarray(model.predict(grid), dtype=np.float64).reshape(shape)
+
+    return PredictionLattice(levels, values, fingerprint, formula)
+
+
+def save_lattice(lattice: PredictionLattice, path=LATTICE_FILE):
+    """
+    Write the lattice array to `path` and its category levels next to it, in a
+    `.json` file with the same name. Each file is written to a temporary file
+    and moved into place, the levels last.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    meta_path = path.with_suffix(".json")
+
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, "wb") as file:
+        np.save(file, lattice.values)
+    os.replace(temp_path, path)
+
+    meta = {
+        "levels": lattice.levels,
+        "fingerprint": lattice.fingerprint,
+        "formula": lattice.formula,
+    }
+    temp_path = meta_path.with_name(meta_path.name + ".tmp")
+    with open(temp_path, "w") as file:
+        json.dump(meta, file, indent=2)
+    os.replace(temp_path, meta_path)
+
+
+def load_lattice(path=LATTICE_FILE, mmap: bool = True):
+    """
+    Read a lattice written by `save_lattice`. By default the array is
+    memory-mapped, so several processes share one copy through the page cache.
+
+    Returns:
+        PredictionLattice, or None if no lattice has been written to `path`
+    """
+    path = Path(path)
+    meta_path = path.with_suffix(".json")
+    if not path.exists() or not meta_path.exists():
+        return None
+
+    with open(meta_path) as file:
+        meta = json.load(file)
+    values = np.load(path, mmap_mode="r" if mmap else None)
+
+    return PredictionLattice(
+        meta["levels"], values, meta.get("fingerprint"), meta.get("formula")
+    )
@@ -0,0 +1,102 @@
+"""
+This file keeps the data behind the map dashboard in memory. Each CSV is read
+and cleaned once per process, and the result is shared by all the callbacks
+(the maps, the table and the scatter plot) instead of every callback reading
+the file from disk again.
+
+A frame is only reloaded when the contents of its file change: the file's
+modification time and size are checked on every access, and the file is
+re-hashed (and re-read, if the hash differs) only when one of those changes.
+
+Callbacks receive shallow copies of the cached frames. They share the cached
+data, so they are cheap to hand out, and adding or replacing columns on a copy
+leaves the cache untouched. The arrays of the cached frames are read-only, so
+editing values in place raises ValueError instead of changing the cache.
+"""
+
+import threading
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from mortality.model_registry import file_fingerprint
+
+# (resolved file, loader, loader arguments) -> (fingerprint, frame)
+_frames = {}
+_stats = {"hits": 0, "misses": 0}
+_lock = threading.Lock()
+
+
+def _read_only(frame):
+    """
+    This function returns a copy of a data frame whose NumPy and categorical
+    columns are held in read-only arrays.
+    """
+    columns = {}
+    for column, series in frame.items():
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy().copy()
+            codes.flags.writeable = False
+            values = pd.Categorical.from_codes(codes, dtype=series.dtype, validate=False)
+        elif isinstance(series.dtype, np.dtype):
+            values = series.to_numpy().copy()
+            values.flags.writeable = False
+        else:
+            values = series.array
+        columns[column] = values
+
+    return pd.DataFrame(columns, index=frame.index, copy=False)
+
+
+def get_frame(file, loader, *args):
+    """
+    This function returns the data frame `loader(file, *args)` builds, loading
+    it only if the cache does not hold one for the current contents of the file.
+
+    Parameters:
+        file: the path to the CSV.
+        loader: a function taking (file, *args) that returns a data frame.
+        args: the extra arguments for the loader, part of the cache key.
+
+    Returns:
+        A shallow copy of the cached data frame, whose values are read-only.
+    """
+    key = (Path(file).resolve(), loader, args)
+    fingerprint = file_fingerprint(file)
+
+    with _lock:
+        cached = _frames.get(key)
+        if cached is not None and cached[0] == fingerprint:
+            _stats["hits"] += 1
+        else:
+            _stats["misses"] += 1
+            cached = (fingerprint, _read_only(loader(file, *args)))
+            _frames[key] = cached
+
+    return cached[1].copy(deep=False)
+
+
+def data_version(file) -> str:
+    """
+    This function returns a version for the contents of a file (its sha256),
+    which changes exactly when the cached frames for the file are reloaded.
+    """
+    return file_fingerprint(file)
+
+
+def frame_stats() -> dict:
+    """
+    This function returns the number of cache hits and misses, and how many
+    frames are held.
+    """
+    with _lock:
+        return {**_stats, "frames": len(_frames)}
+
+
+def clear_frames():
+    """
+    This function empties the cache, so the next access reloads every file.
+    """
+    with _lock:
+        _frames.clear()
+        _stats["hits"] = 0
+        _stats["misses"] = 0
@@ -1,22 +1,37 @@
-import pandas as pd
 from pathlib import Path
 import plotly.express as px
-from dash import Dash, html, dash_table, dcc, callback, Output, Input
-import statsmodels.api as sm
+from dash import Dash, html, dash_table, dcc, Output, Input
+from mortality.columnar import read_table
+from mortality.map_data import data_version, get_frame
+from mortality.figure_cache import get_figure, set_figure_store
+from mortality.table_index import table_index
+from mortality.trend_lines import trend_lines
+from mortality.metrics import add_metrics_endpoint, timed
 
 MERGED = Path(__file__).parent.parent.joinpath("data/merged_kff.csv")
 ABORTION_LAWS = Path(__file__).parent.parent.joinpath("data/scrape_data/abortion.csv")
+ASSETS_FOLDER = Path(__file__).parent.joinpath("assets")
+
+MAP_OPTIONS = ["Maternal Mortality Rates", "Statutory Limits on Abortion"]
+SCATTER_OPTIONS = [
+    "Percent Uninsured",
+    "Women's Average Weekly Earnings",
+    "Ratio of Women's Earnings to Men's Earnings",
+    "Percent Cesarean Births",
+]
+TABLE_PAGE_SIZE = 10
 
 
 def load_data(file, abortion):
     """
-    Loads in the example CSV for visualizations
+    Loads in the example CSV for visualizations, from its typed Parquet copy
+    when there is an up-to-date one
 
-    Inputs: none
+    Inputs: path to the CSV, and whether it is the abortion CSV
     Outputs: Pandas dataframe
     """
 
-    df = pd.read_csv(file)
+    df = read_table(file)
 
     if abortion:  # if we're passing the abortion csv
         df = df[["Location", "Abbreviation", "Statutory Limit on Abortions"]]
@@ -60,7 +75,7 @@ def map_mortalities():
     Inputs: none
     Outputs: plotly figure
     """
-    df = load_data(MERGED, False).dropna()
+    df = get_frame(MERGED, load_data, False).dropna()
 
     fig = px.choropleth(
         locations="Abbreviation",
@@ -98,7 +113,7 @@ def map_abortion_laws():
     Outputs: plotly figure
 
     """
-    df = load_data(ABORTION_LAWS, True)
+    df = get_frame(ABORTION_LAWS, load_data, True)
 
     fig = px.choropleth(
         locations="Abbreviation",
@@ -136,14 +151,17 @@ def scatter_mortality_stats(xaxis):
 
     """
 
-    df = load_data(MERGED, False).dropna()
+    df = get_frame(MERGED, load_data, False).dropna()
     df[xaxis] = df[xaxis].astype(float)
 
-    # manually creating trend line with statsmodel package
-    model = sm.OLS(df["Maternal Mortality Rate per 100,000 Live Births"], 
-                   sm.add_constant(df[xaxis])).fit()
-    
-    df["trend"] = model.predict(sm.add_constant(df[xaxis]))
+    # trend lines of mortality on every x-axis, fit once per version of the data
+    lines = trend_lines(
+        data_version(MERGED),
+        df,
+        "Maternal Mortality Rate per 100,000 Live Births",
+        SCATTER_OPTIONS,
+    )
+    df["trend"] = lines.predict(xaxis, df[xaxis])
 
     fig = px.scatter(
         data_frame=df,
@@ -162,12 +180,109 @@ def scatter_mortality_stats(xaxis):
     return fig
 
 
-def run_app():
+def map_figure(selection):
+    """
+    Returns the selected map from the figure cache, building it if needed
+
+    Inputs: the selected map
+    Outputs: figure as a json dictionary
+    """
+    if selection == "Maternal Mortality Rates":
+        return get_figure("map", (selection,), data_version(MERGED), map_mortalities)
+    return get_figure(
+        "map", (selection,), data_version(ABORTION_LAWS), map_abortion_laws
+    )
+
+
+def scatter_figure(xaxis):
+    """
+    Returns the scatter plot for an x-axis from the figure cache, building it
+    if needed
+
+    Inputs: xaxis specifications for graph
+    Outputs: figure as a json dictionary
+    """
+    return get_figure(
+        "scatter",
+        (xaxis,),
+        data_version(MERGED),
+        lambda: scatter_mortality_stats(xaxis),
+    )
+
+
+def warm_figures():
     """
-    Using dash, display maps, table
+    Builds (or loads from the figure store) every map and scatter plot, and
+    indexes the tables, so no callback has to build a figure or sort a table
+
+    Inputs: none
+    Outputs: none
     """
+    for selection in MAP_OPTIONS:
+        map_figure(selection)
+    for xaxis in SCATTER_OPTIONS:
+        scatter_figure(xaxis)
+    for selection in MAP_OPTIONS:
+        table_page(selection)
+
 
-    app = Dash()
+def table_frame(selection):
+    """
+    Creates the table shown next to the map
+
+    Inputs: the selected map
+    Outputs: data frame, one row per state
+    """
+    if selection == "Maternal Mortality Rates":
+        return get_frame(MERGED, load_data, False).drop(
+            columns=[
+                "Percent Uninsured",
+                "Women's Average Weekly Earnings",
+                "Ratio of Women's Earnings to Men's Earnings",
+                "Percent Cesarean Births",
+                "Abbreviation",
+            ]
+        )
+    return get_frame(ABORTION_LAWS, load_data, True).drop(columns=["Abbreviation"])
+
+
+def table_page(selection, page_current=0, page_size=TABLE_PAGE_SIZE, sort_by=None, filter_query=""):
+    """
+    Returns one page of the table shown next to the map, sorted and filtered
+    on the server from the table's index, built once per version of the data
+
+    Inputs: the selected map, and the DataTable's page_current, page_size,
+        sort_by and filter_query
+    Outputs: the records of the page, the table's columns and the number of
+        pages
+    """
+    file = MERGED if selection == "Maternal Mortality Rates" else ABORTION_LAWS
+    table = table_index(data_version(file), selection, lambda: table_frame(selection))
+    records, page_count = table.page(page_current, page_size, sort_by, filter_query)
+
+    return records, table.columns, page_count
+
+
+def create_map_app(figure_store=None, server=True, url_base_pathname="/"):
+    """
+    Creates the Dash app displaying the maps and table. The data is loaded
+    and every figure built when the app is created, so a server that forks
+    workers afterwards shares them between the workers.
+
+    Inputs: optional directory to share the built figures across processes,
+        the Flask server to add the app to (or True for a new one), and the
+        url the dashboard is served under
+    Outputs: Dash app
+    """
+    set_figure_store(figure_store)
+    warm_figures()
+
+    app = Dash(
+        __name__,
+        server=server,
+        url_base_pathname=url_base_pathname,
+        assets_folder=str(ASSETS_FOLDER),
+    )
     app.layout = html.Div(
         [
             # header
@@ -237,7 +352,7 @@ def run_app():
                 },
             ),
             dcc.RadioItems(
-                options=["Maternal Mortality Rates", "Statutory Limits on Abortion"],
+                options=MAP_OPTIONS,
                 value="Maternal Mortality Rates",
                 id="map_select",
             ),
@@ -257,9 +372,17 @@ def run_app():
                     dcc.Graph(
                         figure={}, id="map", style={"flex": "1", "maxWidth": "800px"}
                     ),
+                    # pages, sorts and filters are computed on the server
                     dash_table.DataTable(
                         data=[],
-                        page_size=10,
+                        page_current=0,
+                        page_size=TABLE_PAGE_SIZE,
+                        page_action="custom",
+                        sort_action="custom",
+                        sort_mode="single",
+                        sort_by=[],
+                        filter_action="custom",
+                        filter_query="",
                         id="table",
                         style_table={"flex": "1", "overflowX": "auto"},
                         style_cell={"textAlign": "center"},
@@ -278,12 +401,7 @@ def run_app():
                 },
             ),
             dcc.RadioItems(
-                options=[
-                    "Percent Uninsured",
-                    "Women's Average Weekly Earnings",
-                    "Ratio of Women's Earnings to Men's Earnings",
-                    "Percent Cesarean Births",
-                ],
+                options=SCATTER_OPTIONS,
                 value="Percent Uninsured",
                 id="scatter_select",
             ),
@@ -306,57 +424,50 @@ def run_app():
         },
     )
 
-    @callback(  # updating map according to selection
+    @app.callback(  # updating map according to selection
         Output(component_id="map", component_property="figure"),
         Input(component_id="map_select", component_property="value"),
     )
+    @timed("update_map")
     def update_map(map):
-        if map == "Maternal Mortality Rates":
-            return map_mortalities()
-        return map_abortion_laws()
+        return map_figure(map)
 
-    @callback(  # updating table according to selection
+    @app.callback(  # updating table according to selection, page, sort and filter
         Output(component_id="table", component_property="data"),
+        Output(component_id="table", component_property="columns"),
+        Output(component_id="table", component_property="page_count"),
         Input(component_id="map_select", component_property="value"),
+        Input(component_id="table", component_property="page_current"),
+        Input(component_id="table", component_property="page_size"),
+        Input(component_id="table", component_property="sort_by"),
+        Input(component_id="table", component_property="filter_query"),
     )
-    def update_table(data):
-        if data == "Maternal Mortality Rates":
-            return (
-                load_data(MERGED, False)
-                .drop(
-                    columns=[
-                        "Percent Uninsured",
-                        "Women's Average Weekly Earnings",
-                        "Ratio of Women's Earnings to Men's Earnings",
-                        "Percent Cesarean Births",
-                        "Abbreviation",
-                    ]
-                )
-                .to_dict("records")
-            )
-        return (
-            load_data(ABORTION_LAWS, True)
-            .drop(columns=["Abbreviation"])
-            .to_dict("records")
-        )
+    @timed("update_table")
+    def update_table(data, page_current, page_size, sort_by, filter_query):
+        return table_page(data, page_current, page_size, sort_by, filter_query)
 
-    @callback(  # updating scatter plot according to selection
+    @app.callback(  # updating scatter plot according to selection
         Output(component_id="scatter", component_property="figure"),
         Input(component_id="scatter_select", component_property="value"),
     )
+    @timed("update_scatter")
     def update_scatter(data):
-        if data == "Percent Uninsured":
-            return scatter_mortality_stats("Percent Uninsured")
-        elif data == "Women's Average Weekly Earnings":
-            return scatter_mortality_stats("Women's Average Weekly Earnings")
-        elif data == "Ratio of Women's Earnings to Men's Earnings":
-            return scatter_mortality_stats(
-                "Ratio of Women's Earnings to Men's Earnings"
-            )
-        elif data == "Percent Cesarean Births":
-            return scatter_mortality_stats("Percent Cesarean Births")
-
-    app.run_server(debug=True, use_reloader=False)
+        if data in SCATTER_OPTIONS:
+            return scatter_figure(data)
+
+    add_metrics_endpoint(app.server)
+
+    return app
+
+
+def run_app(figure_store=None):
+    """
+    Using dash, display maps, table on the Dash development server
+
+    Inputs: optional directory to share the built figures across processes
+    Outputs: none
+    """
+    create_map_app(figure_store).run_server(debug=True, use_reloader=False)
 
 
 if __name__ == "__main__":
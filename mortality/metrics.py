@@ -0,0 +1,337 @@
+"""
+This file measures the dashboards while they run. Every Dash callback is
+wrapped with `timed`, which records how long each call takes in a latency
+histogram for that callback, and the hit and miss counters of the data,
+figure and model caches are read when the metrics are requested.
+
+The metrics are served in the Prometheus text format on `/metrics`:
+
+    mortality_callback_duration_seconds   histogram per callback
+    mortality_callback_latency_seconds    p50, p95 and p99 of recent calls
+    mortality_callback_errors_total       calls that raised an exception
+    mortality_cache_hits_total            hits per cache
+    mortality_cache_misses_total          misses per cache
+
+Recording a call is a clock read, a bisect into the bucket bounds and a few
+additions under a lock, so the instrumentation can stay on in production.
+
+When the dashboards are served by several worker processes, a scrape of
+`/metrics` reaches only one of them. So that it still reports every worker,
+each process writes a snapshot of its metrics to the directory named by the
+MORTALITY_METRICS_DIR environment variable (at most once a second, and when
+it renders the metrics), and `/metrics` adds up the snapshots of all the
+processes: counters and histograms are summed, and the quantiles are computed
+over the recent calls of every worker. `server.serve` sets up the directory
+for its workers. The snapshots of workers that stopped are kept, so the
+counters never go down while the server runs.
+"""
+
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from collections import deque
+from mortality.figure_cache import figure_stats
+from mortality.map_data import frame_stats
+from mortality.model_registry import registry_stats
+
+# upper bounds, in seconds, of the latency histogram buckets
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+# number of recent calls per callback the quantiles are computed from
+WINDOW = 1024
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# directory the processes serving the dashboards share their metrics in
+MULTIPROCESS_ENV = "MORTALITY_METRICS_DIR"
+# seconds between two snapshots of a process's metrics
+FLUSH_SECONDS = 1.0
+
+
+def _nearest_rank(values, quantiles=QUANTILES) -> dict:
+    values = sorted(values)
+    if not values:
+        return {}
+
+    return {
+        quantile: values[min(len(values) - 1, int(quantile * len(values)))]
+        for quantile in quantiles
+    }
+
+
+class LatencyHistogram:
+    """
+    Latencies of one callback: cumulative bucket counts, their sum and count,
+    and the most recent `WINDOW` latencies for the quantiles.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.recent = deque(maxlen=WINDOW)
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counts = [0] * (len(BUCKETS) + 1)
+            self.sum = 0.0
+            self.count = 0
+            self.errors = 0
+            self.recent.clear()
+
+    def observe(self, seconds: float, error: bool = False):
+        with self.lock:
+            self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+            self.sum += seconds
+            self.count += 1
+            self.errors += error
+            self.recent.append(seconds)
+
+    def quantiles(self) -> dict:
+        """
+        This function returns the quantiles of the recent latencies (nearest
+        rank), or an empty dictionary before the first call.
+        """
+        with self.lock:
+            recent = list(self.recent)
+
+        return _nearest_rank(recent)
+
+    def snapshot(self) -> dict:
+        """
+        This function returns the counts, sum, errors and recent latencies.
+        """
+        with self.lock:
+            return {
+                "counts": list(self.counts),
+                "sum": self.sum,
+                "count": self.count,
+                "errors": self.errors,
+                "recent": list(self.recent),
+            }
+
+
+# callback name -> LatencyHistogram
+_histograms = {}
+_lock = threading.Lock()
+# cache (hits, misses) when this process was forked, counted by its parent
+_cache_baseline = {}
+_last_flush = [0.0]
+
+
+def histogram(name: str) -> LatencyHistogram:
+    """
+    This function returns the histogram of a callback, creating it if needed.
+    """
+    with _lock:
+        if name not in _histograms:
+            _histograms[name] = LatencyHistogram()
+        return _histograms[name]
+
+
+def timed(name: str):
+    """
+    This function returns a decorator recording the latency of every call of
+    the decorated function in the histogram `name`.
+    """
+
+    def decorator(function):
+        latencies = histogram(name)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            error = True
+            try:
+                result = function(*args, **kwargs)
+                error = False
+                return result
+            finally:
+                latencies.observe(time.perf_counter() - start, error)
+                if os.environ.get(MULTIPROCESS_ENV):
+                    flush()
+
+        return wrapper
+
+    return decorator
+
+
+def cache_stats() -> dict:
+    """
+    This function returns the (hits, misses) of the data, figure and model
+    caches of this process.
+    """
+    figures = figure_stats()
+    frames = frame_stats()
+    models = registry_stats()
+
+    return {
+        "data": (frames["hits"], frames["misses"]),
+        "figure": (figures["hits"] + figures["disk_hits"], figures["misses"]),
+        "model": (models["hits"], models["misses"]),
+    }
+
+
+def snapshot() -> dict:
+    """
+    This function returns the metrics of this process, as json-serializable
+    dictionaries of histograms per callback and of (hits, misses) per cache.
+    """
+    with _lock:
+        histograms = dict(_histograms)
+    caches = {
+        cache: [count - before for count, before in zip(counts, _cache_baseline.get(cache, (0, 0)))]
+        for cache, counts in cache_stats().items()
+    }
+
+    return {
+        "histograms": {name: latencies.snapshot() for name, latencies in histograms.items()},
+        "caches": caches,
+    }
+
+
+def flush(force: bool = False):
+    """
+    This function writes the snapshot of this process to the directory named
+    by MULTIPROCESS_ENV, unless it was written less than FLUSH_SECONDS ago.
+    """
+    directory = os.environ.get(MULTIPROCESS_ENV)
+    now = time.monotonic()
+    if not directory or (not force and now - _last_flush[0] < FLUSH_SECONDS):
+        return
+    _last_flush[0] = now
+
+    path = Path(directory) / f"metrics-{os.getpid()}.json"
+    temp_path = path.with_name(path.name + f".{threading.get_ident()}.tmp")
+    with open(temp_path, "w") as file:
+        json.dump(snapshot(), file)
+    os.replace(temp_path, path)
+
+
+def forked():
+    """
+    This function is called in a worker process just after it is forked: the
+    worker starts its metrics from zero, as its parent reports what it
+    recorded before the fork.
+    """
+    clear_metrics()
+    _cache_baseline.clear()
+    _cache_baseline.update(cache_stats())
+    _last_flush[0] = 0.0
+
+
+def collect() -> dict:
+    """
+    This function returns the metrics to report: those of this process, or
+    with MULTIPROCESS_ENV set, the sum of the snapshots of every process.
+    """
+    directory = os.environ.get(MULTIPROCESS_ENV)
+    if not directory:
+        return snapshot()
+
+    flush(force=True)
+    histograms = {}
+    caches = {}
+    for path in sorted(Path(directory).glob("metrics-*.json")):
+        try:
+            with open(path) as file:
+                process = json.load(file)
+        except (OSError, ValueError):
+            continue
+        for name, latencies in process["histograms"].items():
+            total = histograms.setdefault(
+                name,
+                {
+                    "counts": [0] * len(latencies["counts"]),
+                    "sum": 0.0,
+                    "count": 0,
+                    "errors": 0,
+                    "recent": [],
+                },
+            )
+            total["counts"] = [a + b for a, b in zip(total["counts"], latencies["counts"])]
+            for key in ["sum", "count", "errors"]:
+                total[key] += latencies[key]
+            total["recent"] += latencies["recent"]
+        for cache, counts in process["caches"].items():
+            caches[cache] = [a + b for a, b in zip(caches.get(cache, [0, 0]), counts)]
+
+    return {"histograms": histograms, "caches": caches}
+
+
+def _format(value: float) -> str:
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+
+def render_metrics() -> str:
+    """
+    This function returns all the metrics in the Prometheus text format.
+    """
+    metrics = collect()
+    histograms = sorted(metrics["histograms"].items())
+
+    lines = [
+        "# HELP mortality_callback_duration_seconds Latency of the Dash callbacks.",
+        "# TYPE mortality_callback_duration_seconds histogram",
+    ]
+    for name, latencies in histograms:
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKETS + (float("inf"),), latencies["counts"]):
+            cumulative += bucket_count
+            lines.append(
+                f'mortality_callback_duration_seconds_bucket{{callback="{name}",le="{_format(bound)}"}} {cumulative}'
+            )
+        lines.append(f'mortality_callback_duration_seconds_sum{{callback="{name}"}} {_format(latencies["sum"])}')
+        lines.append(f'mortality_callback_duration_seconds_count{{callback="{name}"}} {latencies["count"]}')
+
+    lines += [
+        "# HELP mortality_callback_latency_seconds Latency quantiles of recent callback calls.",
+        "# TYPE mortality_callback_latency_seconds gauge",
+    ]
+    for name, latencies in histograms:
+        for quantile, seconds in _nearest_rank(latencies["recent"]).items():
+            lines.append(
+                f'mortality_callback_latency_seconds{{callback="{name}",quantile="{quantile}"}} {_format(seconds)}'
+            )
+
+    lines += [
+        "# HELP mortality_callback_errors_total Callback calls that raised an exception.",
+        "# TYPE mortality_callback_errors_total counter",
+    ]
+    for name, latencies in histograms:
+        lines.append(f'mortality_callback_errors_total{{callback="{name}"}} {latencies["errors"]}')
+
+    for i, kind in enumerate(["hits", "misses"]):
+        lines += [
+            f"# HELP mortality_cache_{kind}_total Cache {kind} when loading data, figures and models.",
+            f"# TYPE mortality_cache_{kind}_total counter",
+        ]
+        for cache, counts in metrics["caches"].items():
+            lines.append(f'mortality_cache_{kind}_total{{cache="{cache}"}} {counts[i]}')
+
+    return "\n".join(lines) + "\n"
+
+
+def add_metrics_endpoint(server):
+    """
+    This function adds the `/metrics` route to a Flask server, once.
+    """
+    if "metrics" in server.view_functions:
+        return
+
+    def metrics():
+        return render_metrics(), 200, {"Content-Type": CONTENT_TYPE}
+
+    server.add_url_rule("/metrics", "metrics", metrics)
+
+
+def clear_metrics():
+    """
+    This function forgets every recorded latency.
+    """
+    with _lock:
+        for latencies in _histograms.values():
+            latencies.reset()
@@ -0,0 +1,86 @@
+"""
+This file saves the fitted predictive model as a small, versioned JSON
+artifact: the intercept, one coefficient per category of every variable, the
+category levels (the first level of each variable is the treatment-coding
+baseline) and a sha256 hash of the data file the model was trained on.
+
+Loading an artifact only needs the standard library and NumPy, so dashboard
+workers can rebuild a LogitScorer in milliseconds without importing
+statsmodels; the cost of statsmodels is only paid when the model is trained.
+"""
+
+import json
+import os
+from pathlib import Path
+from mortality.scoring import LogitScorer
+
+ARTIFACT_VERSION = 1
+ARTIFACT_FILE = Path(__file__).parent.parent.joinpath("data/model/logit_model.json")
+
+
+def save_artifact(scorer: LogitScorer, fingerprint: str, formula: str, path=ARTIFACT_FILE):
+    """
+    Write a scorer and the hash of its training data to a JSON artifact. The
+    file is written to a temporary name first and then renamed, so a worker
+    never reads a half-written artifact.
+
+    Parameters:
+        scorer: the LogitScorer built from the fitted model
+        fingerprint: sha256 hash of the training data file
+        formula: the model formula
+        path: where to write the artifact (defaults to ARTIFACT_FILE)
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    artifact = {
+        "version": ARTIFACT_VERSION,
+        "formula": formula,
+        "data_sha256": fingerprint,
+        "encoding": "treatment",
+        "intercept": scorer.intercept,
+        "levels": scorer.levels,
+        "coefficients": {
+            variable: coefficients.tolist()
+            for variable, coefficients in scorer.coefficients.items()
+        },
+    }
+
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, "w") as file:
+        json.dump(artifact, file, indent=1)
+    os.replace(temp_path, path)
+
+
+def load_artifact(path=ARTIFACT_FILE, fingerprint=None, formula=None):
+    """
+    Rebuild a scorer from a JSON artifact.
+
+    Parameters:
+        path: the artifact to read (defaults to ARTIFACT_FILE)
+        fingerprint: if given, the artifact is only used when it was trained on
+            data with this sha256 hash
+        formula: if given, the artifact is only used when it was trained with
+            this formula
+
+    Returns:
+        LogitScorer, or None if the artifact is missing, was written by another
+        artifact version, or does not match the fingerprint or formula
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+
+    with open(path) as file:
+        artifact = json.load(file)
+
+    if artifact.get("version") != ARTIFACT_VERSION:
+        return None
+    if fingerprint is not None and artifact["data_sha256"] != fingerprint:
+        return None
+    if formula is not None and artifact["formula"] != formula:
+        return None
+
+    return LogitScorer(
+        artifact["intercept"], artifact["levels"], artifact["coefficients"]
+    )
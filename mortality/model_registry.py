@@ -0,0 +1,121 @@
+"""
+This file keeps a process-wide registry of fitted models. A model is fit once
+for each (data file fingerprint, formula) pair, per kind of model (e.g. the
+statsmodels fit or the NumPy scorer built from it), and the result is kept in
+memory, so every Dash callback reuses it instead of re-running the fit. The
+model is only refit when the contents of the input CSV change.
+"""
+
+import hashlib
+import threading
+from pathlib import Path
+
+# (fingerprint, formula, kind) -> fitted model
+_models = {}
+# (resolved data file, formula, kind) -> the key of the model fit on its latest contents
+_latest = {}
+_fingerprints = {}
+_stats = {"hits": 0, "misses": 0}
+# guards the dictionaries above; fits run outside of it, under the lock of their key
+_lock = threading.Lock()
+# (fingerprint, formula, kind) -> lock held while that model is fit
+_fit_locks = {}
+
+
+def file_fingerprint(path) -> str:
+    """
+    This function returns a sha256 hash of the contents of a file. The hash is
+    remembered together with the file's modification time and size, so the
+    file is only re-read when one of those changes.
+
+    Parameters:
+        path: the path to the file to fingerprint.
+
+    Returns:
+        The hex digest of the file contents.
+    """
+    path = Path(path).resolve()
+    stat = path.stat()
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _fingerprints.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    digest = hashlib.sha256(path.read_bytes()).hexdigest()
+    _fingerprints[path] = (signature, digest)
+
+    return digest
+
+
+def get_model(data_file, formula: str, fit, kind: str = "fit"):
+    """
+    This function returns the fitted model for a data file and formula, fitting
+    it only if the registry does not already hold a model for the current
+    contents of the file.
+
+    Parameters:
+        data_file: the path to the CSV the model is trained on.
+        formula: the model formula, part of the registry key.
+        fit: a function taking (data_file, formula) that returns a fitted model.
+        kind: name for the kind of model `fit` returns, part of the registry key.
+
+    Returns:
+        The fitted model.
+    """
+    key = (file_fingerprint(data_file), formula, kind)
+    source = (Path(data_file).resolve(), formula, kind)
+
+    with _lock:
+        if key in _models:
+            _stats["hits"] += 1
+            return _models[key]
+        fit_lock = _fit_locks.setdefault(key, threading.Lock())
+
+    # fitting may load other models from the registry (e.g. the scorer is
+    # built from the statsmodels fit), so only this key is locked meanwhile
+    with fit_lock:
+        with _lock:
+            if key in _models:
+                _stats["hits"] += 1
+                return _models[key]
+            _stats["misses"] += 1
+
+        model = fit(data_file, formula)
+
+        with _lock:
+            # drop the model fit on an older version of the same file
+            stale_key = _latest.get(source)
+            if stale_key is not None and stale_key != key:
+                _models.pop(stale_key, None)
+                _fit_locks.pop(stale_key, None)
+
+            _models[key] = model
+            _latest[source] = key
+
+    return model
+
+
+def registry_stats() -> dict:
+    """
+    This function reports how often the registry served a model from memory
+    (hits) and how often it had to fit one (misses).
+
+    Returns:
+        A dictionary with the hit and miss counts and the number of models held.
+    """
+    with _lock:
+        return {**_stats, "models": len(_models)}
+
+
+def clear_registry():
+    """
+    This function empties the registry and resets the hit and miss counters.
+    """
+    with _lock:
+        _models.clear()
+        _latest.clear()
+        _fit_locks.clear()
+        _fingerprints.clear()
+        _stats["hits"] = 0
+        _stats["misses"] = 0
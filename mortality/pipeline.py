@@ -0,0 +1,313 @@
+"""
+This file describes the data pipeline as a list of stages with explicit inputs
+and outputs, and runs them as a graph: a stage depends on the stages writing
+its inputs, and stages that do not depend on each other (the regional
+cleaning and the KFF merge) can run at the same time in a process pool.
+
+A stage only runs when one of its outputs is missing, or when the contents of
+its inputs or outputs changed since it last ran: the sha256 of every input and
+output is recorded in `data/.build_cache.json` after each stage runs. Touching
+a file without changing it does not rerun anything, and repeated builds with
+unchanged inputs do not redo any work. Stages the cache has no record of yet
+(e.g. right after cloning) are compared by modification times instead.
+
+    regional_clean: data/downloaded_data/region_age_educ_race.csv
+                    -> data/clean_reg_age_educ.csv (and .parquet)
+    regional_store: data/clean_reg_age_educ.csv
+                    -> data/clean_reg_age_educ.{codes,counts,values}.npy (and .store.json)
+    kff_merge:      data/scrape_data/kff_*.csv -> data/merged_kff.csv (and .parquet)
+    train:          data/clean_reg_age_educ.csv -> data/model/logit_model.json
+
+The stages import the modules that do the work only when they run, so
+importing this file is cheap.
+"""
+
+import functools
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from mortality.model_registry import file_fingerprint
+
+BASE_DIR = Path(__file__).parent.parent
+# where the hashes of each stage's inputs and outputs are kept, under a root
+BUILD_CACHE = "data/.build_cache.json"
+
+
+class Stage:
+    """
+    One step of the pipeline.
+
+    Attributes:
+        name: the name used to select the stage from the command line
+        inputs: list of paths the stage reads
+        outputs: list of paths the stage writes
+        run: function called with no arguments to produce the outputs
+    """
+
+    def __init__(self, name: str, inputs: list, outputs: list, run):
+        self.name = name
+        self.inputs = [Path(path) for path in inputs]
+        self.outputs = [Path(path) for path in outputs]
+        self.run = run
+
+    def is_stale(self) -> bool:
+        """
+        True if an output is missing or older than one of the inputs.
+        """
+        if not all(path.exists() for path in self.outputs):
+            return True
+
+        newest_input = max(path.stat().st_mtime_ns for path in self.inputs)
+        oldest_output = min(path.stat().st_mtime_ns for path in self.outputs)
+
+        return newest_input > oldest_output
+
+    def hashes(self) -> dict:
+        """
+        Returns the sha256 of every input and output of the stage that exists.
+        """
+        return {
+            str(path): file_fingerprint(path)
+            for path in self.inputs + self.outputs
+            if path.exists()
+        }
+
+    def needs_run(self, record: dict = None) -> bool:
+        """
+        True if an output is missing, or if an input or an output changed
+        since the stage last ran, according to the hashes in `record`. Without
+        a record, the modification times are compared.
+        """
+        if not all(path.exists() for path in self.outputs):
+            return True
+        if record is None:
+            return self.is_stale()
+
+        return record != self.hashes()
+
+
+def depends_on(stage: Stage, other: Stage) -> bool:
+    """
+    True if `stage` reads one of the outputs of `other`.
+    """
+    return bool(set(stage.inputs) & set(other.outputs))
+
+
+def cache_path(root=BASE_DIR) -> Path:
+    """
+    This function returns the path of the build cache for the data under
+    `root`.
+    """
+    return Path(root) / BUILD_CACHE
+
+
+def load_cache(path) -> dict:
+    """
+    This function reads the build cache: a dictionary mapping each stage name
+    to the hashes of its files when it last ran.
+    """
+    path = Path(path)
+    if not path.exists():
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_cache(cache: dict, path):
+    """
+    This function writes the build cache, atomically.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, "w") as file:
+        json.dump(cache, file, indent=2, sort_keys=True)
+    os.replace(temp_path, path)
+
+
+def _timed_run(run) -> float:
+    """
+    Runs a stage (in a worker process) and returns the seconds it took.
+    """
+    start = time.perf_counter()
+    run()
+    return time.perf_counter() - start
+
+
+def _clean_regional(root):
+    from mortality.regional_clean import clean_regional
+
+    clean_regional(
+        root / "data/downloaded_data/region_age_educ_race.csv",
+        root / "data/clean_reg_age_educ.csv",
+    )
+
+
+def _regional_store(root):
+    from mortality.predict_model import EXCLUDED_ROWS
+    from mortality.regional_store import write_store
+
+    write_store(root / "data/clean_reg_age_educ.csv", EXCLUDED_ROWS)
+
+
+def _merge_kff(root):
+    from mortality.kff_merger import merge_kff
+
+    merge_kff(
+        root / "data/scrape_data/kff_maternal_mortality.csv",
+        root / "data/scrape_data/kff_coverage.csv",
+        root / "data/scrape_data/kff_earnings.csv",
+        root / "data/scrape_data/kff_cesarean.csv",
+        root / "data/merged_kff.csv",
+    )
+
+
+def _train(root):
+    from mortality.predict_model import write_model_artifact
+
+    write_model_artifact(
+        root / "data/model/logit_model.json", root / "data/clean_reg_age_educ.csv"
+    )
+
+
+def make_stages(root=BASE_DIR) -> list:
+    """
+    This function returns the pipeline stages for the data under `root`, a
+    directory with the same layout as the repository (e.g. synthetic data).
+    """
+    root = Path(root)
+
+    return [
+        Stage(
+            "regional_clean",
+            [root / "data/downloaded_data/region_age_educ_race.csv"],
+            [
+                root / "data/clean_reg_age_educ.csv",
+                root / "data/clean_reg_age_educ.parquet",
+            ],
+            functools.partial(_clean_regional, root),
+        ),
+        Stage(
+            "regional_store",
+            [root / "data/clean_reg_age_educ.csv"],
+            [
+                root / "data/clean_reg_age_educ.codes.npy",
+                root / "data/clean_reg_age_educ.counts.npy",
+                root / "data/clean_reg_age_educ.values.npy",
+                root / "data/clean_reg_age_educ.store.json",
+            ],
+            functools.partial(_regional_store, root),
+        ),
+        Stage(
+            "kff_merge",
+            [
+                root / "data/scrape_data/kff_maternal_mortality.csv",
+                root / "data/scrape_data/kff_coverage.csv",
+                root / "data/scrape_data/kff_earnings.csv",
+                root / "data/scrape_data/kff_cesarean.csv",
+            ],
+            [root / "data/merged_kff.csv", root / "data/merged_kff.parquet"],
+            functools.partial(_merge_kff, root),
+        ),
+        Stage(
+            "train",
+            [
+                root / "data/clean_reg_age_educ.csv",
+                root / "data/clean_reg_age_educ.parquet",
+            ],
+            [root / "data/model/logit_model.json"],
+            functools.partial(_train, root),
+        ),
+    ]
+
+
+STAGES = make_stages()
+
+
+def build(
+    stages: list = STAGES,
+    names: list = None,
+    force: bool = False,
+    workers: int = 1,
+    cache_file=None,
+) -> list:
+    """
+    Runs the stages whose outputs are out of date, each after the stages it
+    depends on, and up to `workers` independent stages at a time.
+
+    Parameters:
+        stages: the pipeline stages (defaults to STAGES)
+        names: if given, only the stages with these names are considered
+        force: if True, run the stages even if their outputs are up to date
+        workers: the number of stages run at once, in a process pool if more
+            than 1
+        cache_file: path to the build cache, e.g. `cache_path(root)`;
+            without one, the stages are compared by modification times only
+
+    Returns:
+        list of (stage name, True if it ran, seconds taken) tuples, in the
+        order of the stages
+    """
+    if names:
+        unknown = set(names) - {stage.name for stage in stages}
+        if unknown:
+            raise ValueError(f"Unknown stages: {', '.join(sorted(unknown))}")
+        stages = [stage for stage in stages if stage.name in names]
+
+    cache = {} if cache_file is None else load_cache(cache_file)
+    # the stages each stage waits for, among the ones being built
+    waits_for = {
+        stage.name: {
+            other.name
+            for other in stages
+            if other is not stage and depends_on(stage, other)
+        }
+        for stage in stages
+    }
+    by_name = {stage.name: stage for stage in stages}
+    results = {}
+
+    def finish(stage, ran, seconds):
+        results[stage.name] = (ran, seconds)
+        # stages skipped without a record get one, to compare hashes next time
+        if cache_file is not None and (ran or stage.name not in cache):
+            cache[stage.name] = stage.hashes()
+            save_cache(cache, cache_file)
+
+    def ready():
+        # the stages not started yet whose dependencies are all built
+        return [
+            by_name[name]
+            for name, dependencies in waits_for.items()
+            if name not in results and name not in running.values()
+            and dependencies <= results.keys()
+        ]
+
+    running = {}
+    context = multiprocessing.get_context("spawn")
+    executor = ProcessPoolExecutor(workers, mp_context=context) if workers > 1 else None
+    try:
+        while len(results) < len(stages):
+            stages_ready = ready()
+            if not stages_ready and not running:
+                raise ValueError("The stages depend on each other in a cycle")
+            for stage in stages_ready:
+                start = time.perf_counter()
+                if not (force or stage.needs_run(cache.get(stage.name))):
+                    finish(stage, False, time.perf_counter() - start)
+                elif executor is None:
+                    finish(stage, True, _timed_run(stage.run))
+                else:
+                    running[executor.submit(_timed_run, stage.run)] = stage.name
+            if running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finish(by_name[running.pop(future)], True, future.result())
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    return [(stage.name, *results[stage.name]) for stage in stages]
@@ -5,51 +5,243 @@ estimate/predict the maternal mortality rate given different factors/characteris
 
 from pathlib import Path
 import pandas as pd
-import statsmodels.formula.api as smf
 
-from dash import Dash, dcc, html, Input, Output, callback
+from dash import Dash, dcc, html, Input, Output
 import plotly.express as px
+import plotly.graph_objects as go
+
+from mortality import model_registry
+from mortality.box_stats import box_stats
+from mortality.figure_cache import get_figure
+from mortality.columnar import read_table
+from mortality.metrics import add_metrics_endpoint, timed
+from mortality.regional_store import load_store
+from mortality.scoring import LogitScorer
+from mortality.model_artifact import ARTIFACT_FILE, load_artifact, save_artifact
+from mortality.lattice import (
+    LATTICE_FILE,
+    build_lattice,
+    category_levels,
+    load_lattice,
+    save_lattice,
+)
 
 # independent variable of interest
 INDEPENDENT_VAR = ["region", "race", "education", "ten_year_age_groups"]
+MODEL_FORMULA = "mortality_binary ~ " + "+".join(INDEPENDENT_VAR)
+# rows left out of the data, by column: too few to fit a coefficient on
+EXCLUDED_ROWS = {"race": ["American Indian or Alaska Native"]}
 
+DATA_FILE = Path(__file__).parent.parent.joinpath("data/clean_reg_age_educ.csv")
+ASSETS_FOLDER = Path(__file__).parent.joinpath("assets")
 
-def get_data():
+
+def get_data(file=DATA_FILE):
     """
     Retrieved the cleaned data for crearing visualization and randomly split them
     into training and testing data
 
+    Parameters:
+        file: path to the cleaned regional data (defaults to DATA_FILE)
+
     Returns:
         mortality_data (DataFrame): the entire cleaned data
     """
-    file = Path(__file__).parent.parent.joinpath("data/clean_reg_age_educ.csv")
-    mortality_data = pd.read_csv(file)
-    mortality_data = mortality_data[
-        mortality_data["race"] != "American Indian or Alaska Native"
-    ]
+    # the memory-mapped store is used when it was built from the current csv
+    # without the excluded rows: its frame is then a view of the mapped
+    # arrays, shared with every other process reading the store
+    store = load_store(file)
+    if (
+        store is not None
+        and store.fingerprint == model_registry.file_fingerprint(file)
+        and store.exclude == EXCLUDED_ROWS
+    ):
+        return store.to_frame()
+
+    mortality_data = read_table(file)
+    for column, excluded in EXCLUDED_ROWS.items():
+        mortality_data = mortality_data[~mortality_data[column].isin(excluded)]
+
+    # the typed data stores the categories as categoricals: drop the ones
+    # filtered out, so they do not become empty levels of the model
+    for variable in INDEPENDENT_VAR:
+        if isinstance(mortality_data[variable].dtype, pd.CategoricalDtype):
+            mortality_data = mortality_data.assign(
+                **{variable: mortality_data[variable].cat.remove_unused_categories()}
+            )
 
     return mortality_data
 
 
-def full_model(mortality_data):
+def full_model(mortality_data, formula=MODEL_FORMULA):
     """
     Create the optimal linear regression model with all data available
 
     Parameters:
         mortality_data (Dataframe): Dataframe containing all variables data
+        formula (str): model equation (defaults to MODEL_FORMULA)
 
     Returns:
         predict_model: linear regression of all variables maternal mortality
     """
-    equation_str = "mortality_binary ~ " + "+".join(INDEPENDENT_VAR)
-    train_model = smf.logit(equation_str, data=mortality_data).fit()
+    # statsmodels is only imported when a model is trained, workers scoring
+    # from the saved model artifact never load it
+    import statsmodels.formula.api as smf
+
+    train_model = smf.logit(formula, data=mortality_data).fit()
 
     return train_model, train_model.prsquared
 
 
+def _fit_registered_model(data_file, formula):
+    """
+    Fit function handed to the model registry: fits the logit on the given
+    data file and prints its summary once, when the model is (re)fit.
+    """
+    train_model, _ = full_model(get_data(data_file), formula)
+    print(train_model.summary())
+
+    return train_model
+
+
+def fitted_model(data_file=DATA_FILE):
+    """
+    Retrieve the fitted logit model from the process-wide model registry. The
+    model is only fit the first time it is requested and again whenever the
+    data file changes.
+
+    Parameters:
+        data_file: path to the cleaned regional data (defaults to DATA_FILE)
+
+    Returns:
+        predict_model: fitted logit of all variables maternal mortality
+    """
+    return model_registry.get_model(data_file, MODEL_FORMULA, _fit_registered_model)
+
+
+def _score_lattice(data_file):
+    """
+    Score every category combination with the registry scorer for `data_file`.
+    """
+    return build_lattice(
+        prediction_scorer(data_file),
+        category_levels(get_data(data_file), INDEPENDENT_VAR),
+        model_registry.file_fingerprint(data_file),
+        MODEL_FORMULA,
+    )
+
+
+def prediction_lattice(data_file=DATA_FILE, lattice_file=LATTICE_FILE):
+    """
+    Retrieve the predictions for every combination of region, race, education
+    and age. A lattice previously written to disk is memory-mapped if it was
+    built from the current data file, otherwise the lattice is scored from the
+    registry scorer.
+
+    Parameters:
+        data_file: path to the cleaned regional data (defaults to DATA_FILE)
+        lattice_file: path to a lattice written by `write_prediction_lattice`
+
+    Returns:
+        PredictionLattice
+    """
+    fingerprint = model_registry.file_fingerprint(data_file)
+
+    lattice = load_lattice(lattice_file)
+    if (
+        lattice is not None
+        and lattice.fingerprint == fingerprint
+        and lattice.formula == MODEL_FORMULA
+    ):
+        return lattice
+
+    return _score_lattice(data_file)
+
+
+def write_prediction_lattice(lattice_file=LATTICE_FILE, data_file=DATA_FILE):
+    """
+    Score the full prediction lattice and write it to disk so dashboard
+    workers can load it without fitting the model.
+
+    Parameters:
+        lattice_file: path of the `.npy` file to write (defaults to LATTICE_FILE)
+        data_file: path to the cleaned regional data (defaults to DATA_FILE)
+
+    Returns:
+        PredictionLattice
+    """
+    lattice = _score_lattice(data_file)
+    save_lattice(lattice, lattice_file)
+
+    return lattice
+
+
+def _train_scorer(data_file):
+    """
+    Build the NumPy scorer from the coefficients of the registry model.
+    """
+    return LogitScorer.from_params(
+        fitted_model(data_file).params,
+        category_levels(get_data(data_file), INDEPENDENT_VAR),
+    )
+
+
+def _load_scorer(data_file, formula):
+    """
+    Load function handed to the model registry: rebuilds the scorer from the
+    saved model artifact when it was trained on the current data file, and
+    falls back to fitting the model otherwise.
+    """
+    scorer = load_artifact(
+        ARTIFACT_FILE, model_registry.file_fingerprint(data_file), formula
+    )
+    if scorer is None:
+        scorer = _train_scorer(data_file)
+
+    return scorer
+
+
+def prediction_scorer(data_file=DATA_FILE):
+    """
+    Retrieve the NumPy scorer of the predictive model from the model registry.
+    The scorer is loaded from the saved model artifact without importing
+    statsmodels; the model is only fit if the artifact is missing or was
+    trained on a different version of the data file.
+
+    Parameters:
+        data_file: path to the cleaned regional data (defaults to DATA_FILE)
+
+    Returns:
+        LogitScorer
+    """
+    return model_registry.get_model(
+        data_file, MODEL_FORMULA, _load_scorer, kind="scorer"
+    )
+
+
+def write_model_artifact(artifact_file=ARTIFACT_FILE, data_file=DATA_FILE):
+    """
+    Fit the model and save its coefficients, category levels and the hash of
+    the data file as a versioned artifact for workers to load.
+
+    Parameters:
+        artifact_file: path of the JSON artifact (defaults to ARTIFACT_FILE)
+        data_file: path to the cleaned regional data (defaults to DATA_FILE)
+
+    Returns:
+        LogitScorer
+    """
+    scorer = _train_scorer(data_file)
+    save_artifact(
+        scorer, model_registry.file_fingerprint(data_file), MODEL_FORMULA, artifact_file
+    )
+
+    return scorer
+
+
 def user_prediction(
-    region: str = "northeast",
-    race: str = "white",
+    region: str = "Northeast",
+    race: str = "White",
     education: str = "unknown",
     age: str = "15-24",
 ):
@@ -65,11 +257,15 @@ def user_prediction(
 
     Returns:
         Maternal mortality rate (float)
+
+    Raises:
+        ValueError: if an input is not a category the model was fit on
     """
-    mortality_data = get_data()
+    scorer = prediction_scorer()
 
-    full_logit_model, _ = full_model(mortality_data)
-    print(full_logit_model.summary())
+    for variable, value in zip(INDEPENDENT_VAR, (region, race, education, age)):
+        if value not in scorer.levels[variable]:
+            raise ValueError(f"Unknown {variable}: {value!r}")
 
     inputs = pd.DataFrame(
         {
@@ -80,27 +276,152 @@ def user_prediction(
         }
     )
 
-    user_mortality_r = full_logit_model.predict(inputs)
+    user_mortality_r = scorer.predict(inputs)
 
-    # return user_mortality_r.values[0]
-    return round(user_mortality_r.values[0], 3)
+    return round(float(user_mortality_r[0]), 3)
 
 
-def user_input_dash():
+def boxplot(mortality_data, version, independent_var1=None, independent_var2=None):
     """
-    Create Dash Interaction in the web browser consists of two components:
-    the predictive model and the data visualization. Both components will show
-    the output once user make selections
+    Create the box plot of the mortality rates by up to two variables. The
+    quartiles, whiskers and outliers of every box are computed on the server,
+    so the figure only holds those instead of every row of the data.
 
-    Paremeters:
-        None
+    Parameters:
+        mortality_data (DataFrame): the cleaned data
+        version (str): version of the data, to reuse the box statistics
+        independent_var1 (str): variable on the x axis, or None
+        independent_var2 (str): variable the boxes are colored by, or None
+
+    Returns:
+        plotly figure
+    """
+    stats = box_stats(
+        version, mortality_data, "mortality_rate", independent_var1, independent_var2
+    )
+    colors = px.colors.qualitative.Plotly
+    grouped = independent_var2 is not None and independent_var2 != independent_var1
+
+    fig = go.Figure()
+    for i, level in enumerate(stats.color_levels):
+        boxes = [j for j in range(len(stats.x_levels)) if stats.count[i, j] > 0]
+        x = [" " if stats.x_levels[j] is None else stats.x_levels[j] for j in boxes]
+        name = "" if level is None else str(level)
+        trace = {
+            "name": name,
+            "legendgroup": name,
+            "offsetgroup": name,
+            "alignmentgroup": "True",
+            "marker": {"color": colors[i % len(colors)]},
+        }
+        fig.add_trace(
+            go.Box(
+                x=x,
+                q1=stats.q1[i, boxes],
+                median=stats.median[i, boxes],
+                q3=stats.q3[i, boxes],
+                lowerfence=stats.lowerfence[i, boxes],
+                upperfence=stats.upperfence[i, boxes],
+                showlegend=level is not None,
+                **trace,
+            )
+        )
+        # the outliers are drawn as points next to their box
+        outliers = [(x[k], value) for k, j in enumerate(boxes) for value in stats.outliers[i][j]]
+        fig.add_trace(
+            go.Scatter(
+                x=[point[0] for point in outliers],
+                y=[point[1] for point in outliers],
+                mode="markers",
+                showlegend=False,
+                hovertemplate="mortality_rate=%{y}<extra></extra>",
+                **trace,
+            )
+        )
+
+    fig.update_layout(
+        title={"text": "Box Plot of Maternal Mortality Rates", "x": 0.5},
+        xaxis_title=independent_var1,
+        yaxis_title="Maternal Mortality Rates",
+        legend_title_text=independent_var2,
+        boxmode="group" if grouped else "overlay",
+        scattermode="group" if grouped else "overlay",
+    )
+    if independent_var1 is not None:
+        fig.update_xaxes(
+            categoryorder="array", categoryarray=[str(level) for level in stats.x_levels]
+        )
+
+    return fig
+
+
+def boxplot_figure(mortality_data, version, independent_var1=None, independent_var2=None):
+    """
+    Retrieve the box plot for two variables from the figure cache, building
+    it if needed
+
+    Parameters:
+        mortality_data (DataFrame): the cleaned data
+        version (str): version of the data, part of the cache key
+        independent_var1 (str): variable on the x axis, or None
+        independent_var2 (str): variable the boxes are colored by, or None
+
+    Returns:
+        figure as a json dictionary
+    """
+    return get_figure(
+        "boxplot",
+        (independent_var1, independent_var2),
+        version,
+        lambda: boxplot(mortality_data, version, independent_var1, independent_var2),
+    )
+
+
+def warm_boxplots(mortality_data, version):
+    """
+    Build the box plot of every pair of variables (each of them possibly not
+    selected), so no callback has to compute box statistics
+
+    Parameters:
+        mortality_data (DataFrame): the cleaned data
+        version (str): version of the data
 
     Returns:
         None
     """
-    mortalty_data = get_data()
+    for independent_var1 in [None] + INDEPENDENT_VAR:
+        for independent_var2 in [None] + INDEPENDENT_VAR:
+            boxplot_figure(mortality_data, version, independent_var1, independent_var2)
+
+
+def create_prediction_app(server=True, url_base_pathname="/"):
+    """
+    Create the Dash app of the prediction dashboard, which consists of two
+    components: the predictive model and the data visualization. Both
+    components will show the output once user make selections. The data and
+    the predictions are loaded when the app is created, so a server that forks
+    workers afterwards shares them between the workers.
 
-    app = Dash()
+    Parameters:
+        server: the Flask server to add the app to, or True for a new one
+        url_base_pathname: the url the dashboard is served under
+
+    Returns:
+        Dash app
+    """
+    mortalty_data = get_data()
+    # every prediction is scored up front, so callbacks only do an array lookup
+    lattice = prediction_lattice()
+    # and every box plot is built up front from its box statistics
+    version = model_registry.file_fingerprint(DATA_FILE)
+    warm_boxplots(mortalty_data, version)
+
+    app = Dash(
+        __name__,
+        server=server,
+        url_base_pathname=url_base_pathname,
+        assets_folder=str(ASSETS_FOLDER),
+    )
 
     app.layout = html.Div(
         [
@@ -325,7 +646,7 @@ def user_input_dash():
     )
 
     # create the predicted mortality rate based on user inputs
-    @callback(
+    @app.callback(
         Output(component_id="header-mortality", component_property="children"),
         Output(component_id="output-mortality", component_property="children"),
         Output(component_id="explain-mortality", component_property="children"),
@@ -336,11 +657,12 @@ def user_input_dash():
             Input(component_id="age", component_property="value"),
         ],
     )
+    @timed("output_mortality_rate")
     def output_mortality_rate(region, race, education, age):
         if None in [region, race, education, age]:
             return "", "", ""
 
-        predicted_result = user_prediction(region, race, education, age)
+        predicted_result = lattice.lookup(region, race, education, age)
         explanation = f"This predicted value tells us there is a {round(predicted_result * 100, 1)}% probability of your mortality rate being high. In this analysis, a threshold of 1% is used to distinguish between a low maternal mortality rate and a high maternal mortality rate, where 1% means that out of 100 live births, there was 1 maternal death. The 'low' maternal mortaity rate ranges from 0% to 1%, and a 'high' maternal mortality rate ranges from 1% to 5.5%."
         return (
             "The prediction analysis",
@@ -349,26 +671,31 @@ def user_input_dash():
         )
 
     # create data expldoration visulization based on user inputs
-    @callback(
+    @app.callback(
         Output(component_id="boxplot", component_property="figure"),
         Input(component_id="indepdent-var1", component_property="value"),
         Input(component_id="indepdent-var2", component_property="value"),
     )
+    @timed("update_boxplot")
     def update_boxplot(independent_var1, independent_var2):
-        fig = px.box(
-            mortalty_data,
-            x=independent_var1,
-            y="mortality_rate",
-            color=independent_var2,
-        )
-        fig.update_layout(
-            title={"text": "Box Plot of Maternal Mortality Rates", "x": 0.5},
-            yaxis_title="Maternal Mortality Rates",
-        )
+        return boxplot_figure(mortalty_data, version, independent_var1, independent_var2)
 
-        return fig
+    add_metrics_endpoint(app.server)
 
-    app.run_server(debug=True)
+    return app
+
+
+def user_input_dash():
+    """
+    Run the prediction dashboard on the Dash development server
+
+    Paremeters:
+        None
+
+    Returns:
+        None
+    """
+    create_prediction_app().run_server(debug=True)
 
 
 if __name__ == "__main__":
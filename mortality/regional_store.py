@@ -0,0 +1,235 @@
+"""
+This file keeps a binary, memory-mappable copy of the cleaned regional data.
+The categorical columns (region, race, education, age group) are stored as
+integer category codes and the numeric columns as integers or floats, one
+`.npy` array each, with the category levels in a `.json` file next to them:
+
+    data/clean_reg_age_educ.codes.npy   int8 (wider for over 127 levels), one
+                                        row per categorical column
+    data/clean_reg_age_educ.counts.npy  int64, deaths and mortality_binary
+    data/clean_reg_age_educ.values.npy  float64, mortality_rate
+    data/clean_reg_age_educ.store.json  column names, levels, excluded rows,
+                                        csv fingerprint
+
+The arrays are memory-mapped when loaded, so every process reading the store
+(e.g. several dashboard workers) shares one physical copy of the data through
+the page cache. Each column is handed out as a NumPy view, and `to_frame`
+builds its data frame out of those views without copying them. Since a data
+frame cannot drop rows without copying, rows a reader always leaves out (see
+`predict_model.get_data`) are left out of the store when it is built.
+
+Since running processes keep the files mapped, they are never rewritten in
+place: each file is written next to its final path and moved there, the
+metadata last.
+"""
+
+import json
+import os
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from mortality.model_registry import file_fingerprint
+
+CATEGORICAL_COLUMNS = ["region", "race", "education", "ten_year_age_groups"]
+NUMERIC_COLUMNS = ["deaths", "mortality_rate", "mortality_binary"]
+INTEGER_COLUMNS = ["deaths", "mortality_binary"]
+FLOAT_COLUMNS = ["mortality_rate"]
+
+
+def store_paths(csv_path):
+    """
+    This function returns the paths of the codes array, the counts array, the
+    values array and the metadata file of the store kept for a csv.
+    """
+    csv_path = Path(csv_path)
+    stem = csv_path.with_suffix("")
+
+    return (
+        stem.with_name(stem.name + ".codes.npy"),
+        stem.with_name(stem.name + ".counts.npy"),
+        stem.with_name(stem.name + ".values.npy"),
+        stem.with_name(stem.name + ".store.json"),
+    )
+
+
+class RegionalStore:
+    """
+    The cleaned regional data as arrays of category codes and floats.
+
+    Attributes:
+        levels: dictionary mapping each categorical column to its categories,
+            in the order of their codes
+        codes: integer array with one row of codes per categorical column
+        counts: int64 array with one row per integer column
+        values: float64 array with one row per float column
+        fingerprint: hash of the csv the store was built from
+        exclude: dictionary mapping columns to the values whose rows were left
+            out of the store
+    """
+
+    def __init__(self, levels: dict, codes, counts, values, fingerprint=None, exclude=None):
+        self.levels = levels
+        self.codes = codes
+        self.counts = counts
+        self.values = values
+        self.fingerprint = fingerprint
+        self.exclude = exclude or {}
+        self._categorical = {column: i for i, column in enumerate(levels)}
+        self._integer = {column: i for i, column in enumerate(INTEGER_COLUMNS)}
+        self._float = {column: i for i, column in enumerate(FLOAT_COLUMNS)}
+
+    def __len__(self):
+        return self.codes.shape[1]
+
+    def column(self, name: str):
+        """
+        This function returns a column as a view of the stored arrays: the
+        codes of a categorical column, or the values of a numeric one.
+        """
+        if name in self._categorical:
+            return self.codes[self._categorical[name]]
+        if name in self._integer:
+            return self.counts[self._integer[name]]
+
+        return self.values[self._float[name]]
+
+    def to_frame(self):
+        """
+        This function returns the data as a data frame with categorical columns,
+        with the same columns as the cleaned csv. The columns are views of the
+        stored arrays, so the frame is read-only when the store is mapped.
+        """
+        frame = {
+            column: pd.Categorical.from_codes(
+                self.column(column), categories, validate=False
+            )
+            for column, categories in self.levels.items()
+        }
+        for column in NUMERIC_COLUMNS:
+            frame[column] = self.column(column)
+
+        return pd.DataFrame(frame, copy=False)
+
+
+def code_dtype(levels: int):
+    """
+    This function returns the smallest integer type holding the codes of a
+    column with `levels` categories (and -1 for missing values).
+    """
+    for dtype in [np.int8, np.int16, np.int32]:
+        if levels <= np.iinfo(dtype).max:
+            return dtype
+
+    return np.int64
+
+
+def build_store(frame, fingerprint=None, exclude=None) -> RegionalStore:
+    """
+    This function encodes the cleaned regional data frame as a store, with
+    the sorted categories of each categorical column as its levels.
+
+    Parameters:
+        frame (DataFrame): the cleaned regional data
+        fingerprint (str): hash of the csv the data was read from
+        exclude (dict): values of columns whose rows are left out, e.g.
+            {"race": ["American Indian or Alaska Native"]}
+
+    Returns:
+        RegionalStore
+    """
+    exclude = exclude or {}
+    for column, excluded in exclude.items():
+        frame = frame[~frame[column].isin(excluded)]
+
+    categoricals = {
+        column: pd.Categorical(frame[column].astype(str)) for column in CATEGORICAL_COLUMNS
+    }
+    levels = {
+        column: [str(level) for level in categorical.categories]
+        for column, categorical in categoricals.items()
+    }
+    dtype = code_dtype(max([len(categories) for categories in levels.values()], default=0))
+    codes = np.empty((len(CATEGORICAL_COLUMNS), len(frame)), dtype=dtype)
+    for i, categorical in enumerate(categoricals.values()):
+        codes[i] = categorical.codes
+
+    counts = frame[INTEGER_COLUMNS].to_numpy(dtype=np.int64).T.copy()
+    values = frame[FLOAT_COLUMNS].to_numpy(dtype=np.float64).T.copy()
+
+    return RegionalStore(levels, codes, counts, values, fingerprint, exclude)
+
+
+def _save_array(array, path):
+    # processes mapping the old file keep reading it until they reload
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, "wb") as file:
+        np.save(file, array)
+    os.replace(temp_path, path)
+
+
+def save_store(store: RegionalStore, csv_path):
+    """
+    This function writes the store's arrays and levels next to the csv. The
+    levels are written last, so they never describe arrays not yet written.
+    """
+    codes_path, counts_path, values_path, meta_path = store_paths(csv_path)
+
+    _save_array(store.codes, codes_path)
+    _save_array(store.counts, counts_path)
+    _save_array(store.values, values_path)
+    meta = {
+        "levels": store.levels,
+        "integer": INTEGER_COLUMNS,
+        "float": FLOAT_COLUMNS,
+        "exclude": store.exclude,
+        "fingerprint": store.fingerprint,
+    }
+    temp_path = meta_path.with_name(meta_path.name + ".tmp")
+    with open(temp_path, "w") as file:
+        json.dump(meta, file, indent=2)
+    os.replace(temp_path, meta_path)
+
+
+def load_store(csv_path, mmap: bool = True):
+    """
+    This function reads the store written by `save_store` for a csv. By
+    default the arrays are memory-mapped, read-only.
+
+    Returns:
+        RegionalStore, or None if no store has been written for the csv
+    """
+    paths = store_paths(csv_path)
+    if not all(path.exists() for path in paths):
+        return None
+    codes_path, counts_path, values_path, meta_path = paths
+
+    with open(meta_path) as file:
+        meta = json.load(file)
+    mmap_mode = "r" if mmap else None
+
+    return RegionalStore(
+        meta["levels"],
+        np.load(codes_path, mmap_mode=mmap_mode),
+        np.load(counts_path, mmap_mode=mmap_mode),
+        np.load(values_path, mmap_mode=mmap_mode),
+        meta.get("fingerprint"),
+        meta.get("exclude"),
+    )
+
+
+def write_store(csv_path, exclude=None):
+    """
+    This function builds the store for a cleaned regional csv and writes it
+    next to the csv, recording the csv's fingerprint.
+
+    Parameters:
+        csv_path: path to the cleaned regional csv
+        exclude (dict): values of columns whose rows are left out
+
+    Returns:
+        RegionalStore
+    """
+    store = build_store(pd.read_csv(csv_path), file_fingerprint(csv_path), exclude)
+    save_store(store, csv_path)
+
+    return store
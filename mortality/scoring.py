@@ -0,0 +1,110 @@
+"""
+This file scores the predictive model with plain NumPy. The logit only has
+categorical inputs with treatment coding, so multiplying the one-hot design
+matrix by the coefficients is the same as adding up, for every variable, the
+coefficient of the category each row falls in. Rows are encoded to integer
+category codes once and the linear predictor is built with array indexing,
+which scores millions of rows without building a design matrix or calling
+statsmodels.
+"""
+
+import re
+import numpy as np
+import pandas as pd
+
+# statsmodels/patsy names treatment-coded coefficients like "race[T.White]"
+COEFFICIENT_NAME = re.compile(r"^(?P<variable>.+)\[T\.(?P<level>.*)\]$")
+
+
+class LogitScorer:
+    """
+    Logistic model over categorical variables, scored with NumPy.
+
+    Attributes:
+        intercept: the model intercept
+        levels: dictionary mapping each variable to its list of categories;
+            the first category is the baseline of the treatment coding
+        coefficients: dictionary mapping each variable to an array with one
+            coefficient per category (0 for the baseline)
+    """
+
+    def __init__(self, intercept: float, levels: dict, coefficients: dict):
+        self.intercept = float(intercept)
+        self.levels = levels
+        self.coefficients = {
+            variable: np.asarray(coefficients[variable], dtype=np.float64)
+            for variable in levels
+        }
+
+    @classmethod
+    def from_params(cls, params, levels: dict):
+        """
+        Build a scorer from the named parameters of a fitted formula model.
+
+        Parameters:
+            params: mapping of coefficient name to value, e.g. `model.params`
+            levels (dict): categories of each variable, baseline first
+
+        Returns:
+            LogitScorer
+        """
+        coefficients = {
+            variable: np.zeros(len(categories)) for variable, categories in levels.items()
+        }
+        intercept = 0.0
+
+        for name, value in dict(params).items():
+            if name == "Intercept":
+                intercept = value
+                continue
+
+            match = COEFFICIENT_NAME.match(name)
+            if match is None or match["variable"] not in levels:
+                raise ValueError(f"Unexpected model coefficient: {name}")
+            code = levels[match["variable"]].index(match["level"])
+            coefficients[match["variable"]][code] = value
+
+        return cls(intercept, levels, coefficients)
+
+    def encode(self, frame) -> dict:
+        """
+        Encode the categorical columns of a DataFrame as integer codes, with -1
+        for categories the model has not seen.
+        """
+        missing = [variable for variable in self.levels if variable not in frame]
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+        return {
+            variable: pd.Categorical(
+                frame[variable].astype(str), categories=categories
+            ).codes
+            for variable, categories in self.levels.items()
+        }
+
+    def score_codes(self, codes: dict):
+        """
+        Predict probabilities for rows already encoded with `encode`. Rows with
+        an unknown category are scored as NaN.
+        """
+        linear = None
+        unknown = None
+        for variable, coefficients in self.coefficients.items():
+            variable_codes = codes[variable]
+            contribution = coefficients[variable_codes]
+            linear = contribution if linear is None else linear + contribution
+            unseen = variable_codes < 0
+            unknown = unseen if unknown is None else unknown | unseen
+
+        linear = linear + self.intercept
+        # 1 / (1 + exp(-x)) written so that large |x| does not overflow
+        probabilities = np.exp(-np.logaddexp(0.0, -linear))
+        probabilities[unknown] = np.nan
+
+        return probabilities
+
+    def predict(self, frame):
+        """
+        Predict probabilities for every row of a DataFrame.
+        """
+        return self.score_codes(self.encode(frame))
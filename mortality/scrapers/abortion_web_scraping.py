@@ -1,20 +1,38 @@
 import json
-import csv
 import pathlib
-import httpx
 import lxml.html
 from mortality.utils import STATE_ABBREVIATIONS
+from .http_cache import fetch, needs_writing
+from .kff_web_scraping import write_to_csv
+from .scheduler import RetryingClient
 
 BASE_DIR = pathlib.Path(__file__).parent.parent.parent
+ABORTION_URL = "https://www.kff.org/womens-health-policy/state-indicator/gestational-limit-abortions/?currentTimeframe=0&selectedRows=%7B%22states%22:%7B%22all%22:%7B%7D%7D,%22wrapups%22:%7B%22united-states%22:%7B%7D%7D%7D&sortModel=%7B%22colId%22:%22Location%22,%22sort%22:%22asc%22%7D"
+OUTPUT_FILE = "data/scrape_data/abortion.csv"
 
 
-def run_abortion_policy_scraper():
+def run_abortion_policy_scraper(cache=None, client=None, base_dir=BASE_DIR) -> dict:
     """
-    This function runs web scraping for an abortion policy webpage.
+    This function runs web scraping for an abortion policy webpage. If the
+    cache reports the page as unchanged, the page is not parsed, and the csv
+    is only rewritten if its contents changed.
+
+    Parameters:
+        cache: an optional ResponseCache the request goes through.
+        client: the client to send the request with (defaults to a
+            RetryingClient, which retries 429 and 5xx responses).
+        base_dir: the directory the output file is relative to.
+
+    Returns:
+        A dictionary with how the page's response was obtained (see
+        http_cache) and whether the csv changed.
     """
-    url = "https://www.kff.org/womens-health-policy/state-indicator/gestational-limit-abortions/?currentTimeframe=0&selectedRows=%7B%22states%22:%7B%22all%22:%7B%7D%7D,%22wrapups%22:%7B%22united-states%22:%7B%7D%7D%7D&sortModel=%7B%22colId%22:%22Location%22,%22sort%22:%22asc%22%7D"
-    html = httpx.get(url)
-    html.raise_for_status()
+    if client is None:
+        client = RetryingClient()
+    html = fetch(ABORTION_URL, cache, client)
+    if not needs_writing(html, base_dir / OUTPUT_FILE):
+        return {"status": html.status, "changed": False}
+
     root = lxml.html.fromstring(html.text)
 
     # Extract where the data is from the json text
@@ -74,7 +92,9 @@ def run_abortion_policy_scraper():
     ]
 
     # Write the list of dictionaries to a csv
-    with open(BASE_DIR / "data/scrape_data/abortion.csv", "w") as file:
-        writer = csv.DictWriter(file, fieldnames=field_names)
-        writer.writeheader()
-        writer.writerows(state_data[:])
+    changed = write_to_csv(
+        state_data, field_names, OUTPUT_FILE, base_dir, source="abortion policy"
+    )
+    html.mark_written()
+
+    return {"status": html.status, "changed": changed}
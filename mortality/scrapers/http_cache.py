@@ -0,0 +1,350 @@
+"""
+This file is an on-disk cache for the responses of the scraped websites. Each
+url is stored as its body plus a small json file with the ETag and
+Last-Modified headers the server sent, so later scrapes can send a conditional
+request (If-None-Match / If-Modified-Since) and skip parsing and rewriting the
+csv when the server answers 304 Not Modified.
+
+Responses younger than the cache's time to live are served without any
+request. When the cache grows past its maximum size, the least recently used
+responses are removed. In offline mode responses are only served from the
+cache and nothing is requested.
+
+A cached body is only counted as scraped once its csv was written: the
+scrapers call `mark_written` on the response after writing it, and until then
+the body is parsed again on every scrape, even when the server answers 304.
+
+The async methods do their file reads and writes in a worker thread
+(`asyncio.to_thread`), so the event loop keeps serving the other requests
+while a body is read from or written to disk.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+import httpx
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent.parent
+CACHE_DIR = BASE_DIR / "data/.http_cache"
+
+# Seconds a cached response is used without revalidating it, and the most
+# bytes of response bodies kept on disk
+DEFAULT_TTL = 60 * 60
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+
+# How a response was obtained: "fetched" responses are new or changed, the
+# others hold the same body as the last time the url was scraped
+FETCHED = "fetched"
+NOT_MODIFIED = "not_modified"
+FRESH = "fresh"
+OFFLINE = "offline"
+
+
+class CachedResponse:
+    """
+    The body of a response and how it was obtained (see the statuses above).
+    The body is either held as text or, for responses served from the cache,
+    read from the cached file when it is needed. `written` tells if the csv
+    was written from the cached body.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        text: str,
+        status: str,
+        body_path=None,
+        written: bool = False,
+        cache=None,
+    ):
+        self.url = url
+        self._text = text
+        self.status = status
+        self.body_path = body_path
+        self.written = written
+        self._cache = cache
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = Path(self.body_path).read_text(encoding="utf-8")
+        return self._text
+
+    def iter_text(self, chunk_size: int = 64 * 1024):
+        """
+        This function yields the body in chunks of text, reading a cached body
+        from disk a chunk at a time.
+        """
+        if self._text is not None:
+            yield self._text
+            return
+
+        with open(self.body_path, encoding="utf-8") as file:
+            while chunk := file.read(chunk_size):
+                yield chunk
+
+    @property
+    def changed(self) -> bool:
+        """
+        True if the body may differ from the last time it was scraped, or if
+        its csv was not written then (e.g. the parsing failed).
+        """
+        return self.status == FETCHED or not self.written
+
+    def mark_written(self):
+        """
+        This function records in the cache that the csv was written from
+        this body, so it is not parsed again until the body changes.
+        """
+        if self._cache is not None:
+            self._cache.mark_written(self.url)
+
+
+class ResponseCache:
+    """
+    On-disk response cache keyed by url.
+
+    Parameters:
+        directory: where cached responses are stored.
+        ttl: seconds a response is served without revalidating it.
+        max_bytes: the most bytes of response bodies to keep.
+        offline: if True, only serve from the cache and never send requests.
+    """
+
+    def __init__(
+        self,
+        directory=CACHE_DIR,
+        ttl: float = DEFAULT_TTL,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        offline: bool = False,
+    ):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+
+    def get(self, client, url: str) -> CachedResponse:
+        """
+        This function returns the response for a url, sending a conditional
+        request with `client` (httpx or an httpx.Client) only when needed.
+        """
+        cached, headers = self._prepare(url)
+        if cached is not None:
+            return cached
+
+        return self._finish(url, client.get(url, headers=headers))
+
+    async def aget(self, client, url: str) -> CachedResponse:
+        """
+        This function is the same as `get`, for an httpx.AsyncClient.
+        """
+        cached, headers = await asyncio.to_thread(self._prepare, url)
+        if cached is not None:
+            return cached
+
+        response = await client.get(url, headers=headers)
+
+        return await asyncio.to_thread(self._finish, url, response)
+
+    async def astream(self, client, url: str) -> CachedResponse:
+        """
+        This function is the same as `aget`, but a new body is streamed to the
+        cache file instead of being held in memory, and the returned response
+        reads it back from disk. `client` has to be an AsyncRetryingClient.
+        """
+        cached, headers = await asyncio.to_thread(self._prepare, url)
+        if cached is not None:
+            return cached
+
+        response = await client.send_streaming(url, headers)
+        try:
+            if response.status_code == 304:
+                return await asyncio.to_thread(self._not_modified, url, response)
+            response.raise_for_status()
+
+            body_path, _ = self._paths(url)
+            await asyncio.to_thread(self.directory.mkdir, parents=True, exist_ok=True)
+            temp_path = body_path.with_name(body_path.name + ".tmp")
+            size = 0
+            file = await asyncio.to_thread(open, temp_path, "wb")
+            try:
+                async for chunk in response.aiter_bytes():
+                    await asyncio.to_thread(file.write, chunk)
+                    size += len(chunk)
+            finally:
+                await asyncio.to_thread(file.close)
+            await asyncio.to_thread(os.replace, temp_path, body_path)
+        finally:
+            await response.aclose()
+
+        await asyncio.to_thread(self._store_meta, url, response, size)
+
+        return CachedResponse(url, None, FETCHED, body_path, cache=self)
+
+    def mark_written(self, url: str):
+        """
+        This function records that the csv of a cached response was written.
+        """
+        meta = self._read_meta(url)
+        if meta is not None and not meta.get("written"):
+            meta["written"] = True
+            self._write_meta(url, meta)
+
+    def _paths(self, url: str):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.directory / f"{key}.body", self.directory / f"{key}.json"
+
+    def _read_meta(self, url: str):
+        body_path, meta_path = self._paths(url)
+        if not body_path.exists() or not meta_path.exists():
+            return None
+        with open(meta_path) as file:
+            return json.load(file)
+
+    def _write_meta(self, url: str, meta: dict):
+        _, meta_path = self._paths(url)
+        _atomic_write(meta_path, json.dumps(meta).encode("utf-8"))
+
+    def _read_body(self, url: str, meta: dict, status: str) -> CachedResponse:
+        body_path, _ = self._paths(url)
+        meta["last_used"] = time.time()
+        self._write_meta(url, meta)
+
+        return CachedResponse(
+            url, None, status, body_path, written=meta.get("written", False), cache=self
+        )
+
+    def _prepare(self, url: str):
+        """
+        Returns the cached response if no request is needed, otherwise the
+        headers for a conditional request.
+        """
+        meta = self._read_meta(url)
+
+        if self.offline:
+            if meta is None:
+                raise LookupError(f"{url} is not in the response cache")
+            return self._read_body(url, meta, OFFLINE), None
+
+        if meta is None:
+            return None, {}
+
+        if time.time() - meta["fetched_at"] < self.ttl:
+            return self._read_body(url, meta, FRESH), None
+
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+        return None, headers
+
+    def _finish(self, url: str, response) -> CachedResponse:
+        """
+        Stores a new response, or refreshes the cached one on a 304.
+        """
+        if response.status_code == 304:
+            return self._not_modified(url, response)
+
+        response.raise_for_status()
+
+        body = response.text.encode("utf-8")
+        body_path, _ = self._paths(url)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        _atomic_write(body_path, body)
+        self._store_meta(url, response, len(body))
+
+        return CachedResponse(url, response.text, FETCHED, cache=self)
+
+    def _not_modified(self, url: str, response) -> CachedResponse:
+        meta = self._read_meta(url)
+        meta["fetched_at"] = time.time()
+        meta["etag"] = response.headers.get("ETag", meta.get("etag"))
+        meta["last_modified"] = response.headers.get(
+            "Last-Modified", meta.get("last_modified")
+        )
+
+        return self._read_body(url, meta, NOT_MODIFIED)
+
+    def _store_meta(self, url: str, response, size: int):
+        now = time.time()
+        self._write_meta(
+            url,
+            {
+                "url": url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "fetched_at": now,
+                "last_used": now,
+                "size": size,
+                # set by mark_written once the csv is written from this body
+                "written": False,
+            },
+        )
+        self.evict(keep=url)
+
+    def evict(self, keep: str = None):
+        """
+        This function removes the least recently used responses until the
+        cached bodies fit in `max_bytes`. The response for `keep` is never
+        removed, so a body that was just stored can still be read.
+        """
+        entries = []
+        for meta_path in self.directory.glob("*.json"):
+            with open(meta_path) as file:
+                meta = json.load(file)
+            entries.append((meta["last_used"], meta["size"], meta["url"], meta_path))
+
+        total = sum(entry[1] for entry in entries)
+        for _, size, url, meta_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if url == keep:
+                continue
+            meta_path.with_suffix(".body").unlink(missing_ok=True)
+            meta_path.unlink(missing_ok=True)
+            total -= size
+
+
+def _atomic_write(path: Path, content: bytes):
+    temp_path = path.with_name(path.name + ".tmp")
+    temp_path.write_bytes(content)
+    os.replace(temp_path, path)
+
+
+def fetch(url: str, cache=None, client=None) -> CachedResponse:
+    """
+    This function requests a url, going through the response cache if one is
+    given. Error statuses raise httpx.HTTPStatusError.
+
+    Parameters:
+        url: the url to request.
+        cache: an optional ResponseCache.
+        client: httpx or an httpx.Client to send the request with.
+
+    Returns:
+        A CachedResponse; without a cache it is always a "fetched" response.
+    """
+    if client is None:
+        client = httpx
+
+    if cache is not None:
+        return cache.get(client, url)
+
+    response = client.get(url)
+    response.raise_for_status()
+
+    return CachedResponse(url, response.text, FETCHED)
+
+
+def needs_writing(response: CachedResponse, output_path) -> bool:
+    """
+    This function decides if a response has to be parsed and written out:
+    only when its body changed since the last scrape, its csv was not written
+    from it yet, or the output is missing.
+    """
+    return response.changed or not Path(output_path).exists()
@@ -0,0 +1,248 @@
+"""
+This file parses the KFF json incrementally, as its text arrives, instead of
+loading the whole response into a dictionary first. The KFF sheets are a json
+object whose "data" key holds a list of lists, one per state; the parser
+finds that list and hands back each row as soon as it is complete, so only
+the row being read has to be held in memory.
+
+The parsers are fed text chunks with `feed`, which returns the rows completed
+by that chunk. This way the same parser works for a synchronous response, an
+async response, or a cached response read from disk.
+
+The strings, lists and objects stored under other keys are skipped without
+decoding them: a scan for their closing quote or bracket keeps its place
+between chunks, so a large value is read once instead of being decoded again
+from its start with every chunk.
+"""
+
+import json
+import re
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+# the characters that end a string, and the ones that matter outside strings
+_STRING_END = re.compile(r'["\\]')
+_STRUCTURE = re.compile(r'["\[\]{}]')
+# the characters that may follow a complete value
+_AFTER_VALUE = _WHITESPACE + ",:]}"
+
+
+class ArrayItemParser:
+    """
+    Incrementally yields the items of the list stored under `key` in a
+    top-level json object.
+
+    Parameters:
+        key: the key of the list to stream, "data" for the KFF sheets.
+    """
+
+    def __init__(self, key: str = "data"):
+        self.key = key
+        self.buffer = ""
+        self.position = 0
+        # "object": before the opening brace, "key": expecting a key,
+        # "value": expecting the value of a key, "skip": inside a string, list
+        # or object we skip, "items": inside the list, "done": after the list
+        self.state = "object"
+        self.skip_value = False
+        # where the scan of a skipped value is: its nesting depth, inside a
+        # string or not, and after a backslash or not
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, text: str) -> list:
+        """
+        This function adds a chunk of text and returns the items it completed.
+        """
+        self.buffer = self.buffer[self.position :] + text
+        self.position = 0
+
+        return self._parse(final=False)
+
+    def close(self) -> list:
+        """
+        This function returns the items left once all text has been fed, and
+        raises ValueError if the list was never found or not closed.
+        """
+        items = self._parse(final=True)
+        if self.state != "done":
+            raise ValueError(f'Could not find a complete "{self.key}" list')
+
+        return items
+
+    def _skip_whitespace(self, allow: str = "") -> bool:
+        """
+        Moves past whitespace (and the characters in `allow`); returns False if
+        the end of the buffer was reached.
+        """
+        while self.position < len(self.buffer):
+            if self.buffer[self.position] not in _WHITESPACE + allow:
+                return True
+            self.position += 1
+
+        return False
+
+    def _decode(self, final: bool):
+        """
+        Decodes the json value at the current position. Returns (True, value)
+        if a complete value was read, (False, None) if more text is needed.
+        """
+        try:
+            value, end = _decoder.raw_decode(self.buffer, self.position)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return False, None
+
+        # a number is only complete once what follows it is not part of it:
+        # "12" or "12." at the end of a chunk may continue as "12.5"
+        if not final and (end == len(self.buffer) or self.buffer[end] not in _AFTER_VALUE):
+            return False, None
+
+        self.position = end
+        return True, value
+
+    def _skip_value(self) -> bool:
+        """
+        Moves past the string, list or object being skipped, without decoding
+        it; returns False if the end of the buffer was reached first.
+        """
+        buffer = self.buffer
+        position = self.position
+
+        while True:
+            if self.in_string:
+                if self.escaped:
+                    if position >= len(buffer):
+                        break
+                    position += 1
+                    self.escaped = False
+                match = _STRING_END.search(buffer, position)
+                if match is None:
+                    position = len(buffer)
+                    break
+                position = match.end()
+                if match.group() == "\\":
+                    self.escaped = True
+                    continue
+                self.in_string = False
+                if self.depth == 0:
+                    self.position = position
+                    return True
+            else:
+                match = _STRUCTURE.search(buffer, position)
+                if match is None:
+                    position = len(buffer)
+                    break
+                position = match.end()
+                char = match.group()
+                if char == '"':
+                    self.in_string = True
+                elif char in "[{":
+                    self.depth += 1
+                else:
+                    self.depth -= 1
+                    if self.depth == 0:
+                        self.position = position
+                        return True
+
+        self.position = position
+        return False
+
+    def _parse(self, final: bool) -> list:
+        items = []
+
+        while self.state != "done":
+            if self.state == "skip":
+                if not self._skip_value():
+                    break
+                self.state = "key"
+                continue
+
+            if not self._skip_whitespace(allow="," if self.state != "object" else ""):
+                break
+            char = self.buffer[self.position]
+
+            if self.state == "object":
+                if char != "{":
+                    raise ValueError("Expected a json object")
+                self.position += 1
+                self.state = "key"
+
+            elif self.state == "key":
+                if char == "}":
+                    raise ValueError(f'No "{self.key}" list in the json object')
+                start = self.position
+                complete, key = self._decode(final)
+                if not complete:
+                    break
+                if not self._skip_whitespace() or self.buffer[self.position] != ":":
+                    self.position = start
+                    break
+                self.position += 1
+                self.skip_value = key != self.key
+                self.state = "value"
+
+            elif self.state == "value":
+                if self.skip_value and char in '"[{':
+                    self.depth = 0
+                    self.in_string = self.escaped = False
+                    self.state = "skip"
+                elif self.skip_value:
+                    # numbers, true, false and null are short enough to decode
+                    complete, _ = self._decode(final)
+                    if not complete:
+                        break
+                    self.state = "key"
+                else:
+                    if char != "[":
+                        raise ValueError(f'"{self.key}" is not a list')
+                    self.position += 1
+                    self.state = "items"
+
+            elif self.state == "items":
+                if char == "]":
+                    self.position += 1
+                    self.state = "done"
+                    break
+                complete, item = self._decode(final)
+                if not complete:
+                    break
+                items.append(item)
+
+        return items
+
+
+class StateRowParser:
+    """
+    Streams the state rows of a KFF sheet as dictionaries, the same rows
+    `extract_state_info(info["data"][start_index:], variables)` returns.
+
+    Parameters:
+        variables: the variable names for each row of data.
+        start_index: the index of the first row of state data.
+    """
+
+    def __init__(self, variables: list, start_index: int):
+        self.variables = variables
+        self.start_index = start_index
+        self.index = 0
+        self.items = ArrayItemParser("data")
+
+    def feed(self, text: str) -> list:
+        return self._rows(self.items.feed(text))
+
+    def close(self) -> list:
+        return self._rows(self.items.close())
+
+    def _rows(self, items: list) -> list:
+        rows = []
+        for state_info in items:
+            if self.index >= self.start_index:
+                rows.append(
+                    {key: state_info[i] for i, key in enumerate(self.variables)}
+                )
+            self.index += 1
+
+        return rows
@@ -1,14 +1,27 @@
+import asyncio
+import hashlib
+import io
 import json
 import csv
+import time
 import httpx
 from pathlib import Path
 from .kff_data_sources import DATA_SOURCES
+from .http_cache import FETCHED, CachedResponse, fetch, needs_writing
+from .manifest import Manifest
+from .scheduler import AsyncRetryingClient, HostRateLimiter, RetryingClient
+from .json_stream import StateRowParser
 
 
 BASE_DIR = Path(__file__).parent.parent.parent
 
+# Number of requests the async scraper keeps in flight at once, and the number
+# of seconds to wait on a request before giving up
+DEFAULT_CONCURRENCY = 5
+DEFAULT_TIMEOUT = 30.0
 
-def get_json_from_html(url: str) -> dict:
+
+def get_json_from_html(url: str, cache=None, client=None) -> dict:
     """
     This function takes in a url and returns the html, when the html is a json,
     and returns a python dictionary. This function is meant to be used with the
@@ -16,35 +29,154 @@ def get_json_from_html(url: str) -> dict:
 
     Parameters:
         url: The url to the website that contains the json.
+        cache: an optional ResponseCache the request goes through.
+        client: httpx or an httpx.Client to send the request with.
 
     Returns:
         A dictionary with the data contained in the json.
     """
-    json_html = httpx.get(url).text
+    json_html = fetch(url, cache, client).text
 
     json_dict = json.loads(json_html)
 
     return json_dict
 
 
-def write_to_csv(data: dict, fieldnames: list, output_file: str):
+def write_to_csv(
+    data: dict,
+    fieldnames: list,
+    output_file: str,
+    base_dir=BASE_DIR,
+    manifest=None,
+    source: str = None,
+) -> bool:
     """
     This function writes data to a csv given a list of dictionaries and the
-    fieldnames for the name of the csv.
+    fieldnames for the name of the csv. The csv is only rewritten if its
+    contents changed since the hash recorded in the manifest.
 
     Parameters:
         data: a list of dictionaries for the data to be written to csv
         fieldnames: a list of the column names in the csv
         output_file: the path and filename to where the data should be saved.
+        base_dir: the directory output_file is relative to.
+        manifest: the Manifest to check and record the hash in; if None, the
+            manifest in base_dir is loaded and saved.
+        source: the name of the data source, recorded in the manifest.
     
     Returns:
-        None, the information gets written to a file.
+        True if the csv was written, False if it was already up to date.
     """
     # Write the list of dictionaries to a csv
-    with open(BASE_DIR / output_file, "w") as file:
-        writer = csv.DictWriter(file, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(data)
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+    writer.writeheader()
+    writer.writerows(data)
+
+    if manifest is not None:
+        return manifest.write(output_file, buffer.getvalue(), source)
+
+    manifest = Manifest(base_dir)
+    changed = manifest.write(output_file, buffer.getvalue(), source)
+    manifest.save()
+
+    return changed
+
+
+class StreamingCsvWriter:
+    """
+    Writes csv rows to a temporary file as they arrive, hashing them on the
+    way, so a source can be written without holding all of its rows. The
+    temporary file replaces the output only if its hash changed.
+
+    Parameters:
+        fieldnames: a list of the column names in the csv
+        output_file: the path and filename to where the data should be saved.
+        base_dir: the directory output_file is relative to.
+    """
+
+    def __init__(self, fieldnames: list, output_file: str, base_dir=BASE_DIR):
+        self.output_file = output_file
+        path = Path(base_dir) / output_file
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.temp_path = path.with_name(path.name + ".tmp")
+
+        self.file = open(self.temp_path, "w", newline="", encoding="utf-8")
+        self.digest = hashlib.sha256()
+        self.writer = csv.DictWriter(self, fieldnames=fieldnames)
+        self.writer.writeheader()
+
+    def write(self, text: str):
+        # called by csv.DictWriter with each formatted line
+        self.file.write(text)
+        self.digest.update(text.encode("utf-8"))
+
+    def writerows(self, rows: list):
+        self.writer.writerows(rows)
+
+    def commit(self, manifest, source: str = None) -> bool:
+        """
+        This function finishes the csv and replaces the output file if its
+        contents changed. Returns True if the output changed.
+        """
+        self.file.close()
+        return manifest.replace(
+            self.output_file, self.temp_path, self.digest.hexdigest(), source
+        )
+
+    def discard(self):
+        """
+        This function drops the partially written csv.
+        """
+        self.file.close()
+        self.temp_path.unlink(missing_ok=True)
+
+
+def stream_to_csv(
+    chunks,
+    variables: list,
+    start_index: int,
+    output_file: str,
+    base_dir=BASE_DIR,
+    manifest=None,
+    source: str = None,
+) -> bool:
+    """
+    This function parses a KFF json from chunks of text and writes each state
+    row to the csv as soon as it is parsed, so memory use does not grow with
+    the size of the sheet. The csv is the same one `save_source` writes.
+
+    Parameters:
+        chunks: an iterable of text chunks of the json.
+        variables: the variable names for each row of data.
+        start_index: the index of the first row of state data.
+        output_file: the path and filename to where the data should be saved.
+        base_dir: the directory output_file is relative to.
+        manifest: the Manifest the csv's hash is recorded in; if None, the
+            manifest in base_dir is loaded and saved.
+        source: the name of the data source.
+
+    Returns:
+        True if the csv changed, False if it was already up to date.
+    """
+    parser = StateRowParser(variables, start_index)
+    writer = StreamingCsvWriter(variables, output_file, base_dir)
+    try:
+        for chunk in chunks:
+            writer.writerows(parser.feed(chunk))
+        writer.writerows(parser.close())
+    except BaseException:
+        writer.discard()
+        raise
+
+    if manifest is not None:
+        return writer.commit(manifest, source)
+
+    manifest = Manifest(base_dir)
+    changed = writer.commit(manifest, source)
+    manifest.save()
+
+    return changed
 
 
 def extract_state_info(raw_data: list, variables: list):
@@ -80,16 +212,302 @@ def extract_state_info(raw_data: list, variables: list):
     return data
 
 
-def run_kff_scrapers():
+def save_source(
+    info: dict,
+    variables: list,
+    start_index: int,
+    output_file: str,
+    base_dir=BASE_DIR,
+    manifest=None,
+    source: str = None,
+) -> bool:
     """
-    This function runs the web scraping functions on the data to be scraped.
+    This function extracts the state rows from a KFF json dictionary and
+    writes them to the source's csv.
+
+    Parameters:
+        info: the dictionary loaded from the source's json.
+        variables: the variable names for each row of data.
+        start_index: the index of the first row of state data.
+        output_file: the path and filename to where the data should be saved.
+        base_dir: the directory output_file is relative to.
+        manifest: the Manifest the csv's hash is recorded in.
+        source: the name of the data source.
+
+    Returns:
+        True if the csv changed, False if it was already up to date.
+    """
+    data = extract_state_info(info["data"][start_index:], variables)
+    return write_to_csv(data, variables, output_file, base_dir, manifest, source)
+
+
+def run_kff_scrapers(cache=None, base_dir=BASE_DIR, client=None) -> dict:
+    """
+    This function runs the web scraping functions on the data to be scraped,
+    one source at a time. Requests are rate limited and retried, and a source
+    that fails is recorded without stopping the others. Sources the cache
+    reports as unchanged are not parsed or rewritten.
+
+    Parameters:
+        cache: an optional ResponseCache the requests go through.
+        base_dir: the directory the output files are relative to.
+        client: the client to send requests with (defaults to a RetryingClient).
+
+    Returns:
+        A dictionary with, for each source, how its response was obtained
+        ("failed" with an "error" if it could not be scraped) and whether its
+        csv changed.
+    """
+    if client is None:
+        client = RetryingClient(limiter=HostRateLimiter())
+    manifest = Manifest(base_dir)
+    results = {}
+
+    # Unpack the important information for each data source to be scraped
+    for name, (url, variables, start_index, output_file) in DATA_SOURCES.items():
+        try:
+            response = fetch(url, cache, client)
+            changed = False
+            if needs_writing(response, base_dir / output_file):
+                info = json.loads(response.text)
+                changed = save_source(
+                    info, variables, start_index, output_file, base_dir, manifest, name
+                )
+                response.mark_written()
+            results[name] = {"status": response.status, "changed": changed}
+        except Exception as error:  # one bad source should not stop the rest
+            results[name] = failed_result(error)
+        results[name]["attempts"] = getattr(client, "attempts", {}).get(url, 1)
+
+    manifest.save()
+
+    return results
+
+
+def failed_result(error: Exception) -> dict:
+    """
+    This function records a source that could not be scraped.
+    """
+    return {
+        "status": "failed",
+        "changed": False,
+        "error": f"{type(error).__name__}: {error}",
+    }
+
+
+async def fetch_async(client: httpx.AsyncClient, url: str, cache=None) -> CachedResponse:
+    """
+    This function requests a url with a shared async client, going through the
+    response cache if one is given.
+
+    Parameters:
+        client: the pooled client the request is sent with.
+        url: The url to the website that contains the json.
+        cache: an optional ResponseCache.
+
+    Returns:
+        A CachedResponse.
+    """
+    if cache is not None:
+        return await cache.aget(client, url)
+
+    response = await client.get(url)
+    response.raise_for_status()
+
+    return CachedResponse(url, response.text, FETCHED)
+
+
+async def stream_source_async(
+    client: AsyncRetryingClient,
+    url: str,
+    variables: list,
+    start_index: int,
+    output_file: str,
+    base_dir=BASE_DIR,
+    manifest=None,
+    source: str = None,
+    cache=None,
+):
+    """
+    This function scrapes one source without holding its whole response in
+    memory: the body is parsed and written to the csv as it arrives. With a
+    cache, the body is streamed to the cache file and parsed back from disk.
+
+    Returns:
+        How the response was obtained, and True if the csv changed.
+    """
+    if cache is not None:
+        response = await cache.astream(client, url)
+        if not needs_writing(response, base_dir / output_file):
+            return response.status, False
+        # the cached body is read back and the csv written in a worker thread,
+        # so the event loop is not blocked on the disk
+        changed = await asyncio.to_thread(
+            stream_to_csv,
+            response.iter_text(),
+            variables,
+            start_index,
+            output_file,
+            base_dir,
+            manifest,
+            source,
+        )
+        await asyncio.to_thread(response.mark_written)
+        return response.status, changed
+
+    response = await client.send_streaming(url)
+    parser = StateRowParser(variables, start_index)
+    writer = None
+    try:
+        response.raise_for_status()
+        writer = StreamingCsvWriter(variables, output_file, base_dir)
+        async for chunk in response.aiter_text():
+            writer.writerows(parser.feed(chunk))
+        writer.writerows(parser.close())
+    except BaseException:
+        if writer is not None:
+            writer.discard()
+        raise
+    finally:
+        await response.aclose()
+
+    return FETCHED, writer.commit(manifest, source)
+
+
+async def scrape_sources(
+    data_sources: dict = DATA_SOURCES,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    timeout: float = DEFAULT_TIMEOUT,
+    transport=None,
+    base_dir=BASE_DIR,
+    cache=None,
+    policy=None,
+    limiter=None,
+    source_timeout: float = None,
+    stream: bool = False,
+) -> dict:
+    """
+    This function scrapes all of the data sources concurrently. Requests go
+    through one pooled client, so connections to the KFF host are reused, and
+    at most `concurrency` requests are in flight at once. Requests are rate
+    limited per host and retried with backoff; a source that still fails is
+    recorded without stopping the others. Sources the cache reports as
+    unchanged are not parsed or rewritten. With `stream`, each response is
+    parsed and written as it arrives instead of being loaded whole.
 
     Parameters:
         data_sources: The dictionary that contains all of the necessary
             information needed to scrape all of the data sources.
+        concurrency: the maximum number of requests in flight at once.
+        timeout: the number of seconds to wait on a request.
+        transport: an optional httpx transport, e.g. httpx.MockTransport in tests.
+        base_dir: the directory the output files are relative to.
+        cache: an optional ResponseCache the requests go through.
+        policy: the RetryPolicy (defaults to RetryPolicy()).
+        limiter: the HostRateLimiter (defaults to HostRateLimiter()).
+        source_timeout: the most seconds a source may take, retries included.
+        stream: if True, parse and write each source incrementally.
+
+    Returns:
+        A dictionary with, for each source, the wall time in seconds it took,
+        how its response was obtained ("failed" with an "error" if it could
+        not be scraped), the number of requests sent and whether its csv
+        changed.
     """
-    # Unpack the important information for each data source to be scraped
-    for url, variables, start_index, output_file in DATA_SOURCES.values():
-        info = get_json_from_html(url)
-        data = extract_state_info(info["data"][start_index:], variables)
-        write_to_csv(data, variables, output_file)
+    if limiter is None:
+        limiter = HostRateLimiter()
+    manifest = Manifest(base_dir)
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(
+        limits=limits, timeout=timeout, transport=transport
+    ) as http_client:
+        client = AsyncRetryingClient(http_client, policy, limiter)
+
+        async def scrape_source(name, source):
+            url, variables, start_index, output_file = source
+            start = time.perf_counter()
+            try:
+                if stream:
+                    async with semaphore:
+                        status, changed = await asyncio.wait_for(
+                            stream_source_async(
+                                client,
+                                url,
+                                variables,
+                                start_index,
+                                output_file,
+                                base_dir,
+                                manifest,
+                                name,
+                                cache,
+                            ),
+                            source_timeout,
+                        )
+                    result = {"status": status, "changed": changed}
+                else:
+                    async with semaphore:
+                        response = await asyncio.wait_for(
+                            fetch_async(client, url, cache), source_timeout
+                        )
+                    changed = False
+                    if needs_writing(response, base_dir / output_file):
+                        info = json.loads(response.text)
+                        changed = save_source(
+                            info, variables, start_index, output_file, base_dir, manifest, name
+                        )
+                        response.mark_written()
+                    result = {"status": response.status, "changed": changed}
+            except Exception as error:  # one bad source should not stop the rest
+                result = failed_result(error)
+
+            result["seconds"] = time.perf_counter() - start
+            result["attempts"] = client.attempts.get(url, 0)
+
+            return name, result
+
+        timings = await asyncio.gather(
+            *(scrape_source(name, source) for name, source in data_sources.items())
+        )
+
+    manifest.save()
+
+    return dict(timings)
+
+
+def run_kff_scrapers_async(
+    concurrency: int = DEFAULT_CONCURRENCY,
+    timeout: float = DEFAULT_TIMEOUT,
+    cache=None,
+    policy=None,
+    stream: bool = False,
+    limiter=None,
+) -> dict:
+    """
+    This function runs the web scraping functions on the data to be scraped,
+    fetching the sources concurrently.
+
+    Parameters:
+        concurrency: the maximum number of requests in flight at once.
+        timeout: the number of seconds to wait on a request.
+        cache: an optional ResponseCache the requests go through.
+        policy: the RetryPolicy (defaults to RetryPolicy()).
+        stream: if True, parse and write each source incrementally.
+        limiter: the HostRateLimiter (defaults to HostRateLimiter()).
+
+    Returns:
+        The per-source results of `scrape_sources`.
+    """
+    return asyncio.run(
+        scrape_sources(
+            concurrency=concurrency,
+            timeout=timeout,
+            cache=cache,
+            policy=policy,
+            stream=stream,
+            limiter=limiter,
+        )
+    )
@@ -0,0 +1,133 @@
+"""
+This file keeps a manifest of the scraped csv files: the sha256 hash of each
+file's contents, the source it came from and when it last changed. Outputs are
+only rewritten when their hash changes, and they are written to a temporary
+file first and then renamed, so a reader never sees a half-written csv.
+
+Because unchanged csv files are left untouched (including their modification
+time), the stages that read them, like the kff merge and the map figures, can
+tell from the manifest or the file times that there is no new work to do.
+"""
+
+import datetime
+import hashlib
+import json
+import os
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent.parent
+MANIFEST_FILE = "data/scrape_data/manifest.json"
+
+
+def content_hash(content: str) -> str:
+    """
+    This function returns the sha256 hash of a file's text.
+    """
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def atomic_write(path, content: str):
+    """
+    This function writes text to a temporary file next to `path` and renames
+    it over `path`, so the file is replaced in one step.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, "w", newline="", encoding="utf-8") as file:
+        file.write(content)
+    os.replace(temp_path, path)
+
+
+class Manifest:
+    """
+    The hashes of the scraped csv files, keyed by their path relative to
+    `base_dir`.
+
+    Parameters:
+        base_dir: the directory the output files (and manifest) are relative to.
+    """
+
+    def __init__(self, base_dir=BASE_DIR):
+        self.base_dir = Path(base_dir)
+        self.path = self.base_dir / MANIFEST_FILE
+        self.entries = {}
+        self.changed = []
+
+        if self.path.exists():
+            with open(self.path) as file:
+                self.entries = json.load(file)
+
+    def recorded_hash(self, output_file: str):
+        """
+        This function returns the hash recorded for an output file. Files
+        written before the manifest existed are hashed from disk.
+        """
+        entry = self.entries.get(str(output_file))
+        if entry is not None:
+            return entry["sha256"]
+
+        path = self.base_dir / output_file
+        if path.exists():
+            return hashlib.sha256(path.read_bytes()).hexdigest()
+
+        return None
+
+    def write(self, output_file: str, content: str, source: str = None) -> bool:
+        """
+        This function writes `content` to an output file if its hash differs
+        from the one recorded, and records the new hash.
+
+        Parameters:
+            output_file: the path to the file, relative to base_dir.
+            content: the text of the file.
+            source: the name of the data source the file comes from.
+
+        Returns:
+            True if the file was written, False if it was already up to date.
+        """
+        digest = content_hash(content)
+        path = self.base_dir / output_file
+
+        if path.exists() and self.recorded_hash(output_file) == digest:
+            return False
+
+        atomic_write(path, content)
+        self._record(output_file, digest, source)
+
+        return True
+
+    def replace(self, output_file: str, temp_path, digest: str, source: str = None) -> bool:
+        """
+        This function is the same as `write`, for content already written to a
+        temporary file (with sha256 `digest`): the temporary file is renamed
+        over the output file if the hash changed, and deleted otherwise.
+        """
+        path = self.base_dir / output_file
+
+        if path.exists() and self.recorded_hash(output_file) == digest:
+            Path(temp_path).unlink()
+            return False
+
+        os.replace(temp_path, path)
+        self._record(output_file, digest, source)
+
+        return True
+
+    def _record(self, output_file: str, digest: str, source: str):
+        self.entries[str(output_file)] = {
+            "sha256": digest,
+            "source": source,
+            "updated": datetime.datetime.now(datetime.timezone.utc).isoformat(
+                timespec="seconds"
+            ),
+        }
+        self.changed.append(str(output_file))
+
+    def save(self):
+        """
+        This function writes the manifest to disk, if any file changed.
+        """
+        if not self.changed:
+            return
+        atomic_write(self.path, json.dumps(self.entries, indent=2, sort_keys=True))
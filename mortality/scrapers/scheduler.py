@@ -0,0 +1,251 @@
+"""
+This file makes the scrapers reliable when there are many sources to fetch.
+Requests are retried with exponential backoff and jitter when the server
+answers 429 or a 5xx status, or the connection fails, honoring the server's
+Retry-After header when it sends one. Every host also gets a token bucket, so
+requests to the same host are spread out at a steady rate instead of arriving
+all at once.
+
+The retrying clients wrap an httpx client (or the httpx module) and expose the
+same `get` method, so they can be passed anywhere the scrapers and the
+response cache expect a client.
+"""
+
+import asyncio
+import datetime
+import email.utils
+import random
+import threading
+import time
+import httpx
+
+# Statuses worth retrying: rate limited, or a server error that may be temporary
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Default requests per second allowed to each host, and how many requests can
+# be sent in a burst before the rate applies
+DEFAULT_RATE = 5.0
+DEFAULT_BURST = 5
+
+
+class RetryPolicy:
+    """
+    How often and how long to wait before retrying a failed request.
+
+    Parameters:
+        max_attempts: the most times a request is sent, including the first.
+        base_delay: seconds to wait before the first retry; doubles each retry.
+        max_delay: the longest wait between two attempts, also applied to the
+            server's Retry-After.
+        jitter: if True, wait a random time between 0 and the backoff delay
+            ("full jitter"), so retries from many sources do not line up.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        jitter: bool = True,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def delay(self, attempt: int, retry_after: float = None) -> float:
+        """
+        This function returns the seconds to wait after the given attempt
+        (counting from 0) failed.
+        """
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+
+        backoff = min(self.base_delay * 2**attempt, self.max_delay)
+        if self.jitter:
+            return random.uniform(0, backoff)
+
+        return backoff
+
+
+def parse_retry_after(value: str):
+    """
+    This function reads a Retry-After header, given either as a number of
+    seconds or as an HTTP date, and returns the seconds to wait (or None).
+    """
+    if value is None:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    return max(0.0, (when - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """
+    Token bucket allowing `rate` requests per second with bursts of `burst`.
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        This function takes a token and returns the seconds the caller has to
+        wait before using it (0 if a token was available).
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+class HostRateLimiter:
+    """
+    One token bucket per host, created the first time the host is requested.
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+
+    def reserve(self, url) -> float:
+        """
+        This function returns the seconds to wait before requesting `url`.
+        """
+        host = httpx.URL(str(url)).host
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.rate, self.burst)
+
+        return self.buckets[host].reserve()
+
+
+def _should_retry(response) -> bool:
+    return response.status_code in RETRY_STATUSES
+
+
+class RetryingClient:
+    """
+    Sends requests with `client`, rate limited per host and retried according
+    to the retry policy. `attempts` counts the requests sent per url.
+
+    Parameters:
+        client: httpx or an httpx.Client to send the requests with.
+        policy: the RetryPolicy.
+        limiter: the HostRateLimiter (None for no rate limit).
+    """
+
+    def __init__(self, client=httpx, policy=None, limiter=None):
+        self.client = client
+        self.policy = policy or RetryPolicy()
+        self.limiter = limiter
+        self.attempts = {}
+
+    def get(self, url, headers=None):
+        for attempt in range(self.policy.max_attempts):
+            if self.limiter is not None:
+                time.sleep(self.limiter.reserve(url))
+            self.attempts[url] = attempt + 1
+
+            last_attempt = attempt == self.policy.max_attempts - 1
+            try:
+                response = self.client.get(url, headers=headers)
+            except httpx.TransportError:
+                if last_attempt:
+                    raise
+                time.sleep(self.policy.delay(attempt))
+                continue
+
+            if not _should_retry(response) or last_attempt:
+                return response
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            time.sleep(self.policy.delay(attempt, retry_after))
+
+
+class AsyncRetryingClient:
+    """
+    The same as RetryingClient, for an httpx.AsyncClient.
+    """
+
+    def __init__(self, client, policy=None, limiter=None):
+        self.client = client
+        self.policy = policy or RetryPolicy()
+        self.limiter = limiter
+        self.attempts = {}
+
+    async def get(self, url, headers=None):
+        return await self._send(url, headers, stream=False)
+
+    async def send_streaming(self, url, headers=None):
+        """
+        This function sends the request without reading the body, so it can
+        be streamed; the caller has to close the returned response.
+        """
+        return await self._send(url, headers, stream=True)
+
+    async def _send(self, url, headers, stream: bool):
+        for attempt in range(self.policy.max_attempts):
+            if self.limiter is not None:
+                await asyncio.sleep(self.limiter.reserve(url))
+            self.attempts[url] = attempt + 1
+
+            last_attempt = attempt == self.policy.max_attempts - 1
+            try:
+                request = self.client.build_request("GET", url, headers=headers)
+                response = await self.client.send(request, stream=stream)
+            except httpx.TransportError:
+                if last_attempt:
+                    raise
+                await asyncio.sleep(self.policy.delay(attempt))
+                continue
+
+            if not _should_retry(response) or last_attempt:
+                return response
+            await response.aclose()
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            await asyncio.sleep(self.policy.delay(attempt, retry_after))
+
+
+def summarize(results: dict, seconds: float) -> dict:
+    """
+    This function summarizes the per-source results of a scrape.
+
+    Parameters:
+        results: dictionary of source name to its result dictionary, with at
+            least "status" and "changed", plus "error" for failed sources.
+        seconds: the wall time of the whole scrape.
+
+    Returns:
+        A dictionary with the number of sources, the sources that changed,
+        the failed sources with their errors, the number of retries and the
+        wall time.
+    """
+    return {
+        "sources": len(results),
+        "succeeded": sum(result["status"] != "failed" for result in results.values()),
+        "changed": [name for name, result in results.items() if result["changed"]],
+        "failed": {
+            name: result["error"]
+            for name, result in results.items()
+            if result["status"] == "failed"
+        },
+        "retries": sum(max(result.get("attempts", 1) - 1, 0) for result in results.values()),
+        "seconds": seconds,
+    }
@@ -0,0 +1,142 @@
+"""
+This file serves the dashboards in production: the Dash apps are created
+through their app factories on one Flask (WSGI) server, with debug mode and
+the reloader off, and the server is run by several worker processes.
+
+The data, the figures and the model predictions are all loaded when the apps
+are created, before the workers are forked, so the workers share them
+copy-on-write instead of each loading its own copy. Every worker accepts
+connections on the same listening socket and handles requests in threads.
+The workers share their metrics through a temporary directory (see
+metrics.py), so `/metrics` reports all of them whichever worker answers.
+
+`create_server` is also a WSGI app factory for other WSGI servers, e.g.
+
+    gunicorn --workers 4 --preload "mortality.server:create_server()"
+"""
+
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import flask
+from werkzeug.serving import make_server
+from mortality import metrics
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8050
+
+
+def _create_map(server, url_base_pathname, figure_store):
+    from mortality.map_viz import create_map_app
+
+    return create_map_app(figure_store, server, url_base_pathname)
+
+
+def _create_prediction(server, url_base_pathname, figure_store):
+    from mortality.predict_model import create_prediction_app
+
+    return create_prediction_app(server, url_base_pathname)
+
+
+# the app factory of each dashboard
+DASHBOARDS = {"map": _create_map, "prediction": _create_prediction}
+
+
+def create_server(dashboards=("map",), figure_store=None) -> flask.Flask:
+    """
+    This function creates one Flask server with the given dashboards mounted
+    on it: the first at "/", the others at "/<name>/".
+
+    Parameters:
+        dashboards: the names of the dashboards to serve (see DASHBOARDS).
+        figure_store: optional directory to share the map figures across
+            processes.
+
+    Returns:
+        The Flask server, a WSGI application.
+    """
+    server = flask.Flask("mortality")
+
+    for i, name in enumerate(dashboards):
+        url_base_pathname = "/" if i == 0 else f"/{name}/"
+        DASHBOARDS[name](server, url_base_pathname, figure_store)
+
+    return server
+
+
+def serve(application, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, workers: int = 1):
+    """
+    This function serves a WSGI application with `workers` processes forked
+    from the current one, which all accept connections on one socket. It
+    returns when the server is interrupted (Control+C or SIGTERM).
+
+    Parameters:
+        application: the WSGI application, created before calling this.
+        host: the address to listen on.
+        port: the port to listen on.
+        workers: the number of worker processes.
+    """
+    if workers == 1:
+        server = make_server(host, port, application, threaded=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if not hasattr(os, "fork"):
+        raise RuntimeError("Serving with several workers needs os.fork")
+
+    listener = socket.create_server((host, port), backlog=128)
+    listener.set_inheritable(True)
+
+    # the metrics directory is only removed if it was created here; one given
+    # through the environment is emptied of earlier runs' snapshots
+    metrics_dir = os.environ.get(metrics.MULTIPROCESS_ENV)
+    created_metrics_dir = not metrics_dir
+    if created_metrics_dir:
+        metrics_dir = tempfile.mkdtemp(prefix="mortality-metrics-")
+        os.environ[metrics.MULTIPROCESS_ENV] = metrics_dir
+    else:
+        for path in os.listdir(metrics_dir):
+            if path.startswith("metrics-"):
+                os.remove(os.path.join(metrics_dir, path))
+    # what the parent recorded before forking, e.g. while warming the caches
+    metrics.flush(force=True)
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            metrics.forked()
+            server = make_server(host, port, application, threaded=True, fd=listener.fileno())
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                os._exit(0)
+        children.append(pid)
+
+    # the parent only waits for the workers, and stops them when it is stopped
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        listener.close()
+        if created_metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+            del os.environ[metrics.MULTIPROCESS_ENV]
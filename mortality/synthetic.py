@@ -0,0 +1,294 @@
+"""
+This file generates synthetic versions of the project's input data at any
+scale, to load-test and profile the pipeline and the dashboards beyond the 50
+states and 120 regional rows of the real data:
+
+    - every csv written by the KFF scrapers (DATA_SOURCES) and the abortion
+      policy scraper, with the same columns and value formats, for any number
+      of geographies (states first, then made-up counties)
+    - the CDC WONDER export `region_age_educ_race.csv`, with the same columns
+      and the categories (and codes) WONDER uses, for any number of rows
+
+The scraped files are generated column by column from the real files: each
+value is drawn from the real values of its column, and numbers are randomly
+scaled while keeping their format ("12%", "$1,097", "97,463,300", "5.61"),
+so text columns keep their real categories. The files are written under a
+root directory with the same layout as the repository's `data/` directory, so
+the pipeline can run on them, e.g. `python -m mortality build --root DIR`.
+"""
+
+import csv
+import random
+import re
+from pathlib import Path
+from mortality.scrapers.abortion_web_scraping import OUTPUT_FILE as ABORTION_FILE
+from mortality.scrapers.kff_data_sources import DATA_SOURCES
+
+BASE_DIR = Path(__file__).parent.parent
+REGIONAL_FILE = "data/downloaded_data/region_age_educ_race.csv"
+# rows in the real regional export
+REGIONAL_BLOCK = 120
+# number of distinct generated values per column of a scraped file
+POOL_SIZE = 1024
+
+# the categories of the CDC WONDER export, with their codes
+CENSUS_REGIONS = [
+    ("Census Region 1: Northeast", "CENS-R1"),
+    ("Census Region 2: Midwest", "CENS-R2"),
+    ("Census Region 3: South", "CENS-R3"),
+    ("Census Region 4: West", "CENS-R4"),
+]
+EDUCATION = [
+    ("8th grade or less", "1"),
+    ("9th through 12th grade with no diploma", "2"),
+    ("High school graduate or GED completed", "3"),
+    ("Some college credit, but not a degree.", "4"),
+    ("Associate degree (AA,AS)", "5"),
+    ("Bachelor?s degree (BA, AB, BS)", "6"),
+    ("Master?s degree (MA, MS, MEng, MEd, MSW, MBA)", "7"),
+    ("Doctorate (PhD, EdD) or Professional Degree (MD, DDS, DVM, LLB, JD)", "8"),
+    ("Unknown or Not Stated", "9"),
+    ("Not Available", "10"),
+]
+RACES = [
+    ("American Indian or Alaska Native", "1002-5"),
+    ("Asian", "A"),
+    ("Black or African American", "2054-5"),
+    ("Native Hawaiian or Other Pacific Islander", "NHOPI"),
+    ("White", "2106-3"),
+    ("More than one race", "M"),
+]
+AGE_GROUPS = [
+    ("15-24 years", "15-24"),
+    ("25-34 years", "25-34"),
+    ("35-44 years", "35-44"),
+    ("45-54 years", "45-54"),
+]
+REGIONAL_COLUMNS = [
+    "Notes",
+    "Census Region",
+    "Census Region Code",
+    "Education",
+    "Education Code",
+    "Single Race 6",
+    "Single Race 6 Code",
+    "Ten-Year Age Groups",
+    "Ten-Year Age Groups Code",
+    "Deaths",
+    "Population",
+    "Crude Rate",
+    "% of Total Deaths",
+]
+# the notes WONDER writes after the data of an export
+REGIONAL_FOOTER = [
+    "---",
+    "Dataset: Natality, 2016-2023 expanded",
+    "Query Parameters:",
+    "Group By: Census Region; Education; Single Race 6; Ten-Year Age Groups",
+    "---",
+    "Help: See http://wonder.cdc.gov/wonder/help/natality-expanded.html for more information.",
+    "---",
+]
+
+# a number inside a value, with what comes before and after it
+_NUMBER = re.compile(r"^(?P<prefix>[^\d]*?)(?P<number>\d[\d,]*(?:\.\d+)?)(?P<suffix>[^\d]*)$")
+
+
+def scaled_value(template: str, generator: random.Random) -> str:
+    """
+    This function returns a random value formatted like `template`: numbers
+    are scaled by a random factor between 0.5 and 1.5 (percentages stay at or
+    below 100%), other values are returned as they are.
+    """
+    match = _NUMBER.match(template)
+    if match is None:
+        return template
+
+    number = match["number"]
+    decimals = len(number.split(".")[1]) if "." in number else 0
+    value = float(number.replace(",", "")) * generator.uniform(0.5, 1.5)
+    if match["suffix"] == "%":
+        value = min(value, 100.0)
+
+    text = f"{value:,.{decimals}f}" if "," in number else f"{value:.{decimals}f}"
+
+    return match["prefix"] + text + match["suffix"]
+
+
+def geography_names(states: list, count: int) -> list:
+    """
+    This function returns `count` geography names: the states, then made-up
+    counties of each state.
+    """
+    return [
+        states[i] if i < len(states) else f"{states[i % len(states)]} County {i // len(states)}"
+        for i in range(count)
+    ]
+
+
+def synthetic_rows(template_file, geographies: int, seed: int = 0) -> list:
+    """
+    This function generates the rows of a scraped csv from the real one.
+
+    Parameters:
+        template_file: the real scraped csv to copy the columns and formats of.
+        geographies: the number of geographies (rows after the first data row,
+            which is the United States total in the KFF files).
+        seed: the random seed.
+
+    Returns:
+        list of rows, the header first.
+    """
+    generator = random.Random(seed)
+    with open(template_file, newline="", encoding="utf-8") as file:
+        header, *rows = list(csv.reader(file))
+
+    # the KFF files start with a United States row, kept as the first row
+    total = [rows.pop(0)] if rows[0][0] == "United States" else []
+    columns = list(zip(*rows))
+    names = geography_names(list(columns[0]), geographies)
+
+    # values are drawn from a pool of scaled values per column, which keeps
+    # generating millions of rows fast
+    values = [
+        generator.choices(
+            [scaled_value(generator.choice(column), generator) for _ in range(POOL_SIZE)],
+            k=geographies,
+        )
+        for column in columns[1:]
+    ]
+    synthetic = [list(row) for row in zip(names, *values)]
+
+    return [header] + total + synthetic
+
+
+def write_csv(rows: list, path):
+    """
+    This function writes rows the way the scrapers write their csv files.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        csv.writer(file).writerows(rows)
+
+
+def write_scraped(root, geographies: int, template_dir=BASE_DIR, seed: int = 0) -> list:
+    """
+    This function writes synthetic versions of every scraped csv under `root`,
+    at the same paths as in the repository.
+
+    Parameters:
+        root: the directory to write the `data/scrape_data` files under.
+        geographies: the number of geographies in each file.
+        template_dir: the directory holding the real scraped files.
+        seed: the random seed.
+
+    Returns:
+        list of the paths written.
+    """
+    outputs = [source[3] for source in DATA_SOURCES.values()] + [ABORTION_FILE]
+    paths = []
+    for i, output_file in enumerate(outputs):
+        rows = synthetic_rows(Path(template_dir) / output_file, geographies, seed + i)
+        write_csv(rows, Path(root) / output_file)
+        paths.append(Path(root) / output_file)
+
+    return paths
+
+
+def kff_sheet(source: str, geographies: int, seed: int = 0) -> dict:
+    """
+    This function generates the json a KFF sheet is served as, for one of the
+    DATA_SOURCES: a "data" list whose first `start_index` rows are headers,
+    followed by one row per geography.
+    """
+    _, variables, start_index, output_file = DATA_SOURCES[source]
+    _, *rows = synthetic_rows(BASE_DIR / output_file, geographies, seed)
+    headers = [list(variables)] * start_index
+
+    return {"data": headers + rows[-geographies:]}
+
+
+def regional_rows(rows: int, seed: int = 0) -> list:
+    """
+    This function generates a CDC WONDER export of maternal deaths by census
+    region, education, race and age group, with `rows` rows drawn from all
+    the combinations of those categories.
+
+    Returns:
+        list of rows, the header first.
+    """
+    generator = random.Random(seed)
+    categories = [
+        (
+            generator.choice(CENSUS_REGIONS),
+            generator.choice(EDUCATION),
+            generator.choice(RACES),
+            generator.choice(AGE_GROUPS),
+        )
+        for _ in range(rows)
+    ]
+    # WONDER suppresses counts below 10
+    deaths = [int(generator.lognormvariate(3.5, 0.9)) + 10 for _ in range(rows)]
+    # every block of REGIONAL_BLOCK rows stands for one export (e.g. one year),
+    # so the percentages of total deaths stay as large as in the real export
+    totals = [
+        sum(deaths[start : start + REGIONAL_BLOCK])
+        for start in range(0, rows, REGIONAL_BLOCK)
+    ]
+
+    return [REGIONAL_COLUMNS] + [
+        [
+            "",
+            region,
+            region_code,
+            education,
+            education_code,
+            race,
+            race_code,
+            age,
+            age_code,
+            str(count),
+            "Not Applicable",
+            "Not Applicable",
+            f"{count / totals[i // REGIONAL_BLOCK] * 100:.2f}%",
+        ]
+        for i, (
+            ((region, region_code), (education, education_code), (race, race_code), (age, age_code)),
+            count,
+        ) in enumerate(zip(categories, deaths))
+    ]
+
+
+def write_regional(root, rows: int, seed: int = 0, footer: bool = False) -> Path:
+    """
+    This function writes a synthetic `region_age_educ_race.csv` under `root`,
+    with the byte order mark WONDER exports start with, and optionally the
+    notes WONDER writes after the data.
+    """
+    path = Path(root) / REGIONAL_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8-sig") as file:
+        writer = csv.writer(file)
+        writer.writerows(regional_rows(rows, seed))
+        if footer:
+            writer.writerows([note] for note in REGIONAL_FOOTER)
+
+    return path
+
+
+def generate(root, scale: float = 1, seed: int = 0) -> dict:
+    """
+    This function writes every synthetic input under `root`, `scale` times
+    the size of the real data: 50 * scale geographies in the scraped files and
+    120 * scale rows in the regional export.
+
+    Returns:
+        dictionary with the number of geographies, regional rows and files.
+    """
+    geographies = max(1, round(50 * scale))
+    rows = max(1, round(REGIONAL_BLOCK * scale))
+    paths = write_scraped(root, geographies, seed=seed)
+    paths.append(write_regional(root, rows, seed))
+
+    return {"geographies": geographies, "regional_rows": rows, "files": len(paths)}
@@ -0,0 +1,256 @@
+"""
+This file serves the pages of the dashboard tables from the server, so a
+DataTable with `page_action="custom"` only receives the rows it shows. A
+TableIndex holds the rows of a table as the records Dash sends, and the order
+of the rows sorted by each column, computed once:
+
+    - a page of the table, sorted by a column or not, is a slice of one of
+      these orders, so it takes time in the size of the page only
+    - a filter (the DataTable `filter_query`) is evaluated once over whole
+      columns, and the rows it keeps are cached in each sorted order
+
+The filter queries are the ones the DataTable writes, clauses such as
+`{State} contains Ill` or `{Maternal Mortality Rate per 100,000 Live Births} > 20`
+joined with `&&`. Clauses that cannot be parsed are ignored.
+"""
+
+import math
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# number of (filter, sort) row selections cached per table
+SELECTIONS = 64
+
+# (data version, table name) -> TableIndex
+_tables = {}
+_lock = threading.Lock()
+
+# "{column} operator value", the value possibly quoted
+_CLAUSE = re.compile(
+    r"^\s*\{(?P<column>[^}]*)\}\s*(?P<operator>[a-z=!<>]+)\s*(?P<value>.*?)\s*$"
+)
+_QUOTED = re.compile(r"^([\"'`])(?P<value>.*)\1$")
+
+_COMPARISONS = {
+    "=": "eq",
+    "eq": "eq",
+    "!=": "ne",
+    "ne": "ne",
+    "<": "lt",
+    "lt": "lt",
+    "<=": "le",
+    "le": "le",
+    ">": "gt",
+    "gt": "gt",
+    ">=": "ge",
+    "ge": "ge",
+}
+_OPERATORS = set(_COMPARISONS) | {"contains", "datestartswith"}
+
+
+def parse_filter(filter_query: str) -> list:
+    """
+    This function splits a DataTable filter query into its clauses.
+
+    Returns:
+        list of (column, operator, value, case sensitive) tuples, where the
+        operator is "eq", "ne", "lt", "le", "gt", "ge", "contains" or
+        "datestartswith"
+    """
+    clauses = []
+    for part in (filter_query or "").split("&&"):
+        match = _CLAUSE.match(part)
+        if match is None:
+            continue
+        operator = match["operator"]
+        # "i" and "s" prefixes make a text comparison case insensitive or sensitive
+        sensitive = True
+        if operator not in _OPERATORS and operator[1:] in _OPERATORS and operator[0] in "is":
+            sensitive = operator[0] == "s"
+            operator = operator[1:]
+        if operator not in _OPERATORS:
+            continue
+        operator = _COMPARISONS.get(operator, operator)
+
+        value = match["value"]
+        quoted = _QUOTED.match(value)
+        if quoted is not None:
+            value = quoted["value"]
+        clauses.append((match["column"], operator, value, sensitive))
+
+    return clauses
+
+
+class TableIndex:
+    """
+    The rows of a table, and their order when sorted by each column.
+
+    Attributes:
+        columns: the DataTable column definitions, numeric or text
+        records: the rows as dictionaries, in the order of the frame
+        orders: dictionary mapping each column to the positions of the rows
+            sorted by it, missing values last
+    """
+
+    def __init__(self, frame):
+        self.frame = frame.reset_index(drop=True)
+        self.records = self.frame.to_dict("records")
+        self.numeric = {
+            column: pd.api.types.is_numeric_dtype(self.frame[column])
+            for column in self.frame.columns
+        }
+        self.columns = [
+            {"name": column, "id": column, "type": "numeric" if numeric else "text"}
+            for column, numeric in self.numeric.items()
+        ]
+        self.orders = {
+            column: self.frame[column]
+            .sort_values(kind="stable", na_position="last")
+            .index.to_numpy()
+            for column in self.frame.columns
+        }
+        self.filled = {column: int(self.frame[column].notna().sum()) for column in self.frame}
+        self._selections = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.records)
+
+    def _clause_mask(self, column, operator, value, sensitive):
+        """
+        This function returns the rows a filter clause keeps, as a boolean
+        array.
+        """
+        if column not in self.numeric:
+            return np.ones(len(self), dtype=bool)
+        series = self.frame[column]
+
+        if self.numeric[column] and operator not in ["contains", "datestartswith"]:
+            try:
+                number = float(value)
+            except ValueError:
+                return np.zeros(len(self), dtype=bool)
+            compare = getattr(series, operator)
+            return compare(number).to_numpy(dtype=bool)
+
+        text = series.astype(str).where(series.notna(), "")
+        if not sensitive:
+            text, value = text.str.lower(), value.lower()
+        if operator == "contains":
+            return text.str.contains(value, regex=False).to_numpy(dtype=bool)
+        if operator == "datestartswith":
+            return text.str.startswith(value).to_numpy(dtype=bool)
+        return getattr(text, operator)(value).to_numpy(dtype=bool)
+
+    def rows(self, sort_by=None, filter_query: str = "") -> np.ndarray:
+        """
+        This function returns the positions of the rows kept by the filter,
+        in the order of the sort, or None for all the rows in their order.
+
+        Parameters:
+            sort_by: the DataTable `sort_by`, a list of {"column_id",
+                "direction"} dictionaries; only the first sort is used.
+            filter_query: the DataTable `filter_query`.
+
+        Returns:
+            array of row positions, or None
+        """
+        sort = None
+        if sort_by and sort_by[0].get("column_id") in self.orders:
+            sort = (sort_by[0]["column_id"], sort_by[0].get("direction", "asc"))
+        clauses = tuple(parse_filter(filter_query))
+        if sort is None and not clauses:
+            return None
+
+        key = (sort, clauses)
+        with self._lock:
+            if key in self._selections:
+                self._selections.move_to_end(key)
+                return self._selections[key]
+
+        if sort is None:
+            positions = np.arange(len(self))
+        else:
+            column, direction = sort
+            positions = self.orders[column]
+            if direction == "desc":
+                # descending, with the missing values still last
+                filled = self.filled[column]
+                positions = np.concatenate([positions[:filled][::-1], positions[filled:]])
+        if clauses:
+            mask = np.ones(len(self), dtype=bool)
+            for clause in clauses:
+                mask &= self._clause_mask(*clause)
+            positions = positions[mask[positions]]
+
+        with self._lock:
+            self._selections[key] = positions
+            if len(self._selections) > SELECTIONS:
+                self._selections.popitem(last=False)
+
+        return positions
+
+    def page(self, page_current: int, page_size: int, sort_by=None, filter_query: str = ""):
+        """
+        This function returns one page of the table.
+
+        Parameters:
+            page_current: the index of the page, from 0; pages past the last
+                one return the last page, and pages before the first one the
+                first page.
+            page_size: the number of rows per page, at least 1.
+            sort_by: the DataTable `sort_by`.
+            filter_query: the DataTable `filter_query`.
+
+        Returns:
+            (list of the records of the page, number of pages)
+        """
+        # the page comes from the client: pages of no rows have no count
+        page_size = max(1, page_size or 1)
+        positions = self.rows(sort_by, filter_query)
+        count = len(self) if positions is None else len(positions)
+        page_count = max(1, math.ceil(count / page_size))
+        start = max(0, min(page_current or 0, page_count - 1)) * page_size
+
+        if positions is None:
+            return self.records[start : start + page_size], page_count
+
+        return [self.records[i] for i in positions[start : start + page_size]], page_count
+
+
+def table_index(version: str, name: str, build) -> TableIndex:
+    """
+    This function returns the index of a table, building it only once per
+    version of the data. Only the index of the latest version is kept.
+
+    Parameters:
+        version: the version of the data the table is built from.
+        name: the name of the table.
+        build: a function with no arguments returning the table's data frame.
+
+    Returns:
+        TableIndex
+    """
+    key = (version, name)
+    with _lock:
+        table = _tables.get(key)
+        if table is None:
+            table = TableIndex(build())
+            # the index of the table for an older version is not used again
+            for old_key in [old_key for old_key in _tables if old_key[1] == name]:
+                del _tables[old_key]
+            _tables[key] = table
+
+    return table
+
+
+def clear_tables():
+    """
+    This function empties the cache of table indexes, so the next page of a
+    table indexes it again.
+    """
+    with _lock:
+        _tables.clear()
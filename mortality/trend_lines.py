@@ -0,0 +1,115 @@
+"""
+This file fits the trend lines of the scatter plots. Every trend line is a
+least squares line of one variable on a single other variable, so instead of
+fitting a statsmodels OLS per plot, the slopes and intercepts of all the
+x-axes are computed together with the closed-form solution
+
+    slope = sum((x - mean(x)) * (y - mean(y))) / sum((x - mean(x)) ** 2)
+    intercept = mean(y) - slope * mean(x)
+
+over the stacked x columns. Rows where x or y is missing are left out of the
+fit of that column only. The fits are cached for the latest version of the
+data, and can also give confidence bands for the fitted line.
+"""
+
+import threading
+import numpy as np
+
+# (data version, y column, x columns) -> TrendLines
+_trends = {}
+_lock = threading.Lock()
+
+
+class TrendLines:
+    """
+    The least squares lines of `y` on each of the x columns.
+
+    Attributes (arrays with one value per x column):
+        slope, intercept: the coefficients of the line.
+        n: the number of rows used in the fit.
+        x_mean: the mean of x over those rows.
+        sxx: the sum of squared deviations of x from its mean.
+        residual_se: the standard error of the residuals.
+    """
+
+    def __init__(self, frame, y: str, columns: list):
+        self.columns = list(columns)
+        self._index = {column: i for i, column in enumerate(self.columns)}
+
+        xs = frame[self.columns].to_numpy(dtype=float)
+        ys = frame[y].to_numpy(dtype=float)[:, None]
+        used = ~np.isnan(xs) & ~np.isnan(ys)
+        xs = np.where(used, xs, 0.0)
+        ys = np.where(used, ys, 0.0)
+
+        self.n = used.sum(axis=0)
+        self.x_mean = xs.sum(axis=0) / self.n
+        y_mean = ys.sum(axis=0) / self.n
+        dx = np.where(used, xs - self.x_mean, 0.0)
+        dy = np.where(used, ys - y_mean, 0.0)
+
+        self.sxx = (dx * dx).sum(axis=0)
+        self.slope = (dx * dy).sum(axis=0) / self.sxx
+        self.intercept = y_mean - self.slope * self.x_mean
+
+        residuals = np.where(used, dy - self.slope * dx, 0.0)
+        self.residual_se = np.sqrt((residuals * residuals).sum(axis=0) / (self.n - 2))
+
+    def predict(self, column: str, x):
+        """
+        This function returns the fitted values of the line for `column` at x.
+        """
+        i = self._index[column]
+        return self.intercept[i] + self.slope[i] * np.asarray(x, dtype=float)
+
+    def band(self, column: str, x, level: float = 0.95):
+        """
+        This function returns the lower and upper confidence bounds of the
+        fitted line for `column` at x.
+
+        Parameters:
+            column: the x column.
+            x: the values to evaluate the band at.
+            level: the confidence level.
+
+        Returns:
+            A (lower, upper) tuple of arrays.
+        """
+        from scipy.stats import t
+
+        i = self._index[column]
+        x = np.asarray(x, dtype=float)
+        fitted = self.predict(column, x)
+        se_fit = self.residual_se[i] * np.sqrt(
+            1 / self.n[i] + (x - self.x_mean[i]) ** 2 / self.sxx[i]
+        )
+        margin = t.ppf(0.5 + level / 2, self.n[i] - 2) * se_fit
+
+        return fitted - margin, fitted + margin
+
+
+def trend_lines(version: str, frame, y: str, columns: list) -> TrendLines:
+    """
+    This function returns the trend lines of `y` on every column, fitting them
+    only once per version of the data. Only the latest version is kept.
+
+    Parameters:
+        version: the version of the data in `frame`, part of the cache key.
+        frame: data frame holding y and the x columns.
+        y: the name of the y column.
+        columns: the names of the x columns.
+
+    Returns:
+        The TrendLines for the columns.
+    """
+    key = (version, y, tuple(columns))
+    with _lock:
+        lines = _trends.get(key)
+        if lines is None:
+            lines = TrendLines(frame, y, columns)
+            # the lines fit on older versions of the data are not used again
+            for old_key in [old_key for old_key in _trends if old_key[1:] == key[1:]]:
+                del _trends[old_key]
+            _trends[key] = lines
+
+    return lines
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+from mortality.batch_predict import PREDICTION_COLUMN, predict_batch
+from mortality.predict_model import fitted_model, get_data, prediction_scorer
+
+
+@pytest.fixture
+def scorer():
+    return prediction_scorer()
+
+
+@pytest.fixture
+def profiles():
+    return get_data()[["region", "race", "education", "ten_year_age_groups"]]
+
+
+def test_scorer_matches_model(scorer, profiles):
+    expected = fitted_model().predict(profiles)
+    assert np.allclose(scorer.predict(profiles), expected)
+
+
+def test_unknown_category_is_nan(scorer):
+    frame = pd.DataFrame(
+        {
+            "region": ["Northeast", "Atlantis"],
+            "race": ["White", "White"],
+            "education": ["unknown", "unknown"],
+            "ten_year_age_groups": ["15-24", "15-24"],
+        }
+    )
+    predictions = scorer.predict(frame)
+    assert not np.isnan(predictions[0])
+    assert np.isnan(predictions[1])
+
+
+def test_predict_batch_in_chunks(tmp_path, scorer, profiles):
+    input_file = tmp_path / "profiles.csv"
+    output_file = tmp_path / "scored.csv"
+    profiles.to_csv(input_file, index=False)
+
+    reports = []
+    stats = predict_batch(
+        input_file, output_file, scorer, chunksize=25, report=reports.append
+    )
+
+    scored = pd.read_csv(output_file)
+    assert stats["rows"] == len(profiles) == len(scored)
+    assert len(reports) == int(np.ceil(len(profiles) / 25))
+    assert np.allclose(scored[PREDICTION_COLUMN], scorer.predict(profiles))
+
+
+@pytest.mark.parametrize("input_suffix", [".csv", ".parquet"])
+@pytest.mark.parametrize("suffix", [".csv", ".parquet"])
+def test_predict_batch_empty_input(tmp_path, scorer, profiles, input_suffix, suffix):
+    input_file = tmp_path / f"profiles{input_suffix}"
+    output_file = tmp_path / f"scored{suffix}"
+    if input_suffix == ".csv":
+        profiles.head(0).to_csv(input_file, index=False)
+    else:
+        profiles.head(0).astype(str).to_parquet(input_file, index=False)
+
+    stats = predict_batch(input_file, output_file, scorer)
+
+    scored = pd.read_csv(output_file) if suffix == ".csv" else pd.read_parquet(output_file)
+    assert stats["rows"] == 0
+    assert list(scored.columns) == list(profiles.columns) + [PREDICTION_COLUMN]
+
+
+def test_predict_batch_parquet_keeps_types(tmp_path, scorer, profiles):
+    """Test that a first chunk whose optional column is all missing does not
+    fix that column's type for the chunks after it."""
+    input_file = tmp_path / "profiles.csv"
+    output_file = tmp_path / "scored.parquet"
+    frame = profiles.astype(str).assign(note="")
+    frame.loc[frame.index[25:], "note"] = "checked"
+    frame.to_csv(input_file, index=False)
+
+    predict_batch(input_file, output_file, scorer, chunksize=25)
+
+    scored = pd.read_parquet(output_file)
+    assert len(scored) == len(profiles)
+    assert scored["note"].isna().sum() == 25
+    assert (scored["note"].dropna() == "checked").all()
@@ -0,0 +1,45 @@
+import json
+from mortality.bench import compare, load_results, save_baseline
+
+
+def test_compare_flags_regressions():
+    """Test that only medians above the threshold are regressions."""
+    baseline = {"fast": {"median": 1.0, "mean": 1.0}, "slow": {"median": 1.0, "mean": 1.0}}
+    results = {
+        "fast": {"median": 1.2, "mean": 1.2},
+        "slow": {"median": 2.0, "mean": 2.0},
+        "new": {"median": 9.0, "mean": 9.0},
+    }
+
+    assert compare(results, baseline, threshold=0.5) == [("slow", 1.0, 2.0, 2.0)]
+    assert [name for name, *_ in compare(results, baseline, threshold=0.1)] == ["slow", "fast"]
+
+
+def test_compare_uses_fastest_rounds():
+    """Test that the fastest rounds are compared when both runs have them,
+    so a noisy median alone is not a regression."""
+    baseline = {"noisy": {"min": 1.0, "median": 1.0, "mean": 1.0}}
+    noisy = {"noisy": {"min": 1.1, "median": 2.0, "mean": 2.0}}
+    slower = {"noisy": {"min": 2.0, "median": 2.0, "mean": 2.0}}
+
+    assert compare(noisy, baseline, threshold=0.5) == []
+    assert compare(slower, baseline, threshold=0.5) == [("noisy", 1.0, 2.0, 2.0)]
+
+
+def test_results_round_trip(tmp_path):
+    """Test reading pytest-benchmark output and saving it as a baseline."""
+    output = tmp_path / "results.json"
+    output.write_text(
+        json.dumps(
+            {
+                "benchmarks": [
+                    {"fullname": "a::b", "stats": {"min": 0.4, "median": 0.5, "mean": 0.6, "max": 1}}
+                ]
+            }
+        )
+    )
+    results = load_results(output)
+    save_baseline(results, tmp_path / "baseline.json")
+
+    assert results == {"a::b": {"min": 0.4, "median": 0.5, "mean": 0.6}}
+    assert json.loads((tmp_path / "baseline.json").read_text()) == results
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+import plotly.express as px
+import mortality.box_stats
+from mortality.box_stats import BoxStats, box_stats
+from mortality.predict_model import boxplot, get_data
+
+
+@pytest.fixture
+def groups_df():
+    """Skewed values in 4 x 3 groups, one of them empty, with missing values."""
+    generator = np.random.default_rng(0)
+    frame = pd.DataFrame(
+        {
+            "x": generator.choice(list("pqrs"), 5_000),
+            "color": generator.choice(list("abc"), 5_000),
+            "y": np.round(generator.lognormal(0, 1, 5_000), 2),
+        }
+    )
+    frame = frame[~((frame["x"] == "q") & (frame["color"] == "b"))].copy()
+    frame.loc[frame.index[:20], "y"] = np.nan
+    return frame
+
+
+def test_stats_match_plotly_definition(groups_df):
+    """Test every group's quartiles, whiskers and outliers against a direct computation."""
+    stats = BoxStats(groups_df, "y", "x", "color")
+
+    for i, color in enumerate(stats.color_levels):
+        for j, x in enumerate(stats.x_levels):
+            group = groups_df[(groups_df["x"] == x) & (groups_df["color"] == color)]
+            values = group["y"].dropna().to_numpy()
+            assert stats.count[i, j] == len(values)
+            if len(values) == 0:
+                assert np.isnan(stats.median[i, j])
+                assert stats.outliers[i][j] == []
+                continue
+
+            # plotly's "linear" quartiles are numpy's "hazen" quantiles
+            q1, median, q3 = np.quantile(values, [0.25, 0.5, 0.75], method="hazen")
+            assert [stats.q1[i, j], stats.median[i, j], stats.q3[i, j]] == pytest.approx(
+                [q1, median, q3]
+            )
+            low, high = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+            assert stats.lowerfence[i, j] == values[values >= low].min()
+            assert stats.upperfence[i, j] == values[values <= high].max()
+            assert stats.outliers[i][j] == sorted(set(values[(values < low) | (values > high)]))
+
+
+def test_levels_in_order_of_appearance(groups_df):
+    """Test that the boxes are in the order plotly express draws them."""
+    stats = BoxStats(groups_df, "y", "x", "color")
+
+    assert stats.x_levels == list(groups_df["x"].unique())
+    assert stats.color_levels == list(groups_df["color"].unique())
+
+
+def test_single_box_without_variables(groups_df):
+    """Test that without x and color variables all values are in one box."""
+    stats = BoxStats(groups_df, "y")
+
+    assert stats.count.shape == (1, 1)
+    assert stats.count[0, 0] == groups_df["y"].notna().sum()
+    assert stats.median[0, 0] == pytest.approx(groups_df["y"].median())
+
+
+def test_stats_cached_per_version(groups_df):
+    """Test that the statistics are computed once per version of the data."""
+    first = box_stats("v1", groups_df, "y", "x", "color")
+
+    assert box_stats("v1", groups_df, "y", "x", "color") is first
+    assert box_stats("v2", groups_df, "y", "x", "color") is not first
+    assert not [key for key in mortality.box_stats._boxes if key[0] == "v1"]
+
+
+def test_boxplot_has_no_rows():
+    """Test that the box plot carries the statistics of each box, not the data."""
+    mortality_data = get_data()
+    fig = boxplot(mortality_data, "test", "region", "race")
+    boxes = [trace for trace in fig.data if trace.type == "box"]
+
+    assert [box.name for box in boxes] == list(mortality_data["race"].unique())
+    assert all(box.y is None for box in boxes)
+    assert sum(len(box.q1) for box in boxes) == len(
+        mortality_data.groupby(["region", "race"], observed=True)
+    )
+    assert fig.layout.boxmode == "group"
+
+    expected = px.box(mortality_data, x="region", y="mortality_rate", color="race")
+    assert [trace.name for trace in expected.data] == [box.name for box in boxes]
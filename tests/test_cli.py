@@ -0,0 +1,148 @@
+import subprocess
+import sys
+from pathlib import Path
+import pytest
+from mortality.__main__ import COMMANDS, build_parser, chosen_command, main
+
+BASE_DIR = Path(__file__).parent.parent
+# modules that take most of a second or more to import
+HEAVY_MODULES = {"pandas", "numpy", "scipy", "statsmodels", "plotly", "dash", "flask"}
+
+
+def imported_modules(*args) -> dict:
+    """
+    Runs the command line with -X importtime, and returns the cumulative
+    microseconds of every module it imported.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                modules[name.strip()] = int(cumulative)
+    return modules
+
+
+@pytest.mark.parametrize(
+    "args", [[], ["scrape", "--help"], ["build", "--help"], ["synthetic", "--help"]]
+)
+def test_light_commands_skip_heavy_imports(args):
+    """Test that the usage and the commands not using the data stack do not import it."""
+    modules = imported_modules("-m", "mortality", *args)
+
+    assert not HEAVY_MODULES & {name.split(".")[0] for name in modules}
+
+
+def test_cli_startup_time():
+    """Test that importing the command line stays under 100ms."""
+    modules = imported_modules("-c", "import mortality.__main__")
+
+    assert modules["mortality.__main__"] < 100_000
+
+
+def test_profile_imports_reports_modules():
+    """Test that --profile-imports lists the command's imports, even with --help."""
+    result = subprocess.run(
+        [sys.executable, "-m", "mortality", "--profile-imports", "build", "--help"],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+    )
+
+    assert result.returncode == 0
+    assert "mortality.pipeline" in result.stderr
+    assert "modules imported in" in result.stderr
+
+
+def test_only_chosen_command_gets_arguments():
+    """Test that the parser only has the arguments of the chosen subcommand."""
+    assert chosen_command(["--profile-imports", "build", "kff_merge"]) == "build"
+    assert chosen_command(["nope"]) is None
+
+    args = build_parser("build").parse_args(["build", "kff_merge", "--force"])
+    assert args.stages == ["kff_merge"] and args.force
+    with pytest.raises(SystemExit):
+        build_parser("synthetic").parse_args(["build", "--force"])
+
+
+@pytest.mark.parametrize("name", COMMANDS)
+def test_every_command_parses(name):
+    """Test that every registered command builds its arguments."""
+    required = {"predict-batch": ["in.csv", "out.csv"], "synthetic": ["out"]}
+    args = build_parser(name).parse_args([name] + required.get(name, []))
+
+    assert args.command == name
+
+
+def test_usage_without_command(capsys):
+    """Test that running without a command prints the usage and fails."""
+    with pytest.raises(SystemExit) as exit_info:
+        main([])
+
+    assert exit_info.value.code == 1
+    assert "uv run python -m mortality map" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("sequential", [True, False])
+def test_scrape_options_reach_every_request(monkeypatch, sequential):
+    """Test that the retry, timeout and rate limit options are used by the
+    sequential and concurrent KFF scrapers and by the abortion policy scraper."""
+    import mortality.scrapers.abortion_web_scraping as abortion
+    import mortality.scrapers.kff_web_scraping as kff
+
+    calls = {}
+
+    def kff_scrapers(cache, client):
+        calls["kff"] = client
+        return {}
+
+    def kff_scrapers_async(concurrency, timeout, cache, policy, stream, limiter):
+        calls["kff_async"] = (timeout, policy, limiter)
+        return {}
+
+    def abortion_scraper(cache, client):
+        calls["abortion"] = client
+        return {"status": "fetched", "changed": False}
+
+    monkeypatch.setattr(kff, "run_kff_scrapers", kff_scrapers)
+    monkeypatch.setattr(kff, "run_kff_scrapers_async", kff_scrapers_async)
+    monkeypatch.setattr(abortion, "run_abortion_policy_scraper", abortion_scraper)
+    args = ["scrape", "--no-cache", "--attempts", "5", "--timeout", "3"]
+    main(args + (["--sequential"] if sequential else []))
+
+    client = calls["abortion"]
+    assert client.policy.max_attempts == 5
+    assert client.limiter is not None
+    assert client.client.timeout.read == 3
+    if sequential:
+        assert calls["kff"] is client
+    else:
+        assert calls["kff_async"] == (3, client.policy, client.limiter)
+
+
+def test_build_rejects_unknown_stages(capsys):
+    """Test that unknown stage names are reported as a usage error."""
+    with pytest.raises(SystemExit) as exit_info:
+        main(["build", "no_such_stage"])
+
+    assert exit_info.value.code == 2
+    assert "Unknown stages: no_such_stage" in capsys.readouterr().err
+
+
+def test_build_stage_errors_keep_traceback(monkeypatch):
+    """Test that a ValueError raised while building is not reported as a
+    usage error."""
+    import mortality.pipeline
+
+    def failing_build(*args, **kwargs):
+        raise ValueError("could not parse a scraped file")
+
+    monkeypatch.setattr(mortality.pipeline, "build", failing_build)
+    with pytest.raises(ValueError, match="could not parse"):
+        main(["build"])
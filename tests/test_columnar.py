@@ -0,0 +1,66 @@
+import os
+import pandas as pd
+import pytest
+from mortality.columnar import columnar_path, read_table, write_columnar
+from mortality.predict_model import DATA_FILE, INDEPENDENT_VAR, get_data
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    """A small csv, with its Parquet copy."""
+    frame = pd.DataFrame(
+        {"state": ["Illinois", "Ohio"], "region": ["Midwest", "Midwest"], "mortality": [1.5, 2.0]}
+    )
+    file = tmp_path / "data.csv"
+    frame.to_csv(file, index=False)
+    write_columnar(frame, file)
+    return file
+
+
+def test_columnar_types(csv_file):
+    """Test that the Parquet copy keeps the types, with categorical states."""
+    frame = read_table(csv_file)
+
+    assert isinstance(frame["state"].dtype, pd.CategoricalDtype)
+    assert isinstance(frame["region"].dtype, pd.CategoricalDtype)
+    assert frame["mortality"].dtype == "float64"
+    assert frame["state"].tolist() == ["Illinois", "Ohio"]
+
+
+def test_newer_csv_preferred(csv_file):
+    """Test that a csv edited after its Parquet copy is read instead."""
+    pd.DataFrame({"state": ["Iowa"], "region": ["Midwest"], "mortality": [3.0]}).to_csv(
+        csv_file, index=False
+    )
+    later = columnar_path(csv_file).stat().st_mtime_ns + 10**9
+    os.utime(csv_file, ns=(later, later))
+
+    frame = read_table(csv_file)
+    assert frame["state"].tolist() == ["Iowa"]
+    assert frame["state"].dtype == object
+
+
+def test_missing_columnar_falls_back(csv_file):
+    """Test that the csv is read when there is no Parquet copy."""
+    columnar_path(csv_file).unlink()
+    assert read_table(csv_file)["state"].tolist() == ["Illinois", "Ohio"]
+
+
+def test_get_data_drops_unused_categories():
+    """Test that the filtered-out race is not left as an empty category."""
+    mortality_data = get_data()
+
+    if isinstance(mortality_data["race"].dtype, pd.CategoricalDtype):
+        assert "American Indian or Alaska Native" not in mortality_data["race"].cat.categories
+    for variable in INDEPENDENT_VAR:
+        assert mortality_data[variable].value_counts().min() > 0
+
+
+def test_columnar_matches_csv():
+    """Test that the saved Parquet copy holds the same data as the csv."""
+    from_csv = pd.read_csv(DATA_FILE)
+    from_parquet = pd.read_parquet(columnar_path(DATA_FILE)).astype(
+        {variable: str for variable in INDEPENDENT_VAR}
+    )
+
+    pd.testing.assert_frame_equal(from_parquet, from_csv, check_dtype=False)
@@ -0,0 +1,91 @@
+import json
+import plotly.graph_objects as go
+import pytest
+from mortality import figure_cache
+from mortality.map_viz import map_figure, map_mortalities, warm_figures
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    """Empty the figure cache, without a figure store, around every test."""
+    figure_cache.set_figure_store(None)
+    figure_cache.clear_figures()
+    yield
+    figure_cache.set_figure_store(None)
+    figure_cache.clear_figures()
+
+
+def counting_builder():
+    calls = []
+
+    def build():
+        calls.append(1)
+        return go.Figure(go.Bar(x=["a", "b"], y=[1, 2]))
+
+    return build, calls
+
+
+def test_figure_built_once():
+    """Test that a figure is built once and then served from memory."""
+    build, calls = counting_builder()
+    first = figure_cache.get_figure("bar", ("a",), "v1", build)
+    second = figure_cache.get_figure("bar", ("a",), "v1", build)
+
+    assert len(calls) == 1
+    assert first is second
+    assert first["data"][0]["y"] == [1, 2]
+
+
+def test_new_version_rebuilds():
+    """Test that new data or other parameters give a new figure."""
+    build, calls = counting_builder()
+    figure_cache.get_figure("bar", ("a",), "v1", build)
+    figure_cache.get_figure("bar", ("a",), "v2", build)
+    figure_cache.get_figure("bar", ("b",), "v2", build)
+
+    assert len(calls) == 3
+
+
+def test_figure_store_shared(tmp_path):
+    """Test that a process with an empty memory cache reads the stored figure."""
+    figure_cache.set_figure_store(tmp_path)
+    build, calls = counting_builder()
+    stored = figure_cache.get_figure("bar", ("a",), "v1", build)
+
+    figure_cache.clear_figures()  # as in a newly started worker
+    loaded = figure_cache.get_figure("bar", ("a",), "v1", build)
+
+    assert len(calls) == 1
+    assert loaded == stored
+    assert figure_cache.figure_stats()["disk_hits"] == 1
+
+
+def test_new_version_replaces_old(tmp_path):
+    """Test that a figure built for new data drops the older versions of the
+    same figure, in memory and in the figure store, and keeps the others."""
+    figure_cache.set_figure_store(tmp_path)
+    build, calls = counting_builder()
+    figure_cache.get_figure("bar", ("a",), "v1", build)
+    figure_cache.get_figure("bar", ("b",), "v1", build)
+    figure_cache.get_figure("bar", ("a",), "v2", build)
+
+    assert figure_cache.figure_stats()["figures"] == 2
+    assert len(list(tmp_path.glob("*.json"))) == 2
+
+    figure_cache.clear_figures()  # as in a newly started worker
+    figure_cache.get_figure("bar", ("a",), "v2", build)
+    figure_cache.get_figure("bar", ("b",), "v1", build)
+    assert figure_cache.figure_stats()["disk_hits"] == 2
+
+
+def test_map_figure_matches_plotly():
+    """Test that the cached map is the figure plotly builds."""
+    assert map_figure("Maternal Mortality Rates") == json.loads(
+        map_mortalities().to_json()
+    )
+
+
+def test_warm_figures():
+    """Test that warming builds every map and scatter plot."""
+    warm_figures()
+    assert figure_cache.figure_stats()["figures"] == 6
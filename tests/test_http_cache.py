@@ -0,0 +1,131 @@
+import asyncio
+import httpx
+import pytest
+from mortality.scrapers.http_cache import (
+    FETCHED,
+    FRESH,
+    NOT_MODIFIED,
+    OFFLINE,
+    ResponseCache,
+)
+import mortality.scrapers.kff_web_scraping
+from mortality.scrapers.kff_web_scraping import scrape_sources
+
+URL = "https://example.org/sheet"
+
+
+class FakeServer:
+    """Answers with an ETag and honours If-None-Match, recording requests."""
+
+    def __init__(self, body='{"data": [["header"], ["Ohio", "1", "2"]]}'):
+        self.body = body
+        self.requests = []
+
+    def __call__(self, request):
+        self.requests.append(request)
+        etag = f'"{hash(self.body)}"'
+        if request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        return httpx.Response(200, text=self.body, headers={"ETag": etag})
+
+
+@pytest.fixture
+def server():
+    return FakeServer()
+
+
+def test_fresh_response_is_not_requested(tmp_path, server):
+    client = httpx.Client(transport=httpx.MockTransport(server))
+    cache = ResponseCache(tmp_path)
+
+    assert cache.get(client, URL).status == FETCHED
+    response = cache.get(client, URL)
+
+    assert response.status == FRESH
+    assert response.text == server.body
+    assert len(server.requests) == 1
+
+
+def test_conditional_revalidation(tmp_path, server):
+    client = httpx.Client(transport=httpx.MockTransport(server))
+    cache = ResponseCache(tmp_path, ttl=0)
+
+    cache.get(client, URL).mark_written()
+    response = cache.get(client, URL)
+    assert response.status == NOT_MODIFIED
+    assert not response.changed
+    assert "If-None-Match" in server.requests[1].headers
+
+    server.body = '{"data": []}'
+    response = cache.get(client, URL)
+    assert response.status == FETCHED
+    assert response.text == server.body
+
+
+def test_offline_mode(tmp_path, server):
+    client = httpx.Client(transport=httpx.MockTransport(server))
+    ResponseCache(tmp_path).get(client, URL)
+    offline = ResponseCache(tmp_path, offline=True)
+
+    assert offline.get(client, URL).status == OFFLINE
+    assert len(server.requests) == 1
+    with pytest.raises(LookupError):
+        offline.get(client, URL + "?other")
+
+
+def test_least_recently_used_is_evicted(tmp_path, server):
+    client = httpx.Client(transport=httpx.MockTransport(server))
+    cache = ResponseCache(tmp_path, max_bytes=len(server.body) * 2)
+
+    for url in [URL + "?1", URL + "?2", URL + "?3"]:
+        cache.get(client, url)
+
+    assert len(list(tmp_path.glob("*.body"))) == 2
+    assert cache.get(client, URL + "?3").status == FRESH
+    assert cache.get(client, URL + "?1").status == FETCHED
+
+
+def test_unchanged_source_is_not_rewritten(tmp_path, server):
+    sources = {"ohio": (URL, ["state", "a", "b"], 1, "ohio.csv")}
+    cache = ResponseCache(tmp_path / "cache", ttl=0)
+    transport = httpx.MockTransport(server)
+
+    asyncio.run(scrape_sources(sources, transport=transport, base_dir=tmp_path, cache=cache))
+    (tmp_path / "ohio.csv").write_text("edited")
+    timings = asyncio.run(
+        scrape_sources(sources, transport=transport, base_dir=tmp_path, cache=cache)
+    )
+
+    assert timings["ohio"]["status"] == NOT_MODIFIED
+    assert (tmp_path / "ohio.csv").read_text() == "edited"
+
+
+def test_body_parsed_again_until_written(tmp_path, server, monkeypatch):
+    """Test that a cached body whose csv could not be written is parsed again
+    on the next scrape, even though the server answers 304."""
+    sources = {"ohio": (URL, ["state", "a", "b"], 1, "ohio.csv")}
+    cache = ResponseCache(tmp_path / "cache", ttl=0)
+    transport = httpx.MockTransport(server)
+
+    def scrape():
+        return asyncio.run(
+            scrape_sources(sources, transport=transport, base_dir=tmp_path, cache=cache)
+        )
+
+    scrape()
+    server.body = '{"data": [["header"], ["Ohio", "3", "4"]]}'
+    save_source = mortality.scrapers.kff_web_scraping.save_source
+
+    def failing_save(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(mortality.scrapers.kff_web_scraping, "save_source", failing_save)
+    assert scrape()["ohio"]["status"] == "failed"
+    assert "Ohio,1,2" in (tmp_path / "ohio.csv").read_text()
+
+    monkeypatch.setattr(mortality.scrapers.kff_web_scraping, "save_source", save_source)
+    result = scrape()["ohio"]
+    assert result["status"] == NOT_MODIFIED and result["changed"]
+    assert "Ohio,3,4" in (tmp_path / "ohio.csv").read_text()
+
+    assert not scrape()["ohio"]["changed"]
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import threading
+import httpx
+import pytest
+from mortality.scrapers import http_cache
+from mortality.scrapers.http_cache import ResponseCache
+from mortality.scrapers.json_stream import ArrayItemParser, StateRowParser
+from mortality.scrapers.kff_web_scraping import (
+    extract_state_info,
+    scrape_sources,
+    stream_to_csv,
+    write_to_csv,
+)
+
+PAYLOAD = {
+    "title": 'Sheet with "quotes", [brackets] and {braces}',
+    "meta": {"rows": [1, 2, 3], "nested": {"data": ["not", "this"]}},
+    "data": [
+        ["Title row", "", ""],
+        ["state", "a", "b"],
+        ["Alabama", "5%", "$1,011"],
+        ["Alaska", 12.5, None],
+        ["Ohio", "été \\"], 
+    ],
+    "after": [10, 20],
+}
+VARIABLES = ["state", "a"]
+
+
+def chunked(text, size):
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 64, 10_000])
+def test_items_match_json_loads(size):
+    parser = ArrayItemParser("data")
+    items = []
+    for chunk in chunked(json.dumps(PAYLOAD), size):
+        items.extend(parser.feed(chunk))
+    items.extend(parser.close())
+
+    assert items == PAYLOAD["data"]
+
+
+def test_state_rows_match_extract_state_info():
+    parser = StateRowParser(VARIABLES, 2)
+    rows = []
+    for chunk in chunked(json.dumps(PAYLOAD), 5):
+        rows.extend(parser.feed(chunk))
+    rows.extend(parser.close())
+
+    assert rows == extract_state_info(PAYLOAD["data"][2:], VARIABLES)
+
+
+@pytest.mark.parametrize("size", [1, 3, 64])
+def test_skipped_values_with_escapes(size):
+    payload = {
+        "text": 'ends in a backslash \\',
+        "quoted": ['\\"', "}", "]", {"key": '"{[\\'}],
+        "number": -1.5e3,
+        "flag": None,
+        "data": [["Ohio", 1]],
+    }
+    parser = ArrayItemParser("data")
+    items = []
+    for chunk in chunked(json.dumps(payload), size):
+        items.extend(parser.feed(chunk))
+    items.extend(parser.close())
+
+    assert items == payload["data"]
+
+
+def test_numbers_split_across_chunks():
+    parser = ArrayItemParser("data")
+    items = []
+    for chunk in chunked('{"data": [12.5, -3e2, 7]}', 1):
+        items.extend(parser.feed(chunk))
+    items.extend(parser.close())
+
+    assert items == [12.5, -300.0, 7]
+
+
+def test_skipped_value_not_kept_in_memory():
+    """Test that a large skipped value is scanned as it arrives, instead of
+    being kept until it can be decoded as a whole."""
+    text = json.dumps({"meta": [{"row": [i, "x"]} for i in range(10_000)], "data": [[1]]})
+    parser = ArrayItemParser("data")
+    items = []
+    for chunk in chunked(text, 100):
+        items.extend(parser.feed(chunk))
+        assert len(parser.buffer) <= 200
+    items.extend(parser.close())
+
+    assert items == [[1]]
+
+
+def test_missing_or_truncated_list():
+    with pytest.raises(ValueError):
+        parser = ArrayItemParser("data")
+        parser.feed('{"other": [1, 2]}')
+        parser.close()
+
+    with pytest.raises(ValueError):
+        parser = ArrayItemParser("data")
+        parser.feed('{"data": [[1, 2], [3')
+        parser.close()
+
+    with pytest.raises(ValueError):
+        parser = ArrayItemParser("data")
+        parser.feed('{"other": [[1, 2], "]')
+        parser.close()
+
+
+def test_stream_to_csv_matches_write_to_csv(tmp_path):
+    rows = extract_state_info(PAYLOAD["data"][2:], VARIABLES)
+    write_to_csv(rows, VARIABLES, "whole.csv", tmp_path)
+    stream_to_csv(chunked(json.dumps(PAYLOAD), 3), VARIABLES, 2, "streamed.csv", tmp_path)
+
+    assert (tmp_path / "streamed.csv").read_bytes() == (tmp_path / "whole.csv").read_bytes()
+    assert not stream_to_csv([json.dumps(PAYLOAD)], VARIABLES, 2, "streamed.csv", tmp_path)
+    assert not (tmp_path / "streamed.csv.tmp").exists()
+
+
+@pytest.mark.parametrize("use_cache", [False, True])
+def test_streaming_scrape_matches_whole_scrape(tmp_path, use_cache):
+    sources = {"sheet": ("https://example.org/sheet", VARIABLES, 2, "sheet.csv")}
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, json=PAYLOAD))
+    cache = ResponseCache(tmp_path / "cache") if use_cache else None
+
+    asyncio.run(scrape_sources(sources, transport=transport, base_dir=tmp_path / "whole"))
+    results = asyncio.run(
+        scrape_sources(
+            sources,
+            transport=transport,
+            base_dir=tmp_path / "streamed",
+            cache=cache,
+            stream=True,
+        )
+    )
+
+    assert results["sheet"]["changed"]
+    assert (tmp_path / "streamed/sheet.csv").read_bytes() == (
+        tmp_path / "whole/sheet.csv"
+    ).read_bytes()
+
+
+def test_cached_stream_writes_off_the_event_loop(tmp_path, monkeypatch):
+    """Test that the streamed body is written to the cache from a worker
+    thread, not from the thread running the event loop."""
+    sources = {"sheet": ("https://example.org/sheet", VARIABLES, 2, "sheet.csv")}
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, json=PAYLOAD))
+    threads = []
+
+    def recording_open(*args, **kwargs):
+        threads.append(threading.get_ident())
+        return open(*args, **kwargs)
+
+    monkeypatch.setattr(http_cache, "open", recording_open, raising=False)
+    results = asyncio.run(
+        scrape_sources(
+            sources,
+            transport=transport,
+            base_dir=tmp_path,
+            cache=ResponseCache(tmp_path / "cache"),
+            stream=True,
+        )
+    )
+
+    assert results["sheet"]["changed"]
+    assert threads and threading.get_ident() not in threads
@@ -2,6 +2,7 @@ import pytest
 import pandas as pd
 from pathlib import Path
 from mortality.utils import STATE_ABBREVIATIONS
+from mortality.scrapers.kff_data_sources import DATA_SOURCES
 import mortality.kff_merger
 
 
@@ -36,3 +37,86 @@ def test_data_merging(merged_kff_df):
     assert "ratio_earnings" in merged_kff_df.columns
     assert "cesarean" in merged_kff_df.columns
     assert "abbrev" in merged_kff_df.columns
+
+
+def test_import_has_no_side_effects():
+    """Test that importing the module does not read or merge anything."""
+    assert not hasattr(mortality.kff_merger, "merged_df")
+
+
+def test_merge_kff_matches_saved_output(tmp_path):
+    """Test that rerunning the merge reproduces the saved merged data."""
+    output = tmp_path / "merged_kff.csv"
+    mortality.kff_merger.merge_kff(output_path=output)
+
+    saved = Path(__file__).parent.parent.joinpath("data/merged_kff.csv")
+    assert output.read_bytes() == saved.read_bytes()
+
+
+def test_schema_covers_every_source():
+    """Test that every scraped KFF file has a schema for all of its columns,
+    with merged column names unique over the files."""
+    titles = {source.title for source in mortality.kff_merger.KFF_SCHEMA.values()}
+    assert titles == set(DATA_SOURCES)
+
+    names = []
+    for source in mortality.kff_merger.KFF_SCHEMA.values():
+        header = pd.read_csv(
+            Path(__file__).parent.parent / source.file, nrows=0
+        ).columns
+        assert list(header) == [source.key] + list(source.columns)
+        names += [name for name, _ in source.columns.values()]
+    assert len(names) == len(set(names))
+
+
+@pytest.mark.parametrize(
+    "values, unit, expected",
+    [
+        (["12%", "0.3%", "N/A"], "percent", [0.12, 0.003, None]),
+        (["$912", "$1,097", None], "dollars", [912.0, 1097.0, None]),
+        (["97,463,300", "5"], "count", [97463300.0, 5.0]),
+        (["41.4", "NR", "NSD"], "number", [41.4, None, None]),
+    ],
+)
+def test_parse_values(values, unit, expected):
+    """Test that the units are parsed, and values that are not numbers
+    become missing."""
+    parsed = mortality.kff_merger.parse_values(pd.Series(values, dtype=object), unit)
+    assert pd.Series(parsed).equals(pd.Series(expected, dtype=float))
+
+
+def test_merge_sources_joins_on_state(tmp_path):
+    """Test that columns of several files are joined on the state, keeping
+    the states found in every file, in the order of the first file."""
+    (tmp_path / "mortality.csv").write_text(
+        "state,number of deaths,\"Maternal Mortality Rate per 100,000 live Births\"\n"
+        "United States,3478,23.5\nOhio,10,NR\nAlabama,96,41.4\nUtah,3,9.1\n"
+    )
+    (tmp_path / "coverage.csv").write_text(
+        "Employer,Non-Group,Medicaid,Other,Uninsured\n"
+        "Alabama,60%,9%,15%,5%\nOhio,60%,9%,15%,7%\n"
+    )
+    (tmp_path / "expansion.csv").write_text(
+        "state,Status of Medicaid Expansion Decision\nOhio,Adopted\nAlabama,Not Adopted\n"
+    )
+
+    merged = mortality.kff_merger.merge_sources(
+        ["uninsured", "mortality", "medicaid_expansion"],
+        {
+            "maternal_mortality": tmp_path / "mortality.csv",
+            "coverage": tmp_path / "coverage.csv",
+            "medicaid_expansion": tmp_path / "expansion.csv",
+        },
+    )
+
+    assert list(merged.columns) == ["state", "uninsured", "mortality", "medicaid_expansion"]
+    assert merged["state"].tolist() == ["Alabama", "Ohio"]
+    assert merged["uninsured"].tolist() == [0.05, 0.07]
+    assert merged["mortality"].iloc[0] == 41.4 and pd.isna(merged["mortality"].iloc[1])
+    assert merged["medicaid_expansion"].tolist() == ["Not Adopted", "Adopted"]
+
+
+def test_merge_sources_rejects_unknown_columns():
+    """Test that asking for a column no KFF file has raises an error."""
+    with pytest.raises(ValueError, match="no_such_column"):
+        mortality.kff_merger.merge_sources(["mortality", "no_such_column"])
@@ -0,0 +1,45 @@
+import csv
+from pathlib import Path
+from mortality.scrapers.kff_web_scraping import write_to_csv
+from mortality.scrapers.manifest import Manifest
+
+SCRAPE_DIR = Path(__file__).parent.parent.joinpath("data/scrape_data")
+
+
+def test_unchanged_content_is_not_rewritten(tmp_path):
+    manifest = Manifest(tmp_path)
+    assert manifest.write("out.csv", "a,b\r\n1,2\r\n", "source")
+    modified = (tmp_path / "out.csv").stat().st_mtime_ns
+
+    assert not manifest.write("out.csv", "a,b\r\n1,2\r\n", "source")
+    assert (tmp_path / "out.csv").stat().st_mtime_ns == modified
+    assert manifest.write("out.csv", "a,b\r\n1,3\r\n", "source")
+    assert manifest.changed == ["out.csv", "out.csv"]
+
+
+def test_manifest_is_saved(tmp_path):
+    manifest = Manifest(tmp_path)
+    manifest.write("out.csv", "a\r\n", "source")
+    manifest.save()
+
+    reloaded = Manifest(tmp_path)
+    assert reloaded.entries["out.csv"]["source"] == "source"
+    assert not reloaded.write("out.csv", "a\r\n")
+
+
+def test_existing_file_without_entry(tmp_path):
+    (tmp_path / "out.csv").write_text("a\r\n", newline="")
+    assert not Manifest(tmp_path).write("out.csv", "a\r\n")
+
+
+def test_write_to_csv_matches_scraped_file(tmp_path):
+    with open(SCRAPE_DIR / "abortion.csv", newline="") as file:
+        reader = csv.DictReader(file)
+        rows = list(reader)
+        fieldnames = reader.fieldnames
+
+    assert write_to_csv(rows, fieldnames, "abortion.csv", tmp_path)
+    assert (tmp_path / "abortion.csv").read_bytes() == (
+        SCRAPE_DIR / "abortion.csv"
+    ).read_bytes()
+    assert not write_to_csv(rows, fieldnames, "abortion.csv", tmp_path)
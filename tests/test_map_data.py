@@ -0,0 +1,97 @@
+import os
+import pandas as pd
+import pytest
+from mortality import map_data
+from mortality.map_viz import MERGED, load_data, table_frame
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    """A small csv, with the cache emptied before and after the test."""
+    map_data.clear_frames()
+    file = tmp_path / "data.csv"
+    file.write_text("state,value\nIllinois,1\nOhio,2\n")
+    yield file
+    map_data.clear_frames()
+
+
+def counting_loader():
+    calls = []
+
+    def loader(file):
+        calls.append(file)
+        return pd.read_csv(file)
+
+    return loader, calls
+
+
+def test_frame_loaded_once(csv_file):
+    """Test that repeated accesses are served from memory."""
+    loader, calls = counting_loader()
+    first = map_data.get_frame(csv_file, loader)
+    second = map_data.get_frame(csv_file, loader)
+
+    assert len(calls) == 1
+    pd.testing.assert_frame_equal(first, second)
+    assert map_data.frame_stats()["hits"] == 1
+
+
+def test_touched_file_not_reloaded(csv_file):
+    """Test that a new modification time alone does not reload the frame."""
+    loader, calls = counting_loader()
+    map_data.get_frame(csv_file, loader)
+    later = csv_file.stat().st_mtime_ns + 10**9
+    os.utime(csv_file, ns=(later, later))
+    map_data.get_frame(csv_file, loader)
+
+    assert len(calls) == 1
+
+
+def test_changed_file_reloaded(csv_file):
+    """Test that new contents are picked up and change the data version."""
+    loader, calls = counting_loader()
+    map_data.get_frame(csv_file, loader)
+    version = map_data.data_version(csv_file)
+    csv_file.write_text("state,value\nIllinois,3\nOhio,4\nIowa,5\n")
+
+    assert len(map_data.get_frame(csv_file, loader)) == 3
+    assert len(calls) == 2
+    assert map_data.data_version(csv_file) != version
+
+
+def test_copies_leave_cache_untouched(csv_file):
+    """Test that adding or replacing columns on a copy does not change the cache."""
+    loader, _ = counting_loader()
+    frame = map_data.get_frame(csv_file, loader)
+    frame["value"] = frame["value"].astype(float) * 10
+    frame["extra"] = 1
+
+    cached = map_data.get_frame(csv_file, loader)
+    assert list(cached.columns) == ["state", "value"]
+    assert cached["value"].tolist() == [1, 2]
+
+
+def test_cached_values_are_read_only(csv_file):
+    """Test that editing the values of a copy in place fails instead of
+    changing the cache."""
+    loader, _ = counting_loader()
+    frame = map_data.get_frame(csv_file, loader)
+
+    with pytest.raises(ValueError):
+        frame.loc[0, "value"] = 10
+    with pytest.raises(ValueError):
+        frame["state"].to_numpy()[0] = "Texas"
+
+    assert map_data.get_frame(csv_file, loader)["value"].tolist() == [1, 2]
+
+
+def test_table_matches_disk():
+    """Test that the cached table rows match the rows built from the file."""
+    map_data.clear_frames()
+    expected = load_data(MERGED, False)[
+        ["State", "Maternal Mortality Rate per 100,000 Live Births"]
+    ].reset_index(drop=True)
+
+    for _ in range(2):
+        rows = pd.DataFrame(table_frame("Maternal Mortality Rates").to_dict("records"))
+        pd.testing.assert_frame_equal(rows, expected.astype({"State": str}))
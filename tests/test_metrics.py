@@ -0,0 +1,141 @@
+import json
+import os
+import time
+import pytest
+from mortality import metrics
+from mortality.server import create_server
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    """Start every test without recorded latencies."""
+    metrics.clear_metrics()
+    yield
+    metrics.clear_metrics()
+    metrics._cache_baseline.clear()
+
+
+def test_timed_records_latency():
+    """Test that each call lands in a bucket and in the sum and count."""
+
+    @metrics.timed("sleepy")
+    def sleepy(seconds):
+        time.sleep(seconds)
+        return seconds
+
+    assert sleepy(0.002) == 0.002
+    sleepy(0.0)
+
+    latencies = metrics.histogram("sleepy")
+    assert latencies.count == 2
+    assert sum(latencies.counts) == 2
+    assert latencies.sum >= 0.002
+    assert sleepy.__name__ == "sleepy"
+
+
+def test_errors_counted():
+    """Test that a raising callback is timed and counted as an error."""
+
+    @metrics.timed("broken")
+    def broken():
+        raise ValueError("bad input")
+
+    with pytest.raises(ValueError):
+        broken()
+
+    assert metrics.histogram("broken").errors == 1
+    assert metrics.histogram("broken").count == 1
+
+
+def test_quantiles():
+    """Test the nearest-rank quantiles of the recent latencies."""
+    latencies = metrics.LatencyHistogram()
+    assert latencies.quantiles() == {}
+    for i in range(1, 101):
+        latencies.observe(i / 1000)
+
+    assert latencies.quantiles() == {0.5: 0.051, 0.95: 0.096, 0.99: 0.1}
+
+
+def test_prometheus_format():
+    """Test that the histogram is cumulative and ends with +Inf."""
+    latencies = metrics.histogram("formatted")
+    latencies.observe(0.003)
+    latencies.observe(20.0)
+    text = metrics.render_metrics()
+
+    assert 'mortality_callback_duration_seconds_bucket{callback="formatted",le="0.0025"} 0' in text
+    assert 'mortality_callback_duration_seconds_bucket{callback="formatted",le="0.005"} 1' in text
+    assert 'mortality_callback_duration_seconds_bucket{callback="formatted",le="+Inf"} 2' in text
+    assert 'mortality_callback_duration_seconds_count{callback="formatted"} 2' in text
+    assert 'mortality_callback_latency_seconds{callback="formatted",quantile="0.99"} 20.0' in text
+    assert 'mortality_cache_hits_total{cache="figure"}' in text
+
+
+def test_metrics_endpoint():
+    """Test that callback calls show up on the /metrics endpoint."""
+    client = create_server(["map", "prediction"]).test_client()
+    client.post(
+        "/_dash-update-component",
+        json={
+            "output": "..table.data...table.columns...table.page_count..",
+            "outputs": [
+                {"id": "table", "property": "data"},
+                {"id": "table", "property": "columns"},
+                {"id": "table", "property": "page_count"},
+            ],
+            "inputs": [
+                {"id": "map_select", "property": "value", "value": "Maternal Mortality Rates"},
+                {"id": "table", "property": "page_current", "value": 0},
+                {"id": "table", "property": "page_size", "value": 10},
+                {"id": "table", "property": "sort_by", "value": []},
+                {"id": "table", "property": "filter_query", "value": ""},
+            ],
+            "changedPropIds": ["map_select.value"],
+        },
+    )
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    assert 'mortality_callback_duration_seconds_count{callback="update_table"} 1' in response.text
+
+
+def test_metrics_summed_over_processes(tmp_path, monkeypatch):
+    """Test that with a shared directory, the metrics of every process are
+    reported together, whichever process renders them."""
+    monkeypatch.setenv(metrics.MULTIPROCESS_ENV, str(tmp_path))
+    other = {
+        "histograms": {
+            "shared": {
+                "counts": [0] * 3 + [2] + [0] * 11,
+                "sum": 0.01,
+                "count": 2,
+                "errors": 1,
+                "recent": [0.005, 0.005],
+            }
+        },
+        "caches": {"figure": [7, 1]},
+    }
+    (tmp_path / "metrics-1.json").write_text(json.dumps(other))
+    metrics.histogram("shared").observe(0.003)
+    hits, misses = metrics.cache_stats()["figure"]
+
+    text = metrics.render_metrics()
+
+    assert 'mortality_callback_duration_seconds_count{callback="shared"} 3' in text
+    assert 'mortality_callback_duration_seconds_bucket{callback="shared",le="0.005"} 3' in text
+    assert 'mortality_callback_errors_total{callback="shared"} 1' in text
+    assert f'mortality_cache_hits_total{{cache="figure"}} {hits + 7}' in text
+    assert f'mortality_cache_misses_total{{cache="figure"}} {misses + 1}' in text
+    assert (tmp_path / f"metrics-{os.getpid()}.json").exists()
+
+
+def test_forked_worker_starts_from_zero():
+    """Test that a forked worker does not report again what its parent recorded."""
+    metrics.histogram("before_fork").observe(0.001)
+    metrics.forked()
+
+    current = metrics.snapshot()
+    assert current["histograms"]["before_fork"]["count"] == 0
+    assert all(counts == [0, 0] for counts in current["caches"].values())
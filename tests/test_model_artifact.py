@@ -0,0 +1,47 @@
+import subprocess
+import sys
+import numpy as np
+from mortality.model_artifact import ARTIFACT_FILE, load_artifact
+from mortality.model_registry import file_fingerprint
+from mortality.predict_model import (
+    DATA_FILE,
+    MODEL_FORMULA,
+    fitted_model,
+    get_data,
+    write_model_artifact,
+)
+
+
+def test_artifact_round_trip(tmp_path):
+    scorer = write_model_artifact(tmp_path / "model.json")
+    loaded = load_artifact(tmp_path / "model.json", file_fingerprint(DATA_FILE))
+
+    profiles = get_data()
+    assert np.allclose(loaded.predict(profiles), fitted_model().predict(profiles))
+    assert np.allclose(loaded.predict(profiles), scorer.predict(profiles))
+
+
+def test_stale_artifact_is_ignored(tmp_path):
+    write_model_artifact(tmp_path / "model.json")
+
+    assert load_artifact(tmp_path / "model.json", fingerprint="stale") is None
+    assert load_artifact(tmp_path / "model.json", formula="y ~ x") is None
+    assert load_artifact(tmp_path / "missing.json") is None
+
+
+def test_saved_artifact_matches_data():
+    """The committed artifact should be retrained whenever the data changes."""
+    assert load_artifact(ARTIFACT_FILE, file_fingerprint(DATA_FILE), MODEL_FORMULA)
+
+
+def test_scoring_does_not_import_statsmodels():
+    code = (
+        "import sys\n"
+        "from mortality.predict_model import user_prediction\n"
+        "user_prediction('Northeast', 'White', 'unknown', '15-24')\n"
+        "print('statsmodels' in sys.modules)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,100 @@
+import shutil
+import threading
+import pytest
+from mortality import model_registry
+from mortality.predict_model import (
+    DATA_FILE,
+    fitted_model,
+    prediction_scorer,
+    user_prediction,
+)
+
+
+@pytest.fixture(autouse=True)
+def empty_registry():
+    model_registry.clear_registry()
+    yield
+    model_registry.clear_registry()
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    file = tmp_path / "data.csv"
+    file.write_text("x,y\n1,2\n")
+    return file
+
+
+def test_model_fit_once(data_file):
+    fits = []
+
+    def fit(file, formula):
+        fits.append((file, formula))
+        return object()
+
+    first = model_registry.get_model(data_file, "y ~ x", fit)
+    second = model_registry.get_model(data_file, "y ~ x", fit)
+
+    assert first is second
+    assert len(fits) == 1
+    assert model_registry.registry_stats()["hits"] == 1
+    assert model_registry.registry_stats()["misses"] == 1
+
+
+def test_refit_when_file_changes(data_file):
+    def fit(file, formula):
+        return file.read_text()
+
+    assert model_registry.get_model(data_file, "y ~ x", fit) == "x,y\n1,2\n"
+    data_file.write_text("x,y\n1,2\n3,4\n")
+    assert model_registry.get_model(data_file, "y ~ x", fit) == "x,y\n1,2\n3,4\n"
+
+    stats = model_registry.registry_stats()
+    assert stats["misses"] == 2
+    assert stats["models"] == 1
+
+
+def test_formula_is_part_of_key(data_file):
+    def fit(file, formula):
+        return formula
+
+    assert model_registry.get_model(data_file, "y ~ x", fit) == "y ~ x"
+    assert model_registry.get_model(data_file, "y ~ 1", fit) == "y ~ 1"
+    assert model_registry.registry_stats()["models"] == 2
+
+
+def test_user_prediction_reuses_model():
+    user_prediction("Northeast", "White", "unknown", "15-24")
+    first = model_registry.registry_stats()
+    user_prediction("South", "Asian", "8th grade or less", "35-44")
+    second = model_registry.registry_stats()
+
+    assert second["misses"] == first["misses"]
+    assert second["hits"] == first["hits"] + 1
+    assert fitted_model() is fitted_model()
+
+
+def test_fit_may_load_other_models(data_file):
+    def fit(file, formula):
+        return model_registry.get_model(file, formula, lambda *args: "inner", kind="inner")
+
+    assert model_registry.get_model(data_file, "y ~ x", fit) == "inner"
+    assert model_registry.registry_stats()["models"] == 2
+
+
+def test_scorer_refit_when_data_changes(tmp_path):
+    """The saved artifact does not match a modified CSV, so the scorer is
+    built from a new fit, which goes through the registry too."""
+    data_file = tmp_path / "clean.csv"
+    shutil.copy(DATA_FILE, data_file)
+    with open(data_file, "a") as file:
+        file.write("\n")
+
+    scorers = []
+    worker = threading.Thread(
+        target=lambda: scorers.append(prediction_scorer(data_file)), daemon=True
+    )
+    worker.start()
+    worker.join(timeout=30)
+
+    assert not worker.is_alive(), "prediction_scorer deadlocked"
+    assert scorers[0].levels == prediction_scorer().levels
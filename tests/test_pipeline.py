@@ -0,0 +1,145 @@
+import functools
+import os
+from pathlib import Path
+import pytest
+from mortality.pipeline import Stage, build, load_cache
+
+
+@pytest.fixture
+def stages(tmp_path):
+    """Two chained stages that copy a file and count how often they ran."""
+    runs = {"first": 0, "second": 0}
+    source = tmp_path / "source.txt"
+    middle = tmp_path / "middle.txt"
+    final = tmp_path / "final.txt"
+    source.write_text("data")
+
+    def copy(name, input_path, output_path):
+        def run():
+            runs[name] += 1
+            output_path.write_text(input_path.read_text())
+
+        return run
+
+    return (
+        [
+            Stage("first", [source], [middle], copy("first", source, middle)),
+            Stage("second", [middle], [final], copy("second", middle, final)),
+        ],
+        runs,
+        source,
+    )
+
+
+def test_build_runs_missing_outputs(stages):
+    """Test that stages without outputs are run, in order."""
+    pipeline, runs, _ = stages
+    report = build(pipeline)
+
+    assert [(name, ran) for name, ran, _ in report] == [("first", True), ("second", True)]
+    assert runs == {"first": 1, "second": 1}
+
+
+def test_build_skips_up_to_date_stages(stages):
+    """Test that a second build with unchanged inputs does nothing."""
+    pipeline, runs, _ = stages
+    build(pipeline)
+    report = build(pipeline)
+
+    assert not any(ran for _, ran, _ in report)
+    assert runs == {"first": 1, "second": 1}
+
+
+def test_build_reruns_stale_stages(stages):
+    """Test that without a build cache, touching an input reruns the stages downstream of it."""
+    pipeline, runs, source = stages
+    build(pipeline)
+    later = pipeline[1].outputs[0].stat().st_mtime_ns + 10**9
+    os.utime(source, ns=(later, later))
+    build(pipeline)
+
+    assert runs == {"first": 2, "second": 2}
+
+
+def test_cache_skips_unchanged_contents(stages, tmp_path):
+    """Test that with a build cache, only changed contents rerun stages."""
+    pipeline, runs, source = stages
+    cache_file = tmp_path / "cache.json"
+    build(pipeline, cache_file=cache_file)
+    assert set(load_cache(cache_file)) == {"first", "second"}
+
+    # touched, but unchanged
+    later = pipeline[1].outputs[0].stat().st_mtime_ns + 10**9
+    os.utime(source, ns=(later, later))
+    build(pipeline, cache_file=cache_file)
+    assert runs == {"first": 1, "second": 1}
+
+    source.write_text("new data")
+    build(pipeline, cache_file=cache_file)
+    assert runs == {"first": 2, "second": 2}
+
+    # an output edited by hand is rebuilt
+    pipeline[1].outputs[0].write_text("edited")
+    build(pipeline, cache_file=cache_file)
+    assert runs == {"first": 2, "second": 3}
+    assert pipeline[1].outputs[0].read_text() == "new data"
+
+
+def write_pid(inputs, output, fail=False):
+    """Stage writing the process it ran in and the contents of its inputs."""
+    if fail:
+        raise RuntimeError("stage failed")
+    contents = "".join(Path(path).read_text() for path in inputs)
+    Path(output).write_text(f"{os.getpid()}\n{contents}")
+
+
+def test_independent_stages_in_process_pool(tmp_path):
+    """Test that stages run in worker processes, after the stages they depend on."""
+    left, right = tmp_path / "left.txt", tmp_path / "right.txt"
+    left.write_text("L")
+    right.write_text("R")
+    outputs = [tmp_path / name for name in ["a.txt", "b.txt", "c.txt"]]
+    pipeline = [
+        Stage("a", [left], [outputs[0]], functools.partial(write_pid, [left], outputs[0])),
+        Stage("b", [right], [outputs[1]], functools.partial(write_pid, [right], outputs[1])),
+        Stage(
+            "c",
+            outputs[:2],
+            [outputs[2]],
+            functools.partial(write_pid, outputs[:2], outputs[2]),
+        ),
+    ]
+
+    report = build(pipeline, workers=2, cache_file=tmp_path / "cache.json")
+
+    assert [(name, ran) for name, ran, _ in report] == [("a", True), ("b", True), ("c", True)]
+    assert all(seconds > 0 for _, _, seconds in report)
+    pids = [int(path.read_text().split("\n")[0]) for path in outputs]
+    assert os.getpid() not in pids
+    assert {"L", "R"} <= set(outputs[2].read_text())
+
+
+def test_failed_stage_stops_downstream(tmp_path):
+    """Test that a failing stage raises, and the stages after it do not run."""
+    source, middle, final = (tmp_path / name for name in ["s.txt", "m.txt", "f.txt"])
+    source.write_text("data")
+    pipeline = [
+        Stage("first", [source], [middle], functools.partial(write_pid, [source], middle, True)),
+        Stage("second", [middle], [final], functools.partial(write_pid, [middle], final)),
+    ]
+
+    with pytest.raises(RuntimeError):
+        build(pipeline, workers=2, cache_file=tmp_path / "cache.json")
+    assert not final.exists()
+    assert load_cache(tmp_path / "cache.json") == {}
+
+
+def test_build_force_and_names(stages):
+    """Test that --force reruns up-to-date stages and names select stages."""
+    pipeline, runs, _ = stages
+    build(pipeline)
+    build(pipeline, names=["second"], force=True)
+
+    assert runs == {"first": 1, "second": 2}
+    with pytest.raises(ValueError):
+        build(pipeline, names=["missing"])
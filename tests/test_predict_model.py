@@ -2,8 +2,11 @@ import pytest
 from mortality.predict_model import (
     get_data,
     user_prediction,
-    user_input_dash
+    user_input_dash,
+    prediction_lattice,
+    write_prediction_lattice,
 )
+from mortality.lattice import load_lattice, save_lattice
 
 @pytest.fixture
 def mortality_df():
@@ -21,3 +24,49 @@ def test_user_prediction_wihtin_bound(mortality_df):
 
     assert user_prediction('South', 'Asian', '8th grade or less', '35-44') <= 1
     assert user_prediction('South', 'Asian', '8th grade or less', '35-44') >= 0
+
+
+def test_user_prediction_defaults():
+    assert user_prediction() == user_prediction('Northeast', 'White', 'unknown', '15-24')
+
+
+def test_user_prediction_rejects_unknown_levels():
+    with pytest.raises(ValueError, match="region: 'northeast'"):
+        user_prediction('northeast', 'White', 'unknown', '15-24')
+
+
+def test_lattice_matches_user_prediction(tmp_path):
+    lattice = write_prediction_lattice(tmp_path / "lattice.npy")
+    loaded = load_lattice(tmp_path / "lattice.npy")
+
+    assert loaded.values.shape == (4, 4, 8, 4)
+    for combination in [
+        ("Northeast", "White", "unknown", "15-24"),
+        ("South", "Asian", "8th grade or less", "35-44"),
+        ("West", "More than one race", "Bachelor's degree (BA, AB, BS)", "25-34"),
+    ]:
+        assert loaded.lookup(*combination) == user_prediction(*combination)
+        assert lattice.lookup(*combination) == loaded.lookup(*combination)
+
+
+def test_stale_lattice_is_rebuilt(tmp_path):
+    lattice = write_prediction_lattice(tmp_path / "lattice.npy")
+    lattice.fingerprint = "stale"
+    save_lattice(lattice, tmp_path / "lattice.npy")
+
+    rebuilt = prediction_lattice(lattice_file=tmp_path / "lattice.npy")
+    assert rebuilt.fingerprint != "stale"
+
+
+def test_saving_lattice_keeps_mapped_file(tmp_path):
+    lattice = write_prediction_lattice(tmp_path / "lattice.npy")
+    mapped = load_lattice(tmp_path / "lattice.npy")
+    mapped_file = (tmp_path / "lattice.npy").stat().st_ino
+
+    lattice.values = lattice.values * 0
+    save_lattice(lattice, tmp_path / "lattice.npy")
+
+    assert (tmp_path / "lattice.npy").stat().st_ino != mapped_file
+    assert mapped.values.max() > 0
+    assert load_lattice(tmp_path / "lattice.npy").values.max() == 0
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["lattice.json", "lattice.npy"]
@@ -3,6 +3,8 @@ from pathlib import Path
 import pandas as pd
 import pytest
 import mortality.regional_clean
+from mortality.columnar import read_table, typed_frame
+from mortality.synthetic import write_regional
 
 
 @pytest.fixture
@@ -30,3 +32,76 @@ def test_correct_row_count(regional_clean_df):
     assert len(regional_clean_df) == 120, (
         f"Expected 120 rows, but got {len(regional_clean_df)}"
     )
+
+
+def test_clean_regional_matches_saved_output(tmp_path):
+    """Test that rerunning the cleaning reproduces the saved clean data."""
+    output = tmp_path / "clean_reg_age_educ.csv"
+    mortality.regional_clean.clean_regional(output_path=output)
+
+    saved = Path(__file__).parent.parent.joinpath("data/clean_reg_age_educ.csv")
+    assert output.read_bytes() == saved.read_bytes()
+
+
+def test_clean_regional_in_chunks_matches_saved_output(tmp_path):
+    """Test that cleaning in small chunks, in parallel, gives the same output."""
+    output = tmp_path / "clean_reg_age_educ.csv"
+    mortality.regional_clean.clean_regional(output_path=output, chunk_bytes=2_000, workers=2)
+
+    saved = Path(__file__).parent.parent.joinpath("data/clean_reg_age_educ.csv")
+    assert output.read_bytes() == saved.read_bytes()
+
+
+def test_chunk_ranges_cover_the_data_lines():
+    """Test that the chunks end at line ends and cover every line after the header."""
+    file = mortality.regional_clean.region_path_open
+    content = file.read_bytes()
+    ranges = mortality.regional_clean.chunk_ranges(file, 1_000)
+
+    assert len(ranges) > 1
+    assert ranges[0][0] == content.index(b"\n") + 1
+    assert ranges[-1][1] == len(content)
+    assert all(end == next_start for (_, end), (next_start, _) in zip(ranges, ranges[1:]))
+    assert all(content[end - 1 : end] == b"\n" for _, end in ranges[:-1])
+
+
+def test_notes_rows_are_dropped(tmp_path):
+    """Test that the WONDER notes after the data and "Total" rows are not cleaned as data."""
+    export = write_regional(tmp_path / "plain", 300, seed=4)
+    with_notes = write_regional(tmp_path / "notes", 300, seed=4, footer=True)
+    with open(with_notes, "a", newline="", encoding="utf-8") as file:
+        csv.writer(file).writerow(["Total"] + [""] * 8 + ["3000", "", "", "100.0%"])
+
+    plain_output = tmp_path / "plain.csv"
+    notes_output = tmp_path / "notes.csv"
+    mortality.regional_clean.clean_regional(export, plain_output)
+    mortality.regional_clean.clean_regional(with_notes, notes_output, chunk_bytes=500)
+
+    assert notes_output.read_bytes() == plain_output.read_bytes()
+    assert len(pd.read_csv(notes_output)) == 300
+
+
+def test_parquet_written_in_chunks(tmp_path):
+    """Test that the Parquet copy written chunk by chunk holds the cleaned csv."""
+    export = write_regional(tmp_path, 3_000, seed=2)
+    output = tmp_path / "clean.csv"
+    mortality.regional_clean.clean_regional(export, output, chunk_bytes=20_000)
+
+    expected = typed_frame(pd.read_csv(output))
+    pd.testing.assert_frame_equal(read_table(output), expected)
+
+
+def test_missing_cells_stay_missing():
+    """Test that the cells of a short row are not read as another row's values."""
+    chunk = pd.DataFrame(
+        {
+            "Census Region": ["Census Region 1: Northeast", None],
+            "Education": ["Not Available", "Not Available"],
+        }
+    )
+    region = mortality.regional_clean._by_value(
+        chunk["Census Region"], mortality.regional_clean._clean_region
+    )
+
+    assert region[0] == "Northeast"
+    assert pd.isna(region[1])
@@ -0,0 +1,122 @@
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+from mortality.predict_model import DATA_FILE, EXCLUDED_ROWS, get_data
+from mortality.regional_store import (
+    CATEGORICAL_COLUMNS,
+    build_store,
+    load_store,
+    store_paths,
+    write_store,
+)
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    """A copy of the cleaned regional csv, with its store."""
+    file = tmp_path / "clean_reg_age_educ.csv"
+    shutil.copy(DATA_FILE, file)
+    write_store(file)
+    return file
+
+
+def test_store_round_trip(csv_file):
+    """Test that the store holds the same data as the csv."""
+    frame = load_store(csv_file).to_frame()
+    expected = pd.read_csv(csv_file)
+
+    pd.testing.assert_frame_equal(
+        frame.astype({column: str for column in CATEGORICAL_COLUMNS}), expected
+    )
+
+
+def test_columns_are_memory_mapped_views(csv_file):
+    """Test that the loaded columns are read-only views of the mapped files."""
+    store = load_store(csv_file)
+    race = store.column("race")
+    rate = store.column("mortality_rate")
+
+    assert isinstance(store.codes, np.memmap)
+    assert np.shares_memory(race, store.codes)
+    assert np.shares_memory(rate, store.values)
+    assert not rate.flags.writeable
+    assert [store.levels["race"][code] for code in race[:2]] == ["White", "White"]
+
+
+def test_get_data_shares_mapped_store(csv_file):
+    """Test that the data read from a store without the excluded rows is a
+    view of the mapped arrays, and the same as the data read from the csv."""
+    from_csv = get_data(csv_file)
+    store = write_store(csv_file, EXCLUDED_ROWS)
+    data = get_data(csv_file)
+
+    assert len(store) == len(from_csv)
+    for column in [data["mortality_rate"], data["deaths"], data["race"].cat.codes]:
+        array = column.to_numpy()
+        while array is not None and not isinstance(array, np.memmap):
+            array = array.base
+        assert array is not None
+    pd.testing.assert_frame_equal(
+        data.astype({column: str for column in CATEGORICAL_COLUMNS}),
+        from_csv.reset_index(drop=True),
+    )
+
+
+def test_missing_store(tmp_path):
+    """Test that there is no store for a csv that was never stored."""
+    assert load_store(tmp_path / "missing.csv") is None
+
+
+def test_get_data_ignores_outdated_store(csv_file):
+    """Test that a store built from an older csv is not used."""
+    edited = pd.read_csv(csv_file)
+    edited.loc[0, "deaths"] = 9999
+    edited.to_csv(csv_file, index=False)
+
+    assert get_data(csv_file)["deaths"].iloc[0] == 9999
+    write_store(csv_file)
+    assert get_data(csv_file)["deaths"].iloc[0] == 9999
+
+
+def test_store_paths():
+    """Test that the store files sit next to the csv."""
+    codes, counts, values, meta = store_paths(DATA_FILE)
+    assert codes.parent == counts.parent == values.parent == meta.parent == DATA_FILE.parent
+
+
+def test_rebuild_keeps_mapped_store(csv_file):
+    """Test that rewriting the store replaces its files instead of writing
+    into the files a running process has mapped."""
+    store = load_store(csv_file)
+    race = np.array(store.column("race"))
+    codes_path = store_paths(csv_file)[0]
+    mapped_file = codes_path.stat().st_ino
+
+    with open(csv_file, "a") as file:
+        file.write(pd.read_csv(csv_file).tail(1).to_csv(header=False, index=False))
+    write_store(csv_file)
+
+    assert codes_path.stat().st_ino != mapped_file
+    np.testing.assert_array_equal(store.column("race"), race)
+    assert len(load_store(csv_file)) == len(store) + 1
+    assert not codes_path.with_name(codes_path.name + ".tmp").exists()
+
+
+def test_codes_fit_many_levels():
+    """Test that columns with more levels than int8 holds get wider codes."""
+    frame = pd.DataFrame(
+        {
+            "region": [f"region {i}" for i in range(300)],
+            "race": "White",
+            "education": "unknown",
+            "ten_year_age_groups": "15-24",
+            "deaths": 10,
+            "mortality_rate": 1.0,
+            "mortality_binary": 0,
+        }
+    )
+    store = build_store(frame)
+
+    assert store.codes.dtype == np.int16
+    assert store.to_frame()["region"].tolist() == frame["region"].tolist()
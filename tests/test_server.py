@@ -0,0 +1,82 @@
+import json
+import signal
+import socket
+import subprocess
+import sys
+import time
+import httpx
+import pytest
+from mortality.server import create_server
+
+
+@pytest.fixture(scope="module")
+def client():
+    """Test client of a server with both dashboards mounted."""
+    return create_server(["map", "prediction"]).test_client()
+
+
+def callback_request(output_id, prop, input_id, value):
+    return {
+        "output": f"{output_id}.{prop}",
+        "outputs": {"id": output_id, "property": prop},
+        "inputs": [{"id": input_id, "property": "value", "value": value}],
+        "changedPropIds": [f"{input_id}.value"],
+    }
+
+
+def test_both_dashboards_mounted(client):
+    """Test that the map is served at / and the prediction under /prediction/."""
+    assert client.get("/").status_code == 200
+    assert client.get("/prediction/").status_code == 200
+    assert client.get("/prediction/assets/banner_multiple.png").status_code == 200
+
+    map_layout = json.dumps(client.get("/_dash-layout").get_json())
+    prediction_layout = json.dumps(client.get("/prediction/_dash-layout").get_json())
+    assert "map_select" in map_layout
+    assert "indepdent-var1" in prediction_layout
+
+
+def test_callbacks_registered_per_app(client):
+    """Test that each app answers its own callbacks."""
+    response = client.post(
+        "/_dash-update-component",
+        json=callback_request("map", "figure", "map_select", "Maternal Mortality Rates"),
+    )
+    assert response.status_code == 200
+    assert response.get_json()["response"]["map"]["figure"]["data"]
+
+    dependencies = client.get("/prediction/_dash-dependencies").get_json()
+    outputs = {dependency["output"] for dependency in dependencies}
+    assert "boxplot.figure" in outputs
+    assert "map.figure" not in outputs
+
+
+def test_serve_with_workers():
+    """Test that the production server answers with several worker processes."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+
+    process = subprocess.Popen(
+        [sys.executable, "-m", "mortality", "map", "--serve", "--workers", "2", "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    response = None
+    try:
+        for _ in range(100):
+            try:
+                response = httpx.get(f"http://127.0.0.1:{port}/_dash-layout")
+                break
+            except httpx.TransportError:
+                time.sleep(0.2)
+        assert response is not None and response.status_code == 200
+        # every worker reports the metrics of all of them
+        counts = [
+            httpx.get(f"http://127.0.0.1:{port}/metrics").text.count("mortality_cache_hits_total{")
+            for _ in range(4)
+        ]
+        assert counts == [3] * 4
+    finally:
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=10) == 0
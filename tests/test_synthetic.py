@@ -0,0 +1,96 @@
+import csv
+from pathlib import Path
+import pandas as pd
+import pytest
+from mortality.pipeline import build, make_stages
+from mortality.scrapers.kff_data_sources import DATA_SOURCES
+from mortality.synthetic import (
+    BASE_DIR,
+    RACES,
+    REGIONAL_FILE,
+    generate,
+    kff_sheet,
+    regional_rows,
+    scaled_value,
+    synthetic_rows,
+)
+
+
+@pytest.fixture(scope="module")
+def synthetic_root(tmp_path_factory):
+    """Synthetic data at twice the size of the real data."""
+    root = tmp_path_factory.mktemp("synthetic")
+    generate(root, scale=2)
+    return root
+
+
+def read_rows(path):
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        return list(csv.reader(file))
+
+
+def test_scraped_files_schema_identical(synthetic_root):
+    """Test that every scraped csv has the real header and 100 geographies."""
+    for _, _, _, output_file in DATA_SOURCES.values():
+        real = read_rows(BASE_DIR / output_file)
+        synthetic = read_rows(synthetic_root / output_file)
+
+        assert synthetic[0] == real[0]
+        assert synthetic[1] == real[1]  # the United States row
+        assert len(synthetic) == 102
+        assert {len(row) for row in synthetic} == {len(real[0])}
+
+
+def test_value_formats_kept():
+    """Test that generated numbers keep the format of the real values."""
+    import random
+
+    generator = random.Random(0)
+    assert scaled_value("$1,097", generator).startswith("$")
+    assert scaled_value("12%", generator).endswith("%")
+    assert "," in scaled_value("97,463,300", generator)
+    assert len(scaled_value("5.61", generator).split(".")[1]) == 2
+    assert scaled_value("NR", generator) == "NR"
+    assert float(scaled_value("90%", generator).rstrip("%")) <= 100
+
+
+def test_generation_is_seeded():
+    """Test that the same seed gives the same data."""
+    template = BASE_DIR / "data/scrape_data/kff_earnings.csv"
+    assert synthetic_rows(template, 500, seed=1) == synthetic_rows(template, 500, seed=1)
+    assert synthetic_rows(template, 500, seed=1) != synthetic_rows(template, 500, seed=2)
+    assert regional_rows(300, seed=1) == regional_rows(300, seed=1)
+
+
+def test_kff_sheet_parses_like_real_sheet():
+    """Test that a synthetic sheet has the headers the scraper skips."""
+    source = "(cov) Uninsured Rates of Women Ages 19-64, 2010–2023"
+    _, variables, start_index, _ = DATA_SOURCES[source]
+    data = kff_sheet(source, 3_000)["data"]
+
+    assert len(data) == start_index + 3_000
+    assert {len(row) for row in data[start_index:]} == {len(variables)}
+
+
+def test_regional_export_schema(synthetic_root):
+    """Test that the regional export has the real columns and categories."""
+    real = pd.read_csv(BASE_DIR / REGIONAL_FILE, encoding="utf-8-sig", dtype=str)
+    synthetic = pd.read_csv(synthetic_root / REGIONAL_FILE, encoding="utf-8-sig", dtype=str)
+
+    assert list(synthetic.columns) == list(real.columns)
+    assert len(synthetic) == 240
+    assert set(real["Census Region"]) == set(synthetic["Census Region"])
+    assert set(real["Single Race 6"]) <= {race for race, _ in RACES}
+    assert set(synthetic["Single Race 6"]) <= {race for race, _ in RACES}
+
+
+def test_pipeline_runs_on_synthetic_data(synthetic_root):
+    """Test that every stage builds from the synthetic data."""
+    report = build(make_stages(synthetic_root))
+
+    assert all(ran for _, ran, _ in report)
+    merged = pd.read_csv(Path(synthetic_root) / "data/merged_kff.csv")
+    cleaned = pd.read_csv(Path(synthetic_root) / "data/clean_reg_age_educ.csv")
+    assert len(merged) >= 98
+    assert len(cleaned) == 240
+    assert set(cleaned["mortality_binary"]) == {0, 1}
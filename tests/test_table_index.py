@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+from mortality.map_viz import MAP_OPTIONS, table_frame, table_page
+import mortality.table_index
+from mortality.table_index import TableIndex, parse_filter, table_index
+
+
+@pytest.fixture
+def table():
+    """A table with a text column, a numeric column and missing values."""
+    frame = pd.DataFrame(
+        {
+            "State": ["Ohio", "Iowa", "New York", "Texas", "Utah", "New Jersey", "Maine"],
+            "Rate": [20.5, np.nan, 18.0, 30.1, 12.0, np.nan, 25.0],
+        }
+    )
+    return TableIndex(frame)
+
+
+def test_pages_slice_the_table(table):
+    """Test that the pages without sort or filter are the rows in order."""
+    assert table.page(0, 3) == (table.records[:3], 3)
+    assert table.page(2, 3) == (table.records[6:], 3)
+    # past the last page, the last page is returned
+    assert table.page(10, 3) == (table.records[6:], 3)
+
+
+def test_page_size_from_client_is_clamped(table):
+    """Test that pages of no rows or before the first page do not fail."""
+    assert table.page(0, 0) == (table.records[:1], 7)
+    assert table.page(2, None) == (table.records[2:3], 7)
+    assert table.page(-1, 3) == (table.records[:3], 3)
+
+
+def test_sorted_pages(table):
+    """Test that sorting keeps the missing values last in both directions."""
+    ascending, _ = table.page(0, 7, [{"column_id": "Rate", "direction": "asc"}])
+    descending, _ = table.page(0, 7, [{"column_id": "Rate", "direction": "desc"}])
+
+    assert [row["State"] for row in ascending[:5]] == ["Utah", "New York", "Ohio", "Maine", "Texas"]
+    assert [row["State"] for row in descending[:5]] == ["Texas", "Maine", "Ohio", "New York", "Utah"]
+    assert all(np.isnan(row["Rate"]) for row in ascending[5:] + descending[5:])
+
+
+def test_filtered_pages(table):
+    """Test numeric and text filters, combined and case insensitive."""
+    rows, page_count = table.page(0, 10, [], '{State} icontains "new" && {Rate} >= 18')
+    assert [row["State"] for row in rows] == ["New York"]
+    assert page_count == 1
+
+    rows, _ = table.page(0, 10, [{"column_id": "State", "direction": "asc"}], "{Rate} lt 25")
+    assert [row["State"] for row in rows] == ["New York", "Ohio", "Utah"]
+
+    # a filter that keeps no row still has one (empty) page
+    assert table.page(0, 10, [], "{Rate} > 100") == ([], 1)
+
+
+def test_filter_parsing():
+    """Test that clauses the table does not know are ignored."""
+    assert parse_filter('{State} contains "New" && {Rate} > 20') == [
+        ("State", "contains", "New", True),
+        ("Rate", "gt", "20", True),
+    ]
+    assert parse_filter("{State} ieq 'ohio'") == [("State", "eq", "ohio", False)]
+    assert parse_filter("{State} unknown ohio && nonsense") == []
+    assert parse_filter("") == []
+
+
+def test_selections_cached(table):
+    """Test that a filtered and sorted selection is computed once."""
+    sort_by = [{"column_id": "Rate", "direction": "desc"}]
+    assert table.rows(sort_by, "{Rate} > 15") is table.rows(sort_by, "{Rate} > 15")
+    assert table.rows([], "") is None
+
+
+def test_index_built_once_per_version():
+    """Test that the index of a table is only built for a new version."""
+    builds = []
+
+    def build():
+        builds.append(1)
+        return pd.DataFrame({"a": [1, 2]})
+
+    first = table_index("v1", "test", build)
+    assert table_index("v1", "test", build) is first
+    table_index("v2", "test", build)
+    assert len(builds) == 2
+    assert ("v1", "test") not in mortality.table_index._tables
+
+
+@pytest.mark.parametrize("selection", MAP_OPTIONS)
+def test_map_table_pages_cover_records(selection):
+    """Test that the pages of the map tables hold all of the table's rows."""
+    records = table_frame(selection).to_dict("records")
+    _, columns, page_count = table_page(selection, 0, 10)
+
+    assert [column["id"] for column in columns] == list(records[0])
+    assert page_count == -(-len(records) // 10)
+    rows = [row for page in range(page_count) for row in table_page(selection, page, 10)[0]]
+    assert pd.DataFrame(rows).equals(pd.DataFrame(records))
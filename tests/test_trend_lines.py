@@ -0,0 +1,71 @@
+import subprocess
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+import statsmodels.api as sm
+from mortality.map_viz import MERGED, SCATTER_OPTIONS, load_data
+import mortality.trend_lines
+from mortality.trend_lines import TrendLines, trend_lines
+
+MORTALITY = "Maternal Mortality Rate per 100,000 Live Births"
+
+
+@pytest.fixture
+def merged_df():
+    """The merged data as plotted in the scatter plots."""
+    return load_data(MERGED, False).dropna()
+
+
+def test_lines_match_ols(merged_df):
+    """Test that every closed-form line matches statsmodels' OLS fit."""
+    lines = TrendLines(merged_df, MORTALITY, SCATTER_OPTIONS)
+
+    for xaxis in SCATTER_OPTIONS:
+        x = merged_df[xaxis].astype(float)
+        model = sm.OLS(merged_df[MORTALITY], sm.add_constant(x)).fit()
+        assert lines.intercept[lines.columns.index(xaxis)] == pytest.approx(model.params["const"])
+        assert lines.slope[lines.columns.index(xaxis)] == pytest.approx(model.params[xaxis])
+        np.testing.assert_allclose(lines.predict(xaxis, x), model.predict(sm.add_constant(x)))
+
+
+def test_band_matches_ols(merged_df):
+    """Test that the confidence band matches statsmodels' band for the mean."""
+    xaxis = "Percent Cesarean Births"
+    lines = TrendLines(merged_df, MORTALITY, SCATTER_OPTIONS)
+    x = merged_df[xaxis].astype(float)
+    model = sm.OLS(merged_df[MORTALITY], sm.add_constant(x)).fit()
+
+    expected = model.get_prediction(sm.add_constant(x)).conf_int(alpha=0.1)
+    lower, upper = lines.band(xaxis, x, level=0.9)
+    np.testing.assert_allclose(lower, expected[:, 0])
+    np.testing.assert_allclose(upper, expected[:, 1])
+
+
+def test_missing_values_dropped_per_column():
+    """Test that a missing x only removes the row from that column's fit."""
+    frame = pd.DataFrame(
+        {"y": [1.0, 3.0, 5.0, 7.0], "a": [0.0, 1.0, 2.0, 3.0], "b": [0.0, np.nan, 4.0, 6.0]}
+    )
+    lines = TrendLines(frame, "y", ["a", "b"])
+
+    np.testing.assert_allclose(lines.slope, [2.0, 1.0])
+    np.testing.assert_allclose(lines.intercept, [1.0, 1.0])
+    assert lines.n.tolist() == [4, 3]
+
+
+def test_lines_cached_per_version(merged_df):
+    """Test that the lines are fit once per data version."""
+    first = trend_lines("v1", merged_df, MORTALITY, SCATTER_OPTIONS)
+    assert trend_lines("v1", merged_df, MORTALITY, SCATTER_OPTIONS) is first
+    assert trend_lines("v2", merged_df, MORTALITY, SCATTER_OPTIONS) is not first
+    assert not [key for key in mortality.trend_lines._trends if key[0] == "v1"]
+
+
+def test_map_viz_does_not_import_statsmodels():
+    """Test that the map dashboard no longer needs statsmodels."""
+    code = "import sys, mortality.map_viz; print('statsmodels' in sys.modules)"
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "False"
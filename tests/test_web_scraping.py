@@ -1,7 +1,16 @@
+import asyncio
+import httpx
 import pytest
 import pandas as pd
 from pathlib import Path
-from mortality.scrapers.kff_web_scraping import extract_state_info
+from mortality.scrapers.kff_web_scraping import extract_state_info, scrape_sources
+from mortality.scrapers.scheduler import (
+    RetryingClient,
+    RetryPolicy,
+    TokenBucket,
+    parse_retry_after,
+    summarize,
+)
 
 TEST_DATA = [
     ["U.S.", " ", "In God We Trust"],
@@ -39,3 +48,129 @@ def test_motto_extracted():
     data = extract_state_info(TEST_DATA, VARIABLES)
     assert data[1]["motto_english"] == "Ever Upward"
     assert data[2]["motto_english"] == "City in a Garden"
+
+
+def fake_sources(count):
+    return {
+        f"source {i}": (
+            f"https://example.org/sheet?tab={i}",
+            VARIABLES,
+            1,
+            f"source_{i}.csv",
+        )
+        for i in range(count)
+    }
+
+
+def test_scrape_sources_concurrently(tmp_path):
+    in_flight = 0
+    most_in_flight = 0
+
+    async def handler(request):
+        nonlocal in_flight, most_in_flight
+        in_flight += 1
+        most_in_flight = max(most_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200, json={"data": [["header"]] + TEST_DATA})
+
+    timings = asyncio.run(
+        scrape_sources(
+            fake_sources(6),
+            concurrency=3,
+            transport=httpx.MockTransport(handler),
+            base_dir=tmp_path,
+        )
+    )
+
+    assert len(timings) == 6
+    assert most_in_flight == 3
+    written = pd.read_csv(tmp_path / "source_4.csv")
+    assert list(written["location"]) == ["U.S.", "New York", "Chicago"]
+
+
+NO_WAIT = RetryPolicy(max_attempts=3, base_delay=0, jitter=False)
+
+
+def test_failed_source_is_isolated(tmp_path):
+    def handler(request):
+        if request.url.params["tab"] == "0":
+            return httpx.Response(500)
+        return httpx.Response(200, json={"data": [["header"]] + TEST_DATA})
+
+    results = asyncio.run(
+        scrape_sources(
+            fake_sources(3),
+            transport=httpx.MockTransport(handler),
+            base_dir=tmp_path,
+            policy=NO_WAIT,
+        )
+    )
+
+    assert results["source 0"]["status"] == "failed"
+    assert results["source 0"]["attempts"] == 3
+    assert "HTTPStatusError" in results["source 0"]["error"]
+    assert results["source 1"]["changed"]
+    assert (tmp_path / "source_2.csv").exists()
+
+    summary = summarize(results, 1.0)
+    assert summary["succeeded"] == 2
+    assert list(summary["failed"]) == ["source 0"]
+    assert summary["retries"] == 2
+
+
+def test_retry_after_429(tmp_path):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if len(requests) < 3:
+            status = 429 if len(requests) == 1 else 503
+            return httpx.Response(status, headers={"Retry-After": "0"})
+        return httpx.Response(200, json={"data": [["header"]] + TEST_DATA})
+
+    results = asyncio.run(
+        scrape_sources(
+            fake_sources(1),
+            transport=httpx.MockTransport(handler),
+            base_dir=tmp_path,
+            policy=RetryPolicy(max_attempts=3, base_delay=60),
+        )
+    )
+
+    assert results["source 0"]["changed"]
+    assert results["source 0"]["attempts"] == 3
+
+
+def test_sync_client_retries_connection_errors():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            raise httpx.ConnectError("refused")
+        return httpx.Response(200, text="ok")
+
+    client = RetryingClient(
+        httpx.Client(transport=httpx.MockTransport(handler)), NO_WAIT
+    )
+    assert client.get("https://example.org").text == "ok"
+    assert client.attempts["https://example.org"] == 2
+
+
+def test_backoff_delay():
+    policy = RetryPolicy(base_delay=1, max_delay=5, jitter=False)
+    assert [policy.delay(attempt) for attempt in range(4)] == [1, 2, 4, 5]
+    assert policy.delay(0, retry_after=3) == 3
+    assert RetryPolicy(base_delay=1).delay(2) <= 4
+    assert parse_retry_after("7") == 7
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+
+
+def test_token_bucket_spreads_requests():
+    bucket = TokenBucket(rate=10, burst=2)
+    waits = [bucket.reserve() for _ in range(4)]
+
+    assert waits[:2] == [0, 0]
+    assert waits[2] == pytest.approx(0.1, abs=0.01)
+    assert waits[3] == pytest.approx(0.2, abs=0.01)